@@ -0,0 +1,62 @@
+"""比較舊的逐批 requests.get 與 HelixClient 連線池在大量頻道下的查詢延遲。
+
+    python bench/bench_helix.py --channels 2000 --latency 0.05 --connect-latency 0.1
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from fake_helix import FakeHelix
+from twitch_core.twitch import HelixClient
+
+HEADERS = {"Client-Id": "bench", "Authorization": "Bearer fake-token"}
+
+
+def sequential(base, logins):
+    # 舊版 WatcherChecker 的作法：每批各自開新連線、依序查詢
+    live = set()
+    for c in [logins[i:i+100] for i in range(0, len(logins), 100)]:
+        r = requests.get(base + "/streams", headers=HEADERS, params=[("user_login", l) for l in c], timeout=10)
+        if r.ok: live.update(d["user_login"] for d in r.json().get("data", []))
+    return live
+
+
+def measure(fn, runs):
+    times = []; result = None
+    for _ in range(runs):
+        t = time.perf_counter(); result = fn(); times.append(time.perf_counter() - t)
+    return statistics.median(times), result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--channels", type=int, default=2000)
+    ap.add_argument("--latency", type=float, default=0.05, help="每個請求的伺服器延遲 (秒)")
+    ap.add_argument("--connect-latency", type=float, default=0.1, help="每個新連線的交握延遲 (秒)")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--runs", type=int, default=3)
+    a = ap.parse_args()
+
+    srv = FakeHelix(a.latency, a.connect_latency).start()
+    logins = [f"channel{i:05d}" for i in range(a.channels)]
+    t, expected = measure(lambda: sequential(srv.base, logins), a.runs)
+    print(f"{a.channels} channels, latency {a.latency * 1000:.0f} ms, connect {a.connect_latency * 1000:.0f} ms")
+    print(f"  sequential requests.get : {t * 1000:8.1f} ms  ({len(expected)} live)")
+    for n in a.concurrency:
+        client = HelixClient(lambda stale=None: (True, HEADERS, ""), concurrency=n, base=srv.base)
+        conns = srv.connections
+        t, (live, failed, _) = measure(lambda: client.streams(logins), a.runs)
+        assert set(live) == expected and not failed
+        print(f"  HelixClient x{n:<2}        : {t * 1000:8.1f} ms  ({srv.connections - conns} connections over {a.runs} runs)")
+        client.close()
+    srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""離線負載測試：以假 Helix、假 streamlink / ffmpeg 量測開台查詢、同時錄影與壓縮佇列的擴充性，結果寫入 JSON 以追蹤退化。
+
+    python bench/bench_load.py --out bench_load.json
+    python bench/bench_load.py --scenario poll --channels 100 1000 5000 --rounds 5 --auth-fail-pct 1 --limit 120
+    python bench/bench_load.py --scenario record --recordings 50 200 500 --record-sec 30
+    python bench/bench_load.py --scenario compress --jobs 50 --workers 1 2 4 --media-sec 60
+    python bench/bench_load.py --scenario isolation --iso-recordings 2 --sl-cpu 0.3 --record-sec 60
+
+- poll     : TokenManager + HelixClient + check_channels 對假 Helix 查詢 N 個頻道 R 輪 (Token 會過期、可注入 401 / 429 / 503)
+- record   : RecordSupervisor 同時錄 N 個頻道 (bench/stubs/fake_streamlink.py)，量測開始錄影延遲、寫入量、停滯次數與停止時間
+- compress : J 個合成 .ts 以 W 個工作數排入壓縮佇列 (bench/stubs/fake_ffmpeg.py)，量測清空時間、每個工作的延遲與壓縮速度
+- isolation: N 個錄影進行中時讓壓縮佔滿所有核心 (假 ffmpeg 真的消耗 CPU)，依資源政策 off (改版前，全部同樣優先權) /
+             nice (只降低壓縮優先權) / pause (不降低優先權，只在錄影落後時暫停壓縮) / on (預設，兩者都用)
+             比較錄影的落後、遺失的影片秒數 (假 streamlink 落後超過播放清單長度時丟棄資料)、最長中斷與停滯次數；
+             pause / on 有停滯、遺失或沒有暫停過壓縮時以結束碼 1 結束。預設為少數幾個吃重的錄影對上大量壓縮執行緒，
+             只降低優先權不夠 (nice 仍會遺失)；錄影多而輕時 nice 已足以讓錄影跟上，on 不會落後也就不會暫停壓縮
+
+每個情境都回報 CPU (本程序 + 子程序的 user / sys 秒數) 與 RSS 峰值 (Linux 上另含所有子程序的 RSS 總和)。
+假 ffmpeg 以 POSIX shell 啟動腳本 (Windows 為 .cmd) 包裝後取代 FFMPEG_PATH / FFPROBE_PATH，不需要安裝真的 ffmpeg / streamlink。
+"""
+import os
+import re
+import sys
+import time
+import json
+import glob
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_helix import FakeHelix
+from stubs.fake_streamlink import TICK as SL_TICK
+from twitch_core import recorder
+from twitch_core.metrics import METRICS
+from twitch_core.config import RECORD_LAG_RATIO, RECORD_LAG_WINDOW, RECORD_MODES, COMPRESS_PROFILES
+from twitch_core.engine import job_opts
+from twitch_core.detect import LiveDetector, check_channels
+from twitch_core.twitch import TokenManager, HelixClient
+
+STUBS = os.path.join(HERE, "stubs")
+PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def pct(values, p):
+    """最近秩百分位數 (p 為 0~100)；沒有資料時為 None"""
+    if not values: return None
+    v = sorted(values)
+    return v[min(len(v) - 1, max(0, int(round(p / 100 * len(v) + 0.5)) - 1))]
+
+
+def dist(values, scale=1000.0):
+    # 延遲分布 (預設換算成毫秒)
+    if not values: return {"n": 0}
+    return {"n": len(values), **{k: round(pct(values, p) * scale, 2) for k, p in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99))},
+            "max": round(max(values) * scale, 2), "mean": round(sum(values) / len(values) * scale, 2)}
+
+
+def _rss(pid="self"):
+    try:
+        with open(f"/proc/{pid}/statm") as f: return int(f.read().split()[1]) * PAGE
+    except (OSError, IndexError, ValueError): return 0
+
+
+def _children_rss():
+    # /proc 裡 ppid 為本程序 (含孫程序) 的所有程序 RSS 總和；非 Linux 回傳 0
+    if not os.path.isdir("/proc"): return 0
+    parent = {}
+    for d in os.listdir("/proc"):
+        if not d.isdigit(): continue
+        try:
+            with open(f"/proc/{d}/stat") as f: parent[int(d)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError): pass
+    mine = {os.getpid()}; total = 0; grew = True
+    while grew:
+        grew = False
+        for pid, pp in parent.items():
+            if pp in mine and pid not in mine: mine.add(pid); total += _rss(pid); grew = True
+    return total
+
+
+class Usage:
+    """量測一段時間內的 CPU 與 RSS：getrusage 的差值加上背景取樣的 RSS 峰值"""
+    def __init__(self, interval=0.5):
+        self.interval = interval; self.stop_ev = threading.Event(); self.peak = self.peak_children = 0
+    def _sample(self):
+        while not self.stop_ev.wait(self.interval):
+            self.peak = max(self.peak, _rss()); self.peak_children = max(self.peak_children, _children_rss())
+    def __enter__(self):
+        self.t0 = time.perf_counter(); self.ru = _rusage(); self.peak = _rss()
+        self.th = threading.Thread(target=self._sample, daemon=True); self.th.start(); return self
+    def __exit__(self, *a):
+        self.stop_ev.set(); self.th.join(); ru = _rusage()
+        self.result = {"wall_s": round(time.perf_counter() - self.t0, 3),
+                       **{k: round(ru[k] - self.ru[k], 3) for k in ru},
+                       "rss_peak_mb": round(max(self.peak, _rss()) / 2**20, 1), "children_rss_peak_mb": round(self.peak_children / 2**20, 1)}
+
+
+def _rusage():
+    try: import resource
+    except ImportError: return {}
+    s = resource.getrusage(resource.RUSAGE_SELF); c = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {"cpu_user_s": s.ru_utime, "cpu_sys_s": s.ru_stime, "children_cpu_user_s": c.ru_utime, "children_cpu_sys_s": c.ru_stime}
+
+
+def _launcher(folder, name, stub, *pre):
+    # 以啟動腳本包裝 python stub，讓 RecordSupervisor 像呼叫真的執行檔一樣呼叫它
+    if os.name == "nt":
+        path = os.path.join(folder, name + ".cmd")
+        with open(path, "w") as f: f.write(f'@"{sys.executable}" "{stub}" {" ".join(pre)} %*\n')
+    else:
+        path = os.path.join(folder, name)
+        with open(path, "w") as f: f.write(f'#!/bin/sh\nexec "{sys.executable}" "{stub}" {" ".join(pre)} "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+def install_stubs(folder, file_check=1, stall=5):
+    """把 recorder 的 streamlink / ffmpeg / ffprobe 換成假程式，並縮短檔案檢查與停滯判定的間隔"""
+    ff = os.path.join(STUBS, "fake_ffmpeg.py"); sl = os.path.join(STUBS, "fake_streamlink.py")
+    recorder.FFMPEG_PATH = _launcher(folder, "ffmpeg", ff); recorder.FFPROBE_PATH = _launcher(folder, "ffprobe", ff, "--ffprobe")
+    recorder._streamlink_cmd = lambda args: [sys.executable, sl] + args
+    recorder.FILE_CHECK_SEC = file_check; recorder.STALL_TIMEOUT_SEC = stall
+
+
+# ---- 開台查詢 ----
+def bench_poll(a, n):
+    srv = FakeHelix(a.latency, a.connect_latency, live_pct=0, limit=a.limit, fail_pct=a.fail_pct, token_ttl=a.token_ttl,
+                    check_tokens=True, auth_fail_pct=a.auth_fail_pct).start()
+    logins = [f"channel{i:05d}" for i in range(n)]; live = set(random.Random(n).sample(logins, min(n, a.live)))
+    srv.set_live(live)
+    tokens = TokenManager(url=f"http://127.0.0.1:{srv.server_address[1]}/oauth2/token")
+    tokens.set_credentials("bench", "bench")
+    helix = HelixClient(tokens.headers, a.concurrency, base=srv.base)
+    lat = []; found = failed = 0; errors = set()
+    with Usage() as u:
+        for r in range(a.rounds):
+            t0 = time.perf_counter(); out, err = check_channels(helix, logins); lat.append(time.perf_counter() - t0)
+            found += sum(1 for l in live if out[l]["live"]); failed += sum(1 for i in out.values() if i.get("error"))
+            if err: errors.add(err[:120])
+            if a.pause and r + 1 < a.rounds: time.sleep(a.pause)
+    helix.close(); tokens.close(); srv.shutdown(); srv.server_close()
+    busy = sum(lat)
+    return {"scenario": "poll", "channels": n, "rounds": a.rounds, "concurrency": a.concurrency, "round_latency_ms": dist(lat),
+            "channels_per_s": round(n * a.rounds / busy, 1), "requests": srv.requests, "http_429": srv.throttled, "http_401": srv.unauthorized,
+            "token_requests": srv.token_requests, "connections": srv.connections, "live_expected": len(live) * a.rounds, "live_found": found,
+            "failed_channels": failed, "errors": sorted(errors), "usage": u.result}
+
+
+# ---- 同時錄影 ----
+def bench_record(a, n, folder):
+    os.environ.update(FAKE_MEDIA_BPS=str(a.bps), FAKE_SL_DURATION="0", FAKE_SL_STARTUP=str(a.sl_startup))
+    sids = [f"rec{i:04d}" for i in range(n)]; added = {}; started = {}; stalls = {}; lock = threading.Lock()
+    def on_log(sid, m, lvl):
+        if "錄影中" in m:
+            with lock: started.setdefault(sid, time.perf_counter())
+    def on_event(sid, kind, data):
+        if kind == "stall":
+            with lock: stalls[sid] = stalls.get(sid, 0) + 1
+    # 沒有 Helix 時 LiveDetector 把所有頻道視為開台，直接啟動 streamlink
+    det = LiveDetector(None); det.start()
+    sup = recorder.RecordSupervisor(det, None, on_log=on_log, on_event=on_event)
+    rec = {"mode": a.mode, "segment_min": 1, "job": {}, "encode": False}
+    with Usage() as u:
+        for s in sids: added[s] = time.perf_counter(); sup.add(s, "best", folder, rec)
+        deadline = time.perf_counter() + a.start_timeout
+        while len(started) < n and time.perf_counter() < deadline: time.sleep(0.1)
+        ready = time.perf_counter(); b0 = _folder_bytes(folder)
+        time.sleep(a.record_sec)
+        b1 = _folder_bytes(folder); span = time.perf_counter() - ready
+        t0 = time.perf_counter(); sup.stop(sids); stop_s = time.perf_counter() - t0
+    sup.shutdown(); det.stop(); det.wait()
+    rate = (b1 - b0) / span
+    return {"scenario": "record", "recordings": n, "mode": a.mode, "media_bps": a.bps, "record_sec": round(span, 2),
+            "started": len(started), "start_latency_ms": dist([started[s] - added[s] for s in started]),
+            "write_bytes_per_s": round(rate), "write_ratio": round(rate / (n * a.bps), 3) if n else None,
+            "stalls": sum(stalls.values()), "stalled_recordings": len(stalls), "stop_all_ms": round(stop_s * 1000, 1), "usage": u.result}
+
+
+def _folder_bytes(folder):
+    total = 0
+    for root, _, files in os.walk(folder):
+        for f in files:
+            try: total += os.path.getsize(os.path.join(root, f))
+            except OSError: pass
+    return total
+
+
+def _synthetic_ts(path, size):
+    pkt = b"\x47" + bytes(random.Random(path).getrandbits(8) for _ in range(187)); chunk = pkt * 5000
+    with open(path, "wb") as f:
+        for _ in range(size // len(chunk)): f.write(chunk)
+        f.write(chunk[:size % len(chunk)])
+
+
+# ---- 壓縮佇列 ----
+def _hist(name, **labels):
+    v = METRICS.get(name, **labels); return (v[1], v[2]) if v else (0.0, 0)
+
+
+def bench_compress(a, workers, folder):
+    os.environ.update(FAKE_MEDIA_BPS=str(a.bps), FAKE_FF_BURN=str(a.ff_burn))
+    if a.ff_speed: os.environ["FAKE_FF_SPEED"] = str(a.ff_speed)
+    src = os.path.join(folder, "compress", f"w{workers}"); os.makedirs(src, exist_ok=True)
+    paths = [os.path.join(src, f"job{i:04d}.ts") for i in range(a.jobs)]
+    for p in paths: _synthetic_ts(p, int(a.media_sec * a.bps))
+    opts = job_opts({"profile": {"profile": a.profile}, "keep_original": True}); done = {}; ok = []; cv = threading.Condition()
+    def on_done(sid, out, success):
+        with cv: done[len(done)] = time.perf_counter(); ok.append(success); cv.notify_all()
+    det = LiveDetector(None)
+    sup = recorder.RecordSupervisor(det, None, on_done=on_done)
+    sup.compress_opts(workers, "fifo", True)  # 先暫停，全部排入後再一起開始
+    for p in paths: sup.compress("bench", p, opts)
+    s0, c0 = _hist("twitch_encode_speed_ratio", profile=a.profile)
+    with Usage() as u:
+        t0 = time.perf_counter(); sup.compress_opts(workers, "fifo", False)
+        with cv: cv.wait_for(lambda: len(done) >= a.jobs, timeout=a.drain_timeout)
+        drain = time.perf_counter() - t0
+    sup.shutdown()
+    s1, c1 = _hist("twitch_encode_speed_ratio", profile=a.profile)
+    # 全部同時排入，所以每個工作的延遲 = 排隊 + 壓縮，依完成順序排列
+    lat = [t - t0 for t in done.values()]
+    return {"scenario": "compress", "jobs": a.jobs, "workers": workers, "profile": a.profile, "media_sec_per_job": a.media_sec,
+            "completed": len(done), "failed": ok.count(False), "drain_s": round(drain, 3), "jobs_per_s": round(len(done) / drain, 3),
+            "media_sec_per_s": round(len(done) * a.media_sec / drain, 2), "job_latency_ms": dist(lat),
+            "encode_speed_mean_x": round((s1 - s0) / (c1 - c0), 2) if c1 > c0 else None, "usage": u.result}
+
+
+# ---- 錄影與壓縮的資源隔離 ----
+POLICIES = {"off": {"enc_nice": 0, "enc_ionice": "", "throttle": False}, "nice": {"throttle": False},
+            "pause": {"enc_nice": 0, "enc_ionice": "", "throttle": True}, "on": {}}
+
+
+def bench_isolation(a, name, folder):
+    os.environ.update(FAKE_MEDIA_BPS=str(a.bps), FAKE_SL_DURATION="0", FAKE_SL_STARTUP=str(a.sl_startup), FAKE_SL_CPU=str(a.sl_cpu),
+                      FAKE_FF_BURN=str(a.iso_burn))
+    sids = [f"iso{i:04d}" for i in range(a.iso_recordings)]; started = set(); stalls = []; lost = []; measuring = threading.Event()
+    def on_log(sid, m, lvl):
+        if "錄影中" in m: started.add(sid)
+    def on_event(sid, kind, data):
+        if kind == "stall": stalls.append(sid)
+        # 假 streamlink 每個片段 SL_TICK 秒，跳過的片段不會再補回來
+        m = re.search(r"Skipped segments (\d+)-(\d+)", data) if kind == "skipped" else None
+        if m and measuring.is_set(): lost.append((int(m[2]) - int(m[1]) + 1) * SL_TICK)
+    res = dict(POLICIES[name], **({"reserve_cpus": a.reserve_cpus} if a.reserve_cpus else {}))
+    det = LiveDetector(None); det.start(); th0 = METRICS.get("twitch_compress_throttles_total") or 0
+    sup = recorder.RecordSupervisor(det, None, on_log=on_log, on_event=on_event, resources=res)
+    for s in sids: sup.add(s, "best", folder, {"mode": "ts"})
+    deadline = time.perf_counter() + a.start_timeout
+    while len(started) < len(sids) and time.perf_counter() < deadline: time.sleep(0.1)
+    # 先讓落後偵測取得正常的寫入速度
+    time.sleep(recorder.FILE_CHECK_SEC * RECORD_LAG_WINDOW)
+    # 壓縮工作都比測試時間長，測試期間壓縮一直滿載
+    enc = os.path.join(folder, "encode"); os.makedirs(enc); paths = [os.path.join(enc, f"job{i}.ts") for i in range(a.iso_workers)]
+    for p in paths: _synthetic_ts(p, int(a.iso_media_sec * a.bps))
+    sup.compress_opts(a.iso_workers, "fifo", False)
+    for p in paths: sup.compress("bench", p, job_opts({"keep_original": True, "profile": {"threads": a.iso_threads}}))
+    # 遺失從開始壓縮算起 (包含 warmup)
+    measuring.set(); since = time.perf_counter(); files = {}; sizes = {}; grew = {}; windows = lagged = 0; worst = float("inf"); gap = 0.0; throttled = 0.0
+    with Usage() as u:
+        time.sleep(a.iso_warmup); prev = time.perf_counter(); end = prev + a.record_sec
+        while time.perf_counter() < end:
+            time.sleep(1); now = time.perf_counter(); dt = now - prev; prev = now
+            throttled += dt if METRICS.get("twitch_compress_throttled") else 0
+            for s in sids:
+                if s not in files:
+                    fs = sorted(glob.glob(os.path.join(folder, s, "*.ts")))
+                    if not fs: continue
+                    files[s] = fs[-1]
+                size = os.path.getsize(files[s]); ratio = (size - sizes.get(s, size)) / (a.bps * dt)
+                if s in sizes:
+                    windows += 1; worst = min(worst, ratio); lagged += ratio < RECORD_LAG_RATIO
+                    if size > sizes[s]: grew[s] = now
+                    gap = max(gap, now - grew.get(s, now))
+                else: grew[s] = now
+                sizes[s] = size
+        measuring.clear(); total = sum(sizes.values()); span = (time.perf_counter() - since) * len(sids)
+    sup.shutdown(); det.stop(); det.wait()
+    return {"scenario": "isolation", "policy": name, "resources": res, "recordings": len(sids), "started": len(started), "encodes": a.iso_workers,
+            "ff_burn": a.iso_burn, "sl_cpu": a.sl_cpu, "record_sec": a.record_sec, "stalls": len(stalls), "lag_windows": lagged, "windows": windows,
+            "worst_window_ratio": round(worst, 3) if windows else None, "max_gap_s": round(gap, 2),
+            "lost_media_s": round(sum(lost), 1), "lost_pct": round(sum(lost) / span * 100, 2) if span else None,
+            "throttles": (METRICS.get("twitch_compress_throttles_total") or 0) - th0, "throttled_s": round(throttled, 1),
+            "bytes": total, "usage": u.result}
+
+
+def meta():
+    try: rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError: rev = ""
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git": rev, "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "argv": sys.argv[1:]}
+
+
+def summary(r):
+    u = r["usage"]; cpu = u.get("cpu_user_s", 0) + u.get("cpu_sys_s", 0); ccpu = u.get("children_cpu_user_s", 0) + u.get("children_cpu_sys_s", 0)
+    res = f"cpu {cpu:6.2f}s + children {ccpu:6.2f}s  rss {u['rss_peak_mb']:6.1f} MB + children {u['children_rss_peak_mb']:7.1f} MB"
+    if r["scenario"] == "poll":
+        l = r["round_latency_ms"]
+        head = (f"poll     {r['channels']:5d} ch  p50 {l['p50']:8.1f} ms  p99 {l['p99']:8.1f} ms  {r['channels_per_s']:9.1f} ch/s  "
+                f"401 {r['http_401']:3d}  429 {r['http_429']:3d}  failed {r['failed_channels']:4d}  live {r['live_found']}/{r['live_expected']}")
+    elif r["scenario"] == "record":
+        l = r["start_latency_ms"]
+        head = (f"record   {r['recordings']:5d} rec  start p50 {l.get('p50', 0):8.1f} ms  p99 {l.get('p99', 0):8.1f} ms  "
+                f"write {r['write_ratio']:.3f}×  stalls {r['stalls']:3d}  stop {r['stop_all_ms']:8.1f} ms")
+    elif r["scenario"] == "isolation":
+        head = (f"isolation {r['policy']:<5} {r['recordings']:4d} rec + {r['encodes']} encodes  stalls {r['stalls']:3d}  "
+                f"lost {r['lost_media_s']:6.1f} s ({r['lost_pct']}%)  lagging windows {r['lag_windows']:4d}/{r['windows']}  "
+                f"worst {r['worst_window_ratio']}×  max gap {r['max_gap_s']:5.2f} s  throttled {r['throttled_s']:5.1f} s ({r['throttles']}×)")
+    else:
+        l = r["job_latency_ms"]
+        head = (f"compress {r['jobs']:5d} jobs × {r['workers']} workers  drain {r['drain_s']:7.2f} s  {r['jobs_per_s']:6.2f} jobs/s  "
+                f"p50 {l.get('p50', 0):9.1f} ms  p99 {l.get('p99', 0):9.1f} ms  speed {r['encode_speed_mean_x']}×  failed {r['failed']}")
+    print(head + "\n" + " " * 9 + res, flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scenario", nargs="+", choices=["poll", "record", "compress", "isolation"], default=["poll", "record", "compress"])
+    ap.add_argument("--out", default="", help="結果 JSON 檔 (預設只印出摘要)")
+    g = ap.add_argument_group("poll")
+    g.add_argument("--channels", type=int, nargs="+", default=[100, 1000, 5000])
+    g.add_argument("--rounds", type=int, default=5)
+    g.add_argument("--pause", type=float, default=0, help="每輪之間的間隔 (秒)，讓 Token 過期 / 額度回補")
+    g.add_argument("--live", type=int, default=50, help="開台的頻道數")
+    g.add_argument("--concurrency", type=int, default=4)
+    g.add_argument("--latency", type=float, default=0.05)
+    g.add_argument("--connect-latency", type=float, default=0.1)
+    g.add_argument("--limit", type=int, default=800, help="假 Helix 每分鐘額度 (用完回 429)")
+    g.add_argument("--fail-pct", type=float, default=0, help="回 503 的比例 (%%)")
+    g.add_argument("--auth-fail-pct", type=float, default=0, help="回 401 的比例 (%%)")
+    g.add_argument("--token-ttl", type=int, default=3600)
+    g = ap.add_argument_group("record")
+    g.add_argument("--recordings", type=int, nargs="+", default=[50])
+    g.add_argument("--record-sec", type=float, default=15)
+    g.add_argument("--mode", choices=list(RECORD_MODES), default="ts")
+    g.add_argument("--bps", type=int, default=250000, help="每個錄影的位元率 (B/s)")
+    g.add_argument("--sl-startup", type=float, default=1)
+    g.add_argument("--start-timeout", type=float, default=120)
+    g.add_argument("--stall-sec", type=float, default=5, help="停滯判定 (取代 STALL_TIMEOUT_SEC)")
+    g = ap.add_argument_group("compress")
+    g.add_argument("--jobs", type=int, default=20)
+    g.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    g.add_argument("--media-sec", type=float, default=60, help="每個合成 .ts 的時長")
+    g.add_argument("--profile", choices=list(COMPRESS_PROFILES), default="encode")
+    g.add_argument("--ff-speed", type=float, default=0, help="假 ffmpeg 的速度 (×即時，0 為預設)")
+    g.add_argument("--ff-burn", type=float, default=0, help="每秒影片消耗的 CPU 秒數 (> 0 時假 ffmpeg 真的佔用 CPU)")
+    g.add_argument("--drain-timeout", type=float, default=600)
+    g = ap.add_argument_group("isolation (另外沿用 --record-sec / --bps / --stall-sec)")
+    g.add_argument("--policies", nargs="+", choices=list(POLICIES), default=list(POLICIES))
+    g.add_argument("--iso-recordings", type=int, default=2)
+    g.add_argument("--iso-workers", type=int, default=16, help="同時壓縮數")
+    g.add_argument("--iso-threads", type=int, default=4, help="每個壓縮的 -threads (假 ffmpeg 每個執行緒一個佔用 CPU 的子程序，0 為全部核心)")
+    g.add_argument("--iso-burn", type=float, default=4, help="壓縮每秒影片消耗的 CPU 秒數")
+    g.add_argument("--iso-media-sec", type=float, default=3600)
+    g.add_argument("--iso-warmup", type=float, default=3, help="開始壓縮後多久才開始量測")
+    g.add_argument("--sl-cpu", type=float, default=0.3, help="每個錄影每秒消耗的 CPU 秒數")
+    g.add_argument("--reserve-cpus", type=int, default=0)
+    a = ap.parse_args()
+
+    results = []; folder = tempfile.mkdtemp(prefix="bench_load_")
+    try:
+        install_stubs(folder, stall=a.stall_sec)
+        runs = [(s, x) for s in a.scenario for x in {"poll": a.channels, "record": a.recordings, "compress": a.workers, "isolation": a.policies}[s]]
+        for s, x in runs:
+            if s == "poll": r = bench_poll(a, x)
+            elif s == "record":
+                sub = os.path.join(folder, f"rec{x}"); os.makedirs(sub); r = bench_record(a, x, sub); shutil.rmtree(sub, ignore_errors=True)
+            elif s == "isolation":
+                sub = os.path.join(folder, f"iso_{x}"); os.makedirs(sub); r = bench_isolation(a, x, sub); shutil.rmtree(sub, ignore_errors=True)
+            else: r = bench_compress(a, x, folder)
+            results.append(r); summary(r)
+    finally: shutil.rmtree(folder, ignore_errors=True)
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f: json.dump({"meta": meta(), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"-> {a.out}")
+    # 壓縮佔滿 CPU 時，會暫停壓縮的政策 (pause / on) 不得有停滯或遺失，也必須真的暫停過壓縮
+    bad = [r for r in results if r["scenario"] == "isolation" and POLICIES[r["policy"]].get("throttle", True)
+           and (r["stalls"] or r["lost_media_s"] or not r["throttles"])]
+    for r in bad: print(f"FAIL: policy {r['policy']} stalls {r['stalls']}  lost {r['lost_media_s']} s  throttles {r['throttles']}")
+    if bad: sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
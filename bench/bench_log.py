@@ -0,0 +1,68 @@
+"""比較舊的逐則 QTextEdit.append 與 UiBus 合併寫入在大量日誌 / 狀態事件下的 UI 執行緒成本與畫面保留的行數。
+
+    QT_QPA_PLATFORM=offscreen python bench/bench_log.py --events 50000 --burst 500
+
+事件以 burst 則為一批送進 UI 執行緒 (模擬多個錄影同時輸出)，每批之間處理一次事件迴圈。
+UiBus 的日誌寫到暫存資料夾，並以很小的輪替大小檢查 .log.gz 的輪替與保留數。
+"""
+import os
+import sys
+import time
+import gzip
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6 import QtWidgets
+import new_twitch_watcher as tw
+from twitch_core.config import LOG_KEEP_FILES
+
+
+def run(app, on_event, events, burst, channels, rng):
+    start = time.perf_counter()
+    for n in range(0, events, burst):
+        for i in range(n, min(events, n + burst)): on_event(rng.choice(channels), f"🔴 錄影中 ({i / 10:.1f} MB)")
+        app.processEvents()
+    # 等最後一批寫入畫面
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline: app.processEvents()
+    return time.perf_counter() - start - 0.2
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=50000)
+    ap.add_argument("--burst", type=int, default=500, help="每次事件迴圈之間湧入的事件數")
+    ap.add_argument("--channels", type=int, default=50)
+    ap.add_argument("--rotate-kb", type=int, default=256, help="測試用的日誌輪替大小")
+    a = ap.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    channels = [f"ch{i:03d}" for i in range(a.channels)]
+    print(f"{a.events} events in bursts of {a.burst}, {a.channels} channels")
+
+    old = QtWidgets.QTextEdit(); old.setReadOnly(True); old.show()
+    # 舊版 RecorderWidget.upd：每則訊息直接 append 一行
+    t = run(app, lambda s, m: old.append(f"[{time.strftime('%H:%M:%S')}] [{s}] {m}"), a.events, a.burst, channels, random.Random(1))
+    print(f"  old   : {t * 1000:8.1f} ms UI time ({t / a.events * 1e6:6.1f} us/event), {old.document().blockCount()} lines kept on screen")
+    old.close()
+
+    with tempfile.TemporaryDirectory() as d:
+        tw.LOG_DIR = Path(d); tw.LogArchive.__init__.__defaults__ = (a.rotate_kb * 1024, LOG_KEEP_FILES)
+        model = tw.ChannelModel([("login", "頻道"), ("status", "狀態")])
+        for s in channels: model.add(s)
+        view = QtWidgets.QPlainTextEdit(); view.setReadOnly(True); view.show(); bus = tw.UiBus(view, model, "bench")
+        def on_event(s, m): bus.set_status(s, status=m, status_color="#00e676"); bus.log(f"[{s}] {m}")
+        t = run(app, on_event, a.events, a.burst, channels, random.Random(1)); bus.flush()
+        print(f"  UiBus : {t * 1000:8.1f} ms UI time ({t / a.events * 1e6:6.1f} us/event), {view.document().blockCount()} lines kept on screen")
+        time.sleep(0.5)
+        gz = sorted(Path(d).glob("bench-*.log.gz")); lines = sum(len(gzip.open(p).read().splitlines()) for p in gz)
+        cur = Path(d, "bench.log"); lines += len(cur.read_text("utf-8").splitlines()) if cur.exists() else 0
+        print(f"  archive: {len(gz)} .log.gz files (keep {LOG_KEEP_FILES}), {lines} lines on disk")
+
+
+if __name__ == "__main__":
+    main()
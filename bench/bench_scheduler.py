@@ -0,0 +1,127 @@
+"""模擬數週的開台行為，比較固定間隔輪詢與 PollScheduler 的 API 請求數與開台偵測延遲。
+
+    python bench/bench_scheduler.py --channels 200 --interval 60 --weeks 5
+
+每個頻道每週固定幾天在同一個小時附近開台 (±15 分鐘)，另有少量不定時的開台。
+前 weeks-1 週讓排程器學習，只統計最後一週。使用虛擬時鐘，不會真的等待。
+adaptive 的請求數超過 fixed，或新加入 / expedite 的頻道沒有在下一個 tick 查詢時以結束碼 1 結束。
+"""
+import os
+import sys
+import math
+import bisect
+import random
+import argparse
+import statistics
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from twitch_core.schedule import LiveHistory, PollScheduler
+
+WEEK = 7 * 86400
+START = 1_700_000_000
+
+
+def make_streams(rng, weeks, extra_pct):
+    days = rng.sample(range(7), rng.randint(3, 6)); hour = rng.randint(0, 23); dur = rng.uniform(2, 5) * 3600
+    out = []
+    for w in range(weeks):
+        for d in days:
+            s = START + w * WEEK + d * 86400 + hour * 3600 + rng.gauss(0, 900); out.append((s, s + dur))
+        if rng.random() * 100 < extra_pct:
+            s = START + w * WEEK + rng.uniform(0, WEEK); out.append((s, s + dur))
+    out.sort()
+    return out
+
+
+def live_at(streams, starts, t):
+    i = bisect.bisect_right(starts, t) - 1
+    return i if i >= 0 and streams[i][1] > t else None
+
+
+def pct(xs, p): return sorted(xs)[min(len(xs) - 1, int(len(xs) * p))] if xs else 0.0
+
+
+def run_fixed(chans, interval, t0, t1):
+    reqs = 0; found = {}; t = t0
+    while t < t1:
+        reqs += math.ceil(len(chans) / 100)
+        for c, (streams, starts) in chans.items():
+            i = live_at(streams, starts, t)
+            if i is not None: found.setdefault((c, i), t - streams[i][0])
+        t += interval
+    return reqs, found
+
+
+def run_adaptive(chans, interval, t0, t1, measure_from, rng):
+    sched = PollScheduler(LiveHistory(None), interval)
+    for c in chans: sched.add(c, t0 + rng.uniform(0, interval))
+    reqs = 0; found = {}; t = t0
+    while t < t1:
+        due = sched.due(now=t)
+        if due and t >= measure_from: reqs += math.ceil(len(due) / 100)
+        for c in due:
+            streams, starts = chans[c]; i = live_at(streams, starts, t)
+            info = {"live": False}
+            if i is not None:
+                s = streams[i][0]
+                info = {"live": True, "id": f"{c}-{i}", "started": datetime.fromtimestamp(s, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+                if t >= measure_from: found.setdefault((c, i), t - s)
+            sched.update(c, info, now=t)
+        # 與實際的 SCHED_TICK_MS 相同，最小以 1 秒前進
+        t += max(1.0, math.ceil(sched.next_wake(now=t) or interval))
+    return reqs, found
+
+
+def first_poll(n, interval):
+    """剛查詢完一輪 (額度用完) 後加入與 expedite 頻道，回傳各自等到第一次查詢的秒數"""
+    sched = PollScheduler(LiveHistory(None), interval); t = START
+    for i in range(n): sched.add(f"ch{i:05d}", t)
+    for c in sched.due(now=t): sched.update(c, {"live": False}, now=t)
+    t += 1; sched.add("new", t); sched.expedite(["ch00000"]); asked = t; waits = {}
+    while len(waits) < 2 and t < asked + 2 * interval:
+        for c in sched.due(now=t):
+            if c in ("new", "ch00000"): waits.setdefault(c, t - asked)
+            sched.update(c, {"live": False}, now=t)
+        t += max(1.0, math.ceil(sched.next_wake(now=t) or interval))
+    return {"added": waits.get("new"), "expedited": waits.get("ch00000")}
+
+
+def report(name, reqs, found, days):
+    d = list(found.values())
+    print(f"  {name:<10}: {reqs / days:8.0f} requests/day   delay mean {statistics.mean(d):6.1f}s  p50 {pct(d, .5):6.1f}s  p95 {pct(d, .95):6.1f}s  max {max(d):6.1f}s  ({len(d)} go-lives)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--channels", type=int, default=200)
+    ap.add_argument("--interval", type=int, default=60, help="基本檢查間隔 (秒)")
+    ap.add_argument("--weeks", type=int, default=5, help="模擬週數，最後一週列入統計")
+    ap.add_argument("--extra-pct", type=float, default=10, help="每週出現一次不定時開台的機率 (%%)")
+    ap.add_argument("--seed", type=int, default=1)
+    a = ap.parse_args()
+
+    rng = random.Random(a.seed); random.seed(a.seed)
+    chans = {}
+    for i in range(a.channels):
+        streams = make_streams(rng, a.weeks, a.extra_pct); chans[f"ch{i:05d}"] = (streams, [s for s, _ in streams])
+    t_end = START + a.weeks * WEEK; t_measure = t_end - WEEK
+    # 只計算最後一週內開始的直播
+    last = lambda found: {k: v for k, v in found.items() if chans[k[0]][0][k[1]][0] >= t_measure}
+
+    print(f"{a.channels} channels, base interval {a.interval}s, {a.weeks} weeks simulated (last week measured)")
+    fixed, found = run_fixed(chans, a.interval, t_measure, t_end); report("fixed", fixed, last(found), 7)
+    reqs, found = run_adaptive(chans, a.interval, START, t_end, t_measure, rng); report("adaptive", reqs, last(found), 7)
+    # 請求數不得多於固定間隔輪詢 (頻道不多時一次請求就查完全部，只能靠額度限制查詢頻率)
+    print(f"  adaptive / fixed requests: {reqs / fixed:.2f}")
+    waits = first_poll(a.channels, a.interval)
+    print(f"  first poll after add {waits['added']}s, after expedite {waits['expedited']}s")
+    fail = reqs > fixed
+    if fail: print("  FAIL: adaptive polling sent more requests than fixed")
+    if any(w is None or w > 1 for w in waits.values()): print("  FAIL: added / expedited channels waited for the request budget"); fail = True
+    if fail: sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
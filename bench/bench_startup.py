@@ -0,0 +1,57 @@
+"""量測各種啟動方式的冷啟動時間 (子程序從啟動到結束的牆鐘時間，取中位數)。
+
+    python bench/bench_startup.py --runs 10
+    python bench/bench_startup.py --repo /path/to/old/checkout --pythonpath /path/to/fake_winreg
+
+--repo 指向另一份原始碼 (例如改版前的 git archive) 以比較前後差異；
+在非 Windows 上量測舊版時，需以 --pythonpath 提供一個假的 winreg 模組。
+沒有 twitch_core 的舊版會略過 --headless 與核心匯入兩項。
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = [
+    # 名稱, 參數, 是否需要 twitch_core
+    ("internal-streamlink", ["new_twitch_watcher.py", "--internal-streamlink", "--version"], False),
+    ("import GUI module", ["-c", "import new_twitch_watcher"], False),
+    ("--headless --help", ["new_twitch_watcher.py", "--headless", "--help"], True),
+    ("import twitch_core.engine", ["-c", "import twitch_core.engine"], True),
+    ("python -c pass", ["-c", "pass"], False),
+]
+
+
+def measure(repo, args, runs, env):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=repo, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repo", default=ROOT, help="要量測的原始碼目錄")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--pythonpath", default="", help="額外加入 PYTHONPATH 的目錄")
+    a = ap.parse_args()
+
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (a.repo, a.pythonpath, env.get("PYTHONPATH", "")) if p)
+    core = os.path.isdir(os.path.join(a.repo, "twitch_core"))
+    print(f"{a.repo}: median of {a.runs} runs")
+    for name, args, need_core in SCENARIOS:
+        if need_core and not core: continue
+        measure(a.repo, args, 1, env)  # 暖機：讓 .pyc 與檔案快取就緒
+        t = measure(a.repo, args, a.runs, env)
+        print(f"  {name:<26}: median {statistics.median(t):7.1f} ms   min {min(t):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
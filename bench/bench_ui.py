@@ -0,0 +1,115 @@
+"""比較舊的 QTableWidget 整表重建 / QListWidget 逐列搜尋與 ChannelModel 差異更新在大量頻道下每個 tick 的 UI 成本。
+
+    QT_QPA_PLATFORM=offscreen python bench/bench_ui.py --channels 5000 --change-pct 5
+
+每個 tick 有 change-pct% 的頻道開台或下播 (標題跟著改變)，其餘頻道的狀態不變；
+另外模擬錄影端每個 tick 收到 --logs 次狀態訊息。計時包含 processEvents() 的重繪。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6 import QtWidgets
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
+from new_twitch_watcher import ChannelModel, _channel_view
+
+
+class OldWatcher:
+    # 舊版 WatcherWidget._res：每次結果都清空並重建整張 QTableWidget
+    def __init__(self, logins):
+        self.logins = logins; self.st = {}
+        self.tbl = QtWidgets.QTableWidget(0, 3); self.tbl.setHorizontalHeaderLabels(["頻道", "狀態", "標題"]); self.tbl.resize(900, 700); self.tbl.show()
+
+    def res(self, d):
+        self.st.update(d); self.tbl.setRowCount(0)
+        for l in self.logins:
+            i = self.st.get(l)
+            if not i: continue
+            r = self.tbl.rowCount(); self.tbl.insertRow(r); self.tbl.setItem(r, 0, QtWidgets.QTableWidgetItem(l))
+            st = QtWidgets.QTableWidgetItem("LIVE" if i['live'] else "Offline"); st.setForeground(QColor("#aef1b9" if i['live'] else "#95a2b3")); self.tbl.setItem(r, 1, st)
+            self.tbl.setItem(r, 2, QtWidgets.QTableWidgetItem(i['title']))
+
+
+class OldRecorder:
+    # 舊版 RecorderWidget.upd_ui：每則狀態訊息逐列掃描 QListWidget
+    def __init__(self, logins):
+        self.lst = QtWidgets.QListWidget(); self.lst.resize(500, 700)
+        for s in logins:
+            it = QtWidgets.QListWidgetItem(f"{s} - 準備中"); it.setData(Qt.ItemDataRole.UserRole, s); self.lst.addItem(it)
+        self.lst.show()
+
+    def upd(self, s, t, c):
+        for i in range(self.lst.count()):
+            it = self.lst.item(i)
+            if it.data(Qt.ItemDataRole.UserRole) == s: it.setText(f"{s} - {t}"); it.setForeground(QColor(c)); break
+
+
+class NewWatcher:
+    def __init__(self, logins):
+        self.model = ChannelModel([("login", "頻道"), ("status", "狀態"), ("title", "標題"), ("del", "")])
+        for l in logins: self.model.add(l)
+        self.tbl = _channel_view(self.model, hide=("del",), sortable=True); self.tbl.resize(900, 700); self.tbl.show()
+        self.tbl.sortByColumn(1, Qt.SortOrder.DescendingOrder)
+
+    def res(self, d):
+        self.model.update_many({l: {"status": "LIVE" if i['live'] else "Offline", "status_color": "#aef1b9" if i['live'] else "#95a2b3", "title": i['title']} for l, i in d.items()})
+
+
+class NewRecorder:
+    def __init__(self, logins):
+        self.model = ChannelModel([("login", "頻道"), ("status", "狀態"), ("del", "")])
+        for s in logins: self.model.add(s, status="準備中")
+        self.lst = _channel_view(self.model, sortable=True); self.lst.resize(500, 700); self.lst.show()
+
+    def upd(self, s, t, c): self.model.update(s, status=t, status_color=c)
+
+
+def run(app, watcher, recorder, ticks, logins, logs, rng):
+    times = []
+    for t in ticks:
+        start = time.perf_counter()
+        watcher.res(t)
+        for s in rng.sample(logins, logs): recorder.upd(s, f"錄影中 {len(times)}", "#00e676")
+        app.processEvents(); times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def report(name, times):
+    print(f"  {name:<6}: per tick median {statistics.median(times):8.2f} ms   max {max(times):8.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--channels", type=int, default=5000)
+    ap.add_argument("--ticks", type=int, default=30)
+    ap.add_argument("--change-pct", type=float, default=5, help="每個 tick 狀態改變的頻道比例 (%%)")
+    ap.add_argument("--logs", type=int, default=20, help="每個 tick 錄影端收到的狀態訊息數")
+    ap.add_argument("--seed", type=int, default=1)
+    a = ap.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    rng = random.Random(a.seed); logins = [f"ch{i:05d}" for i in range(a.channels)]
+    # 第一個 tick 回報全部頻道，之後每次輪詢都回報全部頻道，但只有少數真的改變
+    live = {l: rng.random() < 0.1 for l in logins}; ticks = []
+    for n in range(a.ticks):
+        if n:
+            for l in rng.sample(logins, int(a.channels * a.change_pct / 100)): live[l] = not live[l]
+        ticks.append({l: {"live": v, "title": f"{l} stream" if v else ""} for l, v in live.items()})
+
+    print(f"{a.channels} channels, {a.ticks} ticks, {a.change_pct}% changed per tick, {a.logs} recorder updates per tick")
+    for name, W, R in (("old", OldWatcher, OldRecorder), ("model", NewWatcher, NewRecorder)):
+        w, r = W(logins), R(logins); app.processEvents()
+        times = run(app, w, r, ticks, logins, a.logs, random.Random(a.seed))
+        # 第一個 tick 為初次填表，不列入比較
+        report(name, times[1:])
+        w.tbl.close(); r.lst.close()
+
+
+if __name__ == "__main__":
+    main()
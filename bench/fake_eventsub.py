@@ -0,0 +1,138 @@
+"""本機假 EventSub WebSocket 伺服器，搭配 fake_helix 測試推播模式，不會連到 Twitch。
+
+- 連線後送出 session_welcome，之後每 keepalive 秒送一次 session_keepalive
+- FakeHelix 的 POST /eventsub/subscriptions 會轉到 subscribe()，每個訂閱成本 1，總成本上限 max_cost
+- go_live / go_offline 同時修改 FakeHelix 的開台狀態並推送 notification
+- drop() 直接切斷所有連線 (訂閱隨之失效)，reconnect() 送出 session_reconnect 並保留訂閱
+只用標準函式庫實作 WebSocket 握手與文字框架，足以對應 websocket-client。
+"""
+import json
+import uuid
+import queue
+import base64
+import socket
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _frame(data, opcode=0x1):
+    n = len(data)
+    if n < 126: head = bytes([0x80 | opcode, n])
+    elif n < 65536: head = bytes([0x80 | opcode, 126]) + n.to_bytes(2, "big")
+    else: head = bytes([0x80 | opcode, 127]) + n.to_bytes(8, "big")
+    return head + data
+
+
+class FakeEventSub:
+    def __init__(self, helix, keepalive=10, max_cost=10, port=0):
+        self.helix = helix; helix.eventsub = self
+        self.keepalive = keepalive; self.max_cost = max_cost
+        self.lock = threading.Lock(); self.sessions = {}; self.conns = {}; self.connects = 0
+        self.sock = socket.create_server(("127.0.0.1", port))
+
+    @property
+    def url(self): return f"ws://127.0.0.1:{self.sock.getsockname()[1]}/ws"
+
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def _accept(self):
+        while True:
+            try: c, _ = self.sock.accept()
+            except OSError: return
+            threading.Thread(target=self._serve, args=(c,), daemon=True).start()
+
+    def _msg(self, kind, payload, sub_type=None):
+        meta = {"message_id": uuid.uuid4().hex, "message_type": kind, "message_timestamp": datetime.now(timezone.utc).isoformat()}
+        if sub_type: meta.update({"subscription_type": sub_type, "subscription_version": "1"})
+        return json.dumps({"metadata": meta, "payload": payload})
+
+    def _session(self, sid, status="connected"):
+        return {"session": {"id": sid, "status": status, "keepalive_timeout_seconds": self.keepalive, "reconnect_url": None,
+                            "connected_at": datetime.now(timezone.utc).isoformat()}}
+
+    def _serve(self, c):
+        buf = b""
+        while b"\r\n\r\n" not in buf:
+            d = c.recv(4096)
+            if not d: return c.close()
+            buf += d
+        lines = buf.split(b"\r\n"); path = lines[0].split()[1].decode()
+        key = next(l.split(b":", 1)[1].strip() for l in lines if l.lower().startswith(b"sec-websocket-key"))
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID.encode()).digest()).decode()
+        c.sendall(f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+        # ?reconnect=<session id> 為 session_reconnect 給出的新位址，沿用原本的 session 與訂閱
+        sid = path.split("reconnect=", 1)[1] if "reconnect=" in path else uuid.uuid4().hex
+        q = queue.Queue()
+        with self.lock:
+            self.connects += 1; old = self.conns.get(sid)
+            self.sessions.setdefault(sid, {}); self.conns[sid] = (c, q)
+        q.put(self._msg("session_welcome", self._session(sid)))
+        if old: old[1].put(None)
+        while True:
+            try: m = q.get(timeout=self.keepalive)
+            except queue.Empty: m = self._msg("session_keepalive", {})
+            if m is None: break
+            try: c.sendall(_frame(m.encode()))
+            except OSError: break
+        try: c.sendall(_frame(b"", 0x8))
+        except OSError: pass
+        c.close()
+        with self.lock:
+            # 連線中斷 (非 reconnect 轉移) 時 session 的訂閱全部失效
+            if self.conns.get(sid, (None,))[0] is c: self.conns.pop(sid); self.sessions.pop(sid, None)
+
+    def total_cost(self):
+        with self.lock: return sum(len(s) for s in self.sessions.values())
+
+    def subscribe(self, body):
+        sid = body["transport"]["session_id"]
+        with self.lock:
+            if sid not in self.sessions: return 400, {"error": "Bad Request", "message": "session does not exist"}
+            total = sum(len(s) for s in self.sessions.values())
+            if total + 1 > self.max_cost: return 429, {"error": "Too Many Requests", "message": "max total cost exceeded"}
+            i = uuid.uuid4().hex; self.sessions[sid][i] = (body["type"], body["condition"]["broadcaster_user_id"])
+        sub = {"id": i, "status": "enabled", "type": body["type"], "version": "1", "condition": body["condition"], "cost": 1}
+        return 202, {"data": [sub], "total": total + 1, "total_cost": total + 1, "max_total_cost": self.max_cost}
+
+    def unsubscribe(self, i):
+        with self.lock:
+            for s in self.sessions.values():
+                if s.pop(i, None): return True
+        return False
+
+    def _notify(self, login, sub_type, event):
+        uid = self.helix.user_id(login)
+        with self.lock:
+            for sid, subs in self.sessions.items():
+                for i, (t, u) in subs.items():
+                    if t == sub_type and u == uid and sid in self.conns:
+                        sub = {"id": i, "status": "enabled", "type": t, "version": "1", "condition": {"broadcaster_user_id": u}, "cost": 1}
+                        self.conns[sid][1].put(self._msg("notification", {"subscription": sub, "event": event}, t))
+
+    def go_live(self, login):
+        self.helix.overrides[login] = True
+        self._notify(login, "stream.online", {"id": self.helix.stream_id(login), "broadcaster_user_id": self.helix.user_id(login),
+                                              "broadcaster_user_login": login, "broadcaster_user_name": login, "type": "live",
+                                              "started_at": datetime.now(timezone.utc).isoformat()})
+
+    def go_offline(self, login):
+        self.helix.overrides[login] = False
+        self._notify(login, "stream.offline", {"broadcaster_user_id": self.helix.user_id(login), "broadcaster_user_login": login, "broadcaster_user_name": login})
+
+    def drop(self):
+        with self.lock: conns = list(self.conns.values()); self.conns.clear(); self.sessions.clear()
+        for c, q in conns:
+            try: c.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+            q.put(None)
+
+    def reconnect(self):
+        with self.lock: conns = list(self.conns.items())
+        for sid, (_, q) in conns:
+            p = self._session(sid, "reconnecting"); p["session"]["reconnect_url"] = f"{self.url}?reconnect={sid}"
+            q.put(self._msg("session_reconnect", p))
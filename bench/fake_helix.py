@@ -0,0 +1,120 @@
+"""本機假 Helix 伺服器，供 benchmark 使用，不會連到 Twitch。
+
+- GET  /helix/streams : 依 login 的 crc32 決定是否開台 (比例由 live_pct 控制)，started_at 為第一次被查到開台的時間
+- GET  /helix/users   : 以 login 的 crc32 當作 user id
+- POST /oauth2/token  : 等待 token_latency 秒後發出新的假 Token (有效 token_ttl 秒)
+  check_tokens 時 /helix 的 GET 只接受未過期的 Token，其餘回 401；另有 auth_fail_pct% 的機率回 401
+- GET  /oauth2/validate : 回傳固定的 client_id
+- POST / DELETE /helix/eventsub/subscriptions : 轉給 fake_eventsub.FakeEventSub
+每個新連線先等待 connect_latency 秒以模擬 TLS 交握，每個請求再等待 latency 秒。
+GET 請求依 Twitch 的 token bucket 規則扣額度 (每分鐘 limit 點，持續回補)，並回傳
+Ratelimit-Limit / Remaining / Reset 標頭；額度用完回 429，另有 fail_pct% 的機率回 503。
+"""
+import json
+import time
+import zlib
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeHelixHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock: self.server.connections += 1
+        time.sleep(self.server.connect_latency)
+
+    def log_message(self, *args): pass
+
+    def _send(self, code, obj, headers=None):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items(): self.send_header(k, str(v))
+        self.end_headers(); self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        ok, rl = self.server.take()
+        if not ok: return self._send(429, {"error": "Too Many Requests"}, rl)
+        if "/helix/" in self.path and not self.server.authorized(self.headers.get("Authorization", "")):
+            return self._send(401, {"error": "Unauthorized", "status": 401, "message": "Invalid OAuth token"}, rl)
+        if random.random() * 100 < self.server.fail_pct: return self._send(503, {"error": "Service Unavailable"}, rl)
+        u = urlparse(self.path); q = parse_qs(u.query)
+        if u.path.endswith("/validate"): return self._send(200, {"client_id": "fake-client", "login": "fake", "user_id": "1", "scopes": [], "expires_in": 3600})
+        if u.path.endswith("/users"):
+            return self._send(200, {"data": [{"id": self.server.user_id(l), "login": l} for l in q.get("login", [])]}, rl)
+        if not u.path.endswith("/streams"): return self._send(404, {"error": "Not Found"}, rl)
+        data = [{"user_login": l, "id": self.server.stream_id(l), "title": f"{l} live", "started_at": self.server.started_at(l)}
+                for l in q.get("user_login", []) if self.server.is_live(l)]
+        self._send(200, {"data": data}, rl)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/eventsub/subscriptions"): return self._send(*self.server.eventsub.subscribe(json.loads(body)))
+        time.sleep(self.server.token_latency)
+        with self.server.lock:
+            self.server.token_requests += 1; n = self.server.token_requests; self.server.issued[f"fake-token-{n}"] = time.time() + self.server.token_ttl
+        self._send(200, {"access_token": f"fake-token-{n}", "expires_in": self.server.token_ttl})
+
+    def do_DELETE(self):
+        i = parse_qs(urlparse(self.path).query).get("id", [""])[0]
+        if not self.server.eventsub.unsubscribe(i): return self._send(404, {"error": "Not Found"})
+        self.send_response(204); self.send_header("Content-Length", "0"); self.end_headers()
+
+
+class FakeHelix(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, connect_latency=0.1, live_pct=5, limit=800, fail_pct=0, token_latency=0, token_ttl=3600, port=0,
+                 check_tokens=False, auth_fail_pct=0):
+        super().__init__(("127.0.0.1", port), FakeHelixHandler)
+        self.latency = latency; self.connect_latency = connect_latency; self.live_pct = live_pct; self.fail_pct = fail_pct
+        self.token_latency = token_latency; self.token_ttl = token_ttl; self.overrides = {}; self.started = {}; self.eventsub = None
+        self.check_tokens = check_tokens; self.auth_fail_pct = auth_fail_pct; self.issued = {}
+        self.lock = threading.Lock(); self.connections = 0; self.requests = 0; self.throttled = 0; self.token_requests = 0; self.unauthorized = 0
+        self.limit = limit; self.tokens = float(limit); self.stamp = time.monotonic()
+
+    def take(self):
+        with self.lock:
+            self.requests += 1; now = time.monotonic()
+            self.tokens = min(self.limit, self.tokens + (now - self.stamp) * self.limit / 60); self.stamp = now
+            ok = self.tokens >= 1
+            if ok: self.tokens -= 1
+            else: self.throttled += 1
+            reset = time.time() + (self.limit - self.tokens) * 60 / self.limit
+            return ok, {"Ratelimit-Limit": self.limit, "Ratelimit-Remaining": int(self.tokens), "Ratelimit-Reset": int(reset)}
+
+    def authorized(self, auth):
+        tk = auth[7:] if auth.startswith("Bearer ") else ""
+        with self.lock:
+            ok = not self.check_tokens or self.issued.get(tk, 0) > time.time()
+            if ok and random.random() * 100 < self.auth_fail_pct: ok = False
+            if not ok: self.unauthorized += 1
+        return ok
+
+    def set_live(self, logins, live=True):
+        # 指定開台的頻道 (蓋過 live_pct)
+        with self.lock: self.overrides.update((l, live) for l in logins)
+
+    @property
+    def base(self): return f"http://127.0.0.1:{self.server_address[1]}/helix"
+
+    def is_live(self, login): return self.overrides.get(login, zlib.crc32(login.encode()) % 100 < self.live_pct)
+
+    def started_at(self, login):
+        # 第一次被查到開台的時間當作直播開始時間
+        with self.lock: t = self.started.setdefault(login, time.time())
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t))
+
+    def user_id(self, login): return str(zlib.crc32(login.encode()))
+
+    def stream_id(self, login): return str(zlib.crc32(login.encode()) ^ 0x5f5f)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
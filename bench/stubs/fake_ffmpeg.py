@@ -0,0 +1,123 @@
+"""假 ffmpeg / ffprobe：依錄影程式用到的指令模擬輸出，處理合成資料而不真的編碼。
+
+    fake_ffmpeg.py [ffmpeg 參數]            # 以 ffmpeg 身分執行
+    fake_ffmpeg.py --ffprobe [ffprobe 參數] # 以 ffprobe 身分執行
+
+- 從 pipe:0 讀取 (直寫 MP4 / 分段錄影)：照原樣寫到輸出檔，-f segment 時依 -segment_time 切檔
+- -f concat：把清單中的檔案接在一起
+- 輸出為 - (驗證解碼)：檢查輸入存在後結束
+- 其他 (壓縮)：依輸入時長以 FAKE_FF_SPEED 倍速處理，輸出 ffmpeg 格式的進度行 (含 speed=)，
+  輸出檔大小為輸入 × 壓縮比 (libx264 為 FAKE_FF_RATIO，-c copy 為 1，-vn 為 0.05)
+- ffprobe 的 format=duration：輸出檔結尾的 FAKEDUR 標記，沒有時以 FAKE_MEDIA_BPS 換算
+
+環境變數：
+- FAKE_MEDIA_BPS  與 fake_streamlink 相同的位元率 (預設 250000 B/s)
+- FAKE_FF_SPEED   壓縮速度 (×即時，預設 libx264 為 20、複製為 200)
+- FAKE_FF_RATIO   libx264 的壓縮比 (預設 0.45)
+- FAKE_FF_BURN    每秒影片要消耗的 CPU 秒數；> 0 時改為真的佔用 CPU (-threads 個子程序，預設全部核心，
+                  與本程序同一個程序群組，本程序結束時跟著結束)，速度由實際取得的 CPU 決定，用來模擬滿載的編碼
+"""
+import os
+import sys
+import time
+import multiprocessing
+
+TRAILER = b"\nFAKEDUR="
+
+
+def arg(argv, flag, default=None):
+    return argv[argv.index(flag) + 1] if flag in argv and argv.index(flag) + 1 < len(argv) else default
+
+
+def bps(): return int(os.environ.get("FAKE_MEDIA_BPS", "250000"))
+
+
+def duration(path):
+    with open(path, "rb") as f:
+        size = f.seek(0, 2); f.seek(max(0, size - 64)); tail = f.read()
+    i = tail.rfind(TRAILER)
+    return float(tail[i + len(TRAILER):].strip() or 0) if i >= 0 else size / bps()
+
+
+def ffprobe(argv):
+    path = argv[-1]
+    if not os.path.exists(path): print(f"{path}: No such file or directory", file=sys.stderr); return 1
+    print(f"{duration(path):.6f}"); return 0
+
+
+def stamp(sec): return f"{int(sec // 3600):02d}:{int(sec % 3600 // 60):02d}:{sec % 60:05.2f}"
+
+
+def burn(total, parent):
+    # 編碼「執行緒」：持續消耗 CPU 並把用掉的 CPU 秒數累加到 total，被降低優先權時累加得較慢；父程序結束 (被終止) 時跟著結束
+    while os.getppid() == parent:
+        t = time.process_time(); sum(range(20000))
+        with total.get_lock(): total.value += time.process_time() - t
+
+
+def mux(argv, out):
+    # 直寫 MP4 / 分段錄影：stdin 照原樣寫出，分段時每 segment_time 秒的資料量切一個檔
+    seg = float(arg(argv, "-segment_time", 0)) * bps() if arg(argv, "-f") == "segment" else 0
+    src = sys.stdin.buffer; idx = 0; written = 0
+    f = open(out % idx if seg else out, "wb")
+    while True:
+        data = src.read1(65536) if hasattr(src, "read1") else src.read(65536)
+        if not data: break
+        f.write(data); f.flush(); written += len(data)
+        if seg and written >= seg: f.close(); idx += 1; written = 0; f = open(out % idx, "wb")
+    f.close(); return 0
+
+
+def concat(lst, out):
+    with open(out, "wb") as o, open(lst, encoding="utf-8") as f:
+        total = 0.0
+        for line in f:
+            p = line.strip()[6:-1].replace("'\\''", "'")
+            if not p: continue
+            total += duration(p)
+            with open(p, "rb") as i:
+                data = i.read(); k = data.rfind(TRAILER); o.write(data[:k] if k >= 0 else data)
+        o.write(TRAILER + f"{total:.3f}\n".encode())
+    return 0
+
+
+def transcode(argv, src, out):
+    enc = arg(argv, "-c:v") == "libx264"; audio = "-vn" in argv
+    ratio = 0.05 if audio else float(os.environ.get("FAKE_FF_RATIO", "0.45")) if enc else 1.0
+    speed = float(os.environ.get("FAKE_FF_SPEED", "20" if enc else "200")); cost = float(os.environ.get("FAKE_FF_BURN", "0")) if enc else 0
+    threads = int(arg(argv, "-threads", 0)) or os.cpu_count() or 1
+    dur = duration(src); size = os.path.getsize(src)
+    print("ffmpeg version 6.1-fake Copyright (c) 2000-2023 the FFmpeg developers", file=sys.stderr)
+    print(f"Input #0, mpegts, from '{src}':\n  Duration: {stamp(dur)}, start: 0.000000, bitrate: {bps() * 8 // 1000} kb/s", file=sys.stderr)
+    print(f"Output #0, {'ipod' if audio else 'mp4'}, to '{out}':", file=sys.stderr, flush=True)
+    start = time.monotonic(); done = 0.0; step = max(min(dur / 50, 1.0), 0.001)
+    total = multiprocessing.Value("d", 0.0); workers = []
+    if cost:
+        workers = [multiprocessing.Process(target=burn, args=(total, os.getpid()), daemon=True) for _ in range(threads)]
+        for w in workers: w.start()
+    with open(out, "wb") as o:
+        while done < dur:
+            n = min(step, dur - done)
+            if cost:
+                while total.value < (done + n) * cost: time.sleep(0.02)
+            else: time.sleep(n / speed)
+            done += n; o.write(b"\0" * int(size * ratio * n / dur)); el = max(time.monotonic() - start, 1e-6)
+            print(f"frame={int(done * 60):6d} fps={done * 60 / el:5.0f} q=28.0 size={int(o.tell() / 1024):8d}kB time={stamp(done)} "
+                  f"bitrate={bps() * 8 * ratio / 1000:7.1f}kbits/s speed={done / el:.3g}x", end="\r", file=sys.stderr, flush=True)
+        o.write(TRAILER + f"{dur:.3f}\n".encode())
+    print(f"\nvideo:{int(size * ratio * 0.9 / 1024)}kB audio:{int(size * ratio * 0.1 / 1024)}kB muxing overhead: 0.1%", file=sys.stderr)
+    return 0
+
+
+def main(argv):
+    if argv and argv[0] == "--ffprobe": return ffprobe(argv[1:])
+    src = arg(argv, "-i"); out = argv[-1]
+    if src == "pipe:0": return mux(argv, out)
+    if arg(argv, "-f") == "concat": return concat(src, out)
+    if not src or not os.path.exists(src): print(f"{src}: No such file or directory", file=sys.stderr); return 1
+    if out == "-": return 0
+    return transcode(argv, src, out)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
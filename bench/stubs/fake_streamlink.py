@@ -0,0 +1,61 @@
+"""假 streamlink：輸出與 streamlink 相同格式的日誌，並以固定位元率寫出合成的 MPEG-TS 封包，不會連網。
+
+    fake_streamlink.py [--twitch-disable-ads] [--ffmpeg-ffmpeg PATH] URL QUALITY (-o FILE | -O)
+
+環境變數：
+- FAKE_MEDIA_BPS    每秒寫出的位元組數 (預設 250000，約 2 Mbps)，fake_ffmpeg 以同樣的值換算時長
+- FAKE_SL_DURATION  直播長度 (秒)，時間到輸出 Stream ended 後正常結束；0 為直到被終止 (預設)
+- FAKE_SL_STARTUP   輸出 Opening stream 前的延遲 (秒，模擬取得播放清單與 HLS 緩衝，預設 1)
+- FAKE_SL_OFFLINE   以逗號分隔、視為未開台的頻道
+- FAKE_SL_CPU       每秒影片消耗的 CPU 秒數 (模擬 HLS 下載、解密與重新封裝，預設 0)；搶不到 CPU 時寫入會落後
+- FAKE_SL_WINDOW    直播播放清單保留的秒數 (預設 6)：落後超過這麼久時，已從清單移除的資料直接跳過 (與 streamlink 的
+                    Skipped segments 相同)，錄影檔永久缺少這段；0 為不丟棄，落後多少都之後補寫
+"""
+import os
+import sys
+import time
+import random
+
+TICK = 0.25
+
+
+def log(m): print(m, file=sys.stderr, flush=True)
+
+
+def main(argv):
+    out = argv[argv.index("-o") + 1] if "-o" in argv else None
+    url = next(a for a in argv if a.startswith("http")); channel = url.rstrip("/").rsplit("/", 1)[-1]
+    qual = argv[argv.index(url) + 1] if argv.index(url) + 1 < len(argv) else "best"
+    bps = int(os.environ.get("FAKE_MEDIA_BPS", "250000")); duration = float(os.environ.get("FAKE_SL_DURATION", "0"))
+    log(f"[cli][info] Found matching plugin twitch for URL {url}")
+    time.sleep(float(os.environ.get("FAKE_SL_STARTUP", "1")))
+    if channel in os.environ.get("FAKE_SL_OFFLINE", "").split(","):
+        log(f"error: No playable streams found on this URL: {url}"); return 1
+    log("[cli][info] Available streams: audio_only, 160p (worst), 360p30, 480p30, 720p60, 1080p60 (best)")
+    log(f"[cli][info] Opening stream: {'1080p60' if qual == 'best' else qual} (hls)")
+    if out: log(f"[cli][info] Writing output to\n{os.path.abspath(out)}")
+    # 188 位元組、以 0x47 同步位元組開頭的 TS 封包
+    rng = random.Random(channel); pkt = b"\x47" + bytes(rng.getrandbits(8) for _ in range(187))
+    chunk = pkt * max(1, int(bps * TICK) // 188)
+    f = open(out, "wb") if out else sys.stdout.buffer
+    cost = float(os.environ.get("FAKE_SL_CPU", "0")) * TICK; window = int(float(os.environ.get("FAKE_SL_WINDOW", "6")) / TICK)
+    start = time.monotonic(); n = 0
+    try:
+        while not duration or n * TICK < duration:
+            if cost:
+                end = time.process_time() + cost
+                while time.process_time() < end: sum(range(1000))
+            # 依牆鐘時間補寫：被搶走 CPU 時之後連續寫出 (與 HLS 一次下載多個分段相同)，但只補得回播放清單裡還有的部分
+            f.write(chunk); f.flush(); n += 1
+            due = int((time.monotonic() - start) / TICK)
+            if window and due - n > window:
+                log(f"[stream.hls][warning] Skipped segments {n}-{due - window - 1} after playlist reload. This is unsupported and will result in incomplete output.")
+                n = due - window
+            time.sleep(max(0.0, start + n * TICK - time.monotonic()))
+    except (BrokenPipeError, KeyboardInterrupt): return 0
+    log("[cli][info] Stream ended"); log("[cli][info] Closing currently open stream...")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,16 +1,9 @@
 import sys
-import os
-import time
-import json
-import subprocess
-import webbrowser
-import winreg
-from pathlib import Path
-from datetime import datetime
 
 # ==========================================
 # 核心魔法: 內建 Streamlink CLI 模式
 # ==========================================
+# 放在其他 import 之前：每個錄影都以這個模式重新啟動本程式，不必載入 PyQt6 與核心模組
 if len(sys.argv) > 1 and sys.argv[1] == "--internal-streamlink":
     sys.argv.pop(1)
     try:
@@ -20,31 +13,28 @@ if len(sys.argv) > 1 and sys.argv[1] == "--internal-streamlink":
         print(f"Internal Error: {e}")
         sys.exit(1)
 
-import requests
+# 無介面模式：核心 (twitch_core) 不依賴 Qt，可在沒有桌面環境的伺服器上執行
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    from twitch_core.cli import main
+    sys.exit(main(sys.argv[1:]))
+
+import os
+import collections
+from datetime import datetime
+
 from PyQt6 import QtCore, QtGui, QtWidgets
-from PyQt6.QtCore import QThread, pyqtSignal, Qt, QRect, QPointF
-from PyQt6.QtGui import QAction, QColor, QBrush, QPainter, QPen, QPainterPath, QIntValidator
+from PyQt6.QtCore import pyqtSignal, Qt, QRect, QPointF
+from PyQt6.QtGui import QColor, QBrush, QPainter, QPen, QPainterPath, QIntValidator
 
-# ================= 路徑與環境設定 =================
-if getattr(sys, 'frozen', False):
-    BASE_DIR = Path(sys.executable).parent 
-    if hasattr(sys, '_MEIPASS'):
-        RESOURCE_DIR = Path(sys._MEIPASS)
-    else:
-        RESOURCE_DIR = BASE_DIR
-else:
-    BASE_DIR = Path(__file__).parent.resolve()
-    RESOURCE_DIR = BASE_DIR
+# 路徑、常數與開台偵測 / 錄影 / 壓縮的邏輯都在 twitch_core，這裡只有介面
+from twitch_core.config import RESOURCE_DIR, LOG_DIR, COMPRESS_PROFILES, VERIFY_MODES, X264_PRESETS, RECORD_MODES, RESOURCE_DEFAULTS
+from twitch_core.store import LogArchive
+from twitch_core.engine import Engine
 
-CONFIG_WATCHER_PATH = BASE_DIR / "twitch_watcher_config.json"
-RECORDER_CONFIG_PATH = BASE_DIR / "recorder_config.json"
 ICON_PATH = (RESOURCE_DIR / "twitch_icon.png").as_posix()
-# 確保路徑是絕對路徑，避免相對路徑錯誤
-FFMPEG_PATH = str((RESOURCE_DIR / "ffmpeg.exe").resolve())
-
-TWITCH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
-TWITCH_HELIX_STREAMS = "https://api.twitch.tv/helix/streams"
-TOKEN_REFRESH_BUFFER_SEC = 300
+UI_FLUSH_MS = 33
+LOG_MAX_LINES = 1000  # 日誌畫面保留的行數
+ENC_PRIORITIES = [("一般", 0, ""), ("較低", 10, "best-effort:7"), ("最低 (閒置)", 19, "idle")]  # 壓縮優先權選項：名稱, nice, ionice
 APP_NAME = "TwitchAllInOne"
 REG_PATH = r"Software\Microsoft\Windows\CurrentVersion\Run"
 
@@ -58,12 +48,10 @@ STYLESHEET = """
     QPushButton#btn_browse { padding: 4px; font-size: 18px; }
     QPushButton#btn_add { background-color: #00e676; color: #000; }
     QPushButton#btn_add:hover { background-color: #00c853; }
-    QListWidget, QTableWidget { background-color: #0e0e10; border: 2px solid #3a3a3d; border-radius: 6px; padding: 5px; font-size: 15px; outline: none; }
-    QListWidget::item, QTableWidget::item { border-bottom: 1px solid #26262c; padding: 4px; }
-    QListWidget::item:selected, QTableWidget::item:selected { background-color: #263241; border: none; }
+    QTableView { background-color: #0e0e10; border: 2px solid #3a3a3d; border-radius: 6px; padding: 5px; font-size: 15px; outline: none; }
+    QTableView::item { border-bottom: 1px solid #26262c; padding: 4px; }
+    QTableView::item:selected { background-color: #263241; border: none; }
     QHeaderView::section { background: #161a20; color: #cfd7e3; padding: 6px; border: none; border-right: 1px solid #2a2f36; }
-    QPushButton#btn_row_del { background-color: transparent; color: #ef5350; font-weight: 900; font-size: 16px; border: none; padding: 0px; }
-    QPushButton#btn_row_del:hover { color: #ff1744; background-color: rgba(255, 23, 68, 0.1); border-radius: 4px; }
     QTabWidget::pane { border: 1px solid #3a3a3d; background: #18181b; border-radius: 6px; }
     QTabBar::tab { background: #26262c; color: #adadb8; padding: 10px 20px; border-top-left-radius: 6px; border-top-right-radius: 6px; margin-right: 2px; }
     QTabBar::tab:selected { background: #9146FF; color: white; font-weight: bold; }
@@ -91,308 +79,261 @@ class ModernCheckBox(QtWidgets.QCheckBox):
             p.drawPath(path)
         p.end()
 
-class RecorderItemWidget(QtWidgets.QWidget):
-    def __init__(self, text, cb):
-        super().__init__(); layout = QtWidgets.QHBoxLayout(self); layout.setContentsMargins(10,5,5,5); layout.setSpacing(10)
-        self.label = QtWidgets.QLabel(text); self.label.setStyleSheet("border:none;background:transparent;color:#adadb8;"); layout.addWidget(self.label); layout.addStretch()
-        self.btn = QtWidgets.QPushButton("✕"); self.btn.setObjectName("btn_row_del"); self.btn.setFixedSize(30,30); self.btn.setCursor(Qt.CursorShape.PointingHandCursor); self.btn.clicked.connect(cb); layout.addWidget(self.btn)
-    def update_text(self, t, c): self.label.setText(t); self.label.setStyleSheet(f"border:none;background:transparent;color:{c};")
-
-class CompressThread(QThread):
-    log_signal = pyqtSignal(str, str, int)
-    finished_signal = pyqtSignal(str, str, bool)  # sid, filepath, success
-    def __init__(self, sid, ts_path, keep_original):
-        super().__init__()
-        self.sid = sid
-        self.ts_path = ts_path
-        self.keep_original = keep_original
-    def run(self):
-        if not os.path.exists(self.ts_path):
-            self.log_signal.emit(self.sid, "❌ 檔案不存在", 2)
-            self.finished_signal.emit(self.sid, self.ts_path, False)
-            return
-        mp4_path = self.ts_path.rsplit('.', 1)[0] + '.mp4'
-        self.log_signal.emit(self.sid, "🔄 壓縮中...", 0)
-        try:
-            cmd = [
-                FFMPEG_PATH, '-i', self.ts_path,
-                '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
-                '-c:a', 'aac', '-b:a', '128k',
-                '-movflags', '+faststart',
-                '-y', mp4_path
-            ]
-            si = subprocess.STARTUPINFO()
-            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=si)
-            proc.communicate()
-            if proc.returncode == 0 and os.path.exists(mp4_path):
-                # 驗證 MP4 可播放
-                verify_cmd = [FFMPEG_PATH, '-v', 'error', '-i', mp4_path, '-f', 'null', '-']
-                verify_proc = subprocess.Popen(verify_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=si)
-                _, verify_err = verify_proc.communicate()
-                if verify_proc.returncode == 0:
-                    ts_size = os.path.getsize(self.ts_path) / (1024*1024)
-                    mp4_size = os.path.getsize(mp4_path) / (1024*1024)
-                    saved = ((ts_size - mp4_size) / ts_size * 100) if ts_size > 0 else 0
-                    self.log_signal.emit(self.sid, f"✅ 壓縮完成 (節省 {saved:.1f}%)", 0)
-                    if not self.keep_original:
-                        try:
-                            os.remove(self.ts_path)
-                            self.log_signal.emit(self.sid, "🗑️ 已刪除原始檔", 0)
-                        except Exception as e:
-                            self.log_signal.emit(self.sid, f"⚠️ 刪除原始檔失敗: {str(e)}", 2)
-                    self.finished_signal.emit(self.sid, mp4_path, True)
-                else:
-                    self.log_signal.emit(self.sid, "❌ MP4 驗證失敗，保留原始檔", 2)
-                    try:
-                        os.remove(mp4_path)
-                    except:
-                        pass
-                    self.finished_signal.emit(self.sid, self.ts_path, False)
-            else:
-                self.log_signal.emit(self.sid, "❌ 壓縮失敗", 2)
-                self.finished_signal.emit(self.sid, self.ts_path, False)
-        except Exception as e:
-            self.log_signal.emit(self.sid, f"❌ 壓縮錯誤: {str(e)}", 2)
-            self.finished_signal.emit(self.sid, self.ts_path, False)
-
-class RecorderThread(QThread):
-    log_signal = pyqtSignal(str, str, int)
-    compress_signal = pyqtSignal(str, str)  # sid, filepath
-    def __init__(self, sid, qual, folder):
-        super().__init__(); self.sid = sid; self.qual = qual; self.folder = folder; self.run_flag = True; self.proc = None
-    def run(self):
-        self.log_signal.emit(self.sid, "啟動監控...", 0)
-        while self.run_flag:
-            s_folder = os.path.join(self.folder, self.sid)
-            if not os.path.exists(s_folder):
-                try: os.makedirs(s_folder)
-                except: s_folder = self.folder
-            fname = f"{self.sid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ts"
-            fpath = os.path.join(s_folder, fname)
-            url = f"https://www.twitch.tv/{self.sid}"
-
-            # === 修正重點：強制指定 FFmpeg 路徑 ===
-            ffmpeg_args = []
-            if os.path.exists(FFMPEG_PATH):
-                ffmpeg_args = ["--ffmpeg-ffmpeg", FFMPEG_PATH]
-
-            if getattr(sys, 'frozen', False):
-                cmd = [sys.executable, "--internal-streamlink", "--twitch-disable-ads"] + ffmpeg_args + [url, self.qual, "-o", fpath]
-            else:
-                cmd = [sys.executable, "-m", "streamlink", "--twitch-disable-ads"] + ffmpeg_args + [url, self.qual, "-o", fpath]
-
-            try:
-                si = subprocess.STARTUPINFO(); si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                # 將 stderr 也導向 PIPE 以便分析
-                self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=si, text=True, encoding='utf-8', errors='replace')
-                
-                time.sleep(2)
-                # 只要程序還在跑，就代表錄影中
-                if self.proc.poll() is None: self.log_signal.emit(self.sid, "🔴 錄影中", 1)
-                
-                stdout, stderr = self.proc.communicate()
-
-                # 檢查是否有錄到內容（無論是正常結束還是手動停止）
-                has_content = os.path.exists(fpath) and os.path.getsize(fpath) > 0
+class ChannelModel(QtCore.QAbstractTableModel):
+    """頻道清單的資料模型：以 login -> 列號索引直接定位，只對內容有變化的列發出 dataChanged。
+    columns 為 [(欄位, 標題)]，欄位 "del" 顯示刪除鈕；"<欄位>_color" 為該欄的文字顏色"""
+    def __init__(self, columns, parent=None):
+        super().__init__(parent); self.keys = [k for k, _ in columns]; self.titles = [t for _, t in columns]
+        self.rows = []; self.pos = {}; self.colors = {}
+    def rowCount(self, parent=QtCore.QModelIndex()): return 0 if parent.isValid() else len(self.rows)
+    def columnCount(self, parent=QtCore.QModelIndex()): return 0 if parent.isValid() else len(self.keys)
+    def headerData(self, sec, orient, role=Qt.ItemDataRole.DisplayRole):
+        if orient == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole: return self.titles[sec]
+    def data(self, idx, role=Qt.ItemDataRole.DisplayRole):
+        r = self.rows[idx.row()]; k = self.keys[idx.column()]
+        if role == Qt.ItemDataRole.DisplayRole: return "✕" if k == "del" else r.get(k, "")
+        if role == Qt.ItemDataRole.ForegroundRole:
+            c = "#ef5350" if k == "del" else r.get(k + "_color")
+            if c: return self.colors.get(c) or self.colors.setdefault(c, QColor(c))
+        elif role == Qt.ItemDataRole.TextAlignmentRole and k == "del": return Qt.AlignmentFlag.AlignCenter
+        elif role == Qt.ItemDataRole.UserRole: return r["login"]
+        return None
+    def __contains__(self, login): return login in self.pos
+    def logins(self): return [r["login"] for r in self.rows]
+    def add(self, login, **vals):
+        if login in self.pos: return False
+        n = len(self.rows); self.beginInsertRows(QtCore.QModelIndex(), n, n)
+        self.rows.append(dict(vals, login=login)); self.pos[login] = n; self.endInsertRows(); return True
+    def remove(self, login):
+        n = self.pos.pop(login, None)
+        if n is None: return False
+        self.beginRemoveRows(QtCore.QModelIndex(), n, n); del self.rows[n]
+        for i in range(n, len(self.rows)): self.pos[self.rows[i]["login"]] = i
+        self.endRemoveRows(); return True
+    def update(self, login, **vals): return self.update_many({login: vals})
+    def update_many(self, changes):
+        """changes 為 {login: {欄位: 值}}；只更新內容不同的列，相鄰的列合併成一次 dataChanged，回傳變動的列數"""
+        hit = []
+        for login, vals in changes.items():
+            n = self.pos.get(login)
+            if n is None: continue
+            r = self.rows[n]; diff = {k: v for k, v in vals.items() if r.get(k) != v}
+            if diff: r.update(diff); hit.append(n)
+        hit.sort(); i = 0; last = len(self.keys) - 1
+        while i < len(hit):
+            j = i
+            while j + 1 < len(hit) and hit[j + 1] == hit[j] + 1: j += 1
+            self.dataChanged.emit(self.index(hit[i], 0), self.index(hit[j], last)); i = j + 1
+        return len(hit)
 
-                if self.proc.returncode == 0:
-                    self.log_signal.emit(self.sid, "✅ 錄影完成", 0)
-                    # 發送壓縮信號
-                    if has_content:
-                        self.compress_signal.emit(self.sid, fpath)
-                else:
-                    # === 修正重點：過濾無用的 INFO 訊息 ===
-                    combined_output = (stdout or "") + (stderr or "")
+def _channel_view(model, hide=(), on_remove=None, sortable=False):
+    """以 QTableView 顯示 ChannelModel；sortable 時經由 QSortFilterProxyModel 排序與篩選 (篩選比對所有欄位)"""
+    v = QtWidgets.QTableView()
+    if sortable:
+        proxy = QtCore.QSortFilterProxyModel(v); proxy.setSourceModel(model); proxy.setFilterKeyColumn(-1)
+        proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive); v.setModel(proxy)
+        # 點擊標題前維持加入順序
+        v.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder); v.setSortingEnabled(True)
+    else: v.setModel(model)
+    for c in hide: v.setColumnHidden(model.keys.index(c), True)
+    v.setShowGrid(False); v.setWordWrap(False); v.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+    v.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+    # 固定列高，不必逐列計算大小
+    v.verticalHeader().setVisible(False); v.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed); v.verticalHeader().setDefaultSectionSize(34)
+    h = v.horizontalHeader(); shown = [i for i, k in enumerate(model.keys) if k not in hide and k != "del"]
+    if shown: h.setSectionResizeMode(shown[-1], QtWidgets.QHeaderView.ResizeMode.Stretch)
+    if "del" in model.keys:
+        d = model.keys.index("del"); h.setSectionResizeMode(d, QtWidgets.QHeaderView.ResizeMode.Fixed); v.setColumnWidth(d, 36)
+        if on_remove: v.clicked.connect(lambda i: on_remove(i.data(Qt.ItemDataRole.UserRole)) if i.column() == d else None)
+    return v
 
-                    if "Stream is offline" in combined_output or "No playable streams" in combined_output:
-                        pass # 正常未開台，不顯示錯誤
-                    elif "Found matching plugin" in combined_output:
-                        # 這是 Log 訊息，但如果最後 process 結束了，代表沒有錄到東西
-                        # 可能是 FFmpeg 錯誤或 Stream 結束
-                        if "error: FFmpeg" in combined_output:
-                             self.log_signal.emit(self.sid, "❌ FFmpeg 錯誤", 2)
-                        else:
-                             pass # 視為正常結束或未開台
-                    else:
-                        # 顯示真正的錯誤
-                        self.log_signal.emit(self.sid, f"⚠️ 異常: {combined_output[:50]}...", 2)
-
-                    # 即使是異常結束，只要有錄到內容就壓縮（例如手動停止）
-                    if has_content:
-                        self.log_signal.emit(self.sid, "✅ 錄影已停止", 0)
-                        self.compress_signal.emit(self.sid, fpath)
-
-            except Exception as e:
-                self.log_signal.emit(self.sid, f"❌ 執行錯誤: {str(e)}", 2)
-            
-            self.log_signal.emit(self.sid, "💤 等待開播...", 0)
-            for _ in range(60): 
-                if not self.run_flag: break
-                time.sleep(1)
-        self.log_signal.emit(self.sid, "🛑 已停止", 2)
-    def stop(self):
-        self.run_flag = False
-        if self.proc and self.proc.poll() is None: self.proc.terminate()
+class UiBus(QtCore.QObject):
+    """合併狀態更新與日誌，每個畫面週期 (UI_FLUSH_MS) 才寫入元件一次：同一頻道只保留最後的狀態，
+    畫面上最多 LOG_MAX_LINES 行，完整日誌交給 LogArchive 寫入 LOG_DIR"""
+    def __init__(self, view, model=None, name="app", parent=None):
+        super().__init__(parent); self.view = view; self.model = model; self.archive = LogArchive(LOG_DIR / f"{name}.log")
+        view.setMaximumBlockCount(LOG_MAX_LINES)
+        self.status = {}; self.lines = collections.deque(maxlen=LOG_MAX_LINES); self.disk = []
+        self.tmr = QtCore.QTimer(self); self.tmr.setSingleShot(True); self.tmr.setInterval(UI_FLUSH_MS); self.tmr.timeout.connect(self.flush)
+    def set_status(self, login, **vals): self.status.setdefault(login, {}).update(vals); self._kick()
+    def log(self, m):
+        now = datetime.now(); self.lines.append(f"[{now:%H:%M:%S}] {m}"); self.disk.append(f"{now:%Y-%m-%d %H:%M:%S} {m}")
+        # 大量訊息湧入時先寫出，不讓待寫入的日誌無限累積
+        if len(self.disk) >= LOG_MAX_LINES: self.archive.write(self.disk); self.disk = []
+        self._kick()
+    def _kick(self):
+        if not self.tmr.isActive(): self.tmr.start()
+    def flush(self):
+        self.tmr.stop()
+        if self.status and self.model is not None: self.model.update_many(self.status)
+        if self.lines: self.view.appendPlainText("\n".join(self.lines))
+        self.archive.write(self.disk); self.status = {}; self.lines.clear(); self.disk = []
 
 class RecorderWidget(QtWidgets.QWidget):
-    sigRequestAutostartUpdate = pyqtSignal()
-    def __init__(self): super().__init__(); self.workers = {}; self.compress_workers = {}; self.is_started = False; self.init_ui()
+    sigRequestAutostartUpdate = pyqtSignal(); sigUpd = pyqtSignal(str, str, int); sigEvent = pyqtSignal(str, str, object); sigLog = pyqtSignal(str)
+    def __init__(self, engine):
+        super().__init__(); self.workers = set(); self.is_started = False; self.engine = engine; self.store = engine.store; self.sup = engine.sup
+        # supervisor 與開台偵測在背景執行緒回呼，經由 signal 轉回 GUI 執行緒；載入設定時就可能有訊息，先接好再建立介面
+        self.sigUpd.connect(self.upd); self.sigEvent.connect(self.on_event); self.sigLog.connect(self._log)
+        self.sup.on_log = self.sigUpd.emit; self.sup.on_event = self.sigEvent.emit; engine.detector.on_error = self.sigLog.emit
+        self.init_ui()
     def init_ui(self):
         layout = QtWidgets.QVBoxLayout(self); layout.setSpacing(10); layout.setContentsMargins(10,10,10,10)
         h1 = QtWidgets.QHBoxLayout(); self.inp = QtWidgets.QLineEdit(); self.inp.setPlaceholderText("輸入實況主ID"); self.inp.returnPressed.connect(self.add)
         btn = QtWidgets.QPushButton("新增監控"); btn.setObjectName("btn_add"); btn.setCursor(Qt.CursorShape.PointingHandCursor); btn.clicked.connect(self.add)
         h1.addWidget(self.inp); h1.addWidget(btn); layout.addLayout(h1)
-        layout.addWidget(QtWidgets.QLabel("錄影監控清單")); self.lst = QtWidgets.QListWidget(); self.lst.setSpacing(3); layout.addWidget(self.lst)
+        self.model = ChannelModel([("login", "頻道"), ("status", "狀態"), ("del", "")], self)
+        hf = QtWidgets.QHBoxLayout(); self.flt = QtWidgets.QLineEdit(); self.flt.setPlaceholderText("篩選頻道 / 狀態")
+        hf.addWidget(QtWidgets.QLabel("錄影監控清單")); hf.addStretch(); hf.addWidget(self.flt); layout.addLayout(hf)
+        self.lst = _channel_view(self.model, on_remove=self.rem, sortable=True); self.flt.textChanged.connect(self.lst.model().setFilterFixedString); layout.addWidget(self.lst)
         h2 = QtWidgets.QHBoxLayout(); self.qual = QtWidgets.QComboBox(); self.qual.addItems(["best","1080p60","720p60","audio_only"])
         h2.addWidget(QtWidgets.QLabel("畫質:")); h2.addWidget(self.qual)
         self.fld = QtWidgets.QLineEdit(os.getcwd()); b_fld = QtWidgets.QPushButton("📂"); b_fld.setObjectName("btn_browse"); b_fld.setFixedWidth(40); b_fld.setCursor(Qt.CursorShape.PointingHandCursor); b_fld.clicked.connect(self.browse)
         h2.addWidget(QtWidgets.QLabel("存檔:")); h2.addWidget(self.fld); h2.addWidget(b_fld); layout.addLayout(h2)
+        h2b = QtWidgets.QHBoxLayout(); self.rec_mode = QtWidgets.QComboBox()
+        for k, v in RECORD_MODES.items(): self.rec_mode.addItem(v, k)
+        self.seg_min = QtWidgets.QSpinBox(); self.seg_min.setRange(1, 120); self.seg_min.setValue(10); self.seg_min.setSuffix(" 分/段")
+        self.rec_mode.currentIndexChanged.connect(self.save); self.seg_min.valueChanged.connect(self.save)
+        h2b.addWidget(QtWidgets.QLabel("錄影格式:")); h2b.addWidget(self.rec_mode); h2b.addWidget(self.seg_min); h2b.addStretch(); layout.addLayout(h2b)
         h3 = QtWidgets.QHBoxLayout()
         self.check_compress = ModernCheckBox("自動壓縮影片"); self.check_compress.setChecked(True); self.check_compress.toggled.connect(self.save); self.check_compress.setMinimumWidth(150)
         self.check_keep_original = ModernCheckBox("保留原始檔"); self.check_keep_original.setChecked(False); self.check_keep_original.toggled.connect(self.save); self.check_keep_original.setMinimumWidth(130)
         h3.addWidget(self.check_compress); h3.addWidget(self.check_keep_original); h3.addStretch(); layout.addLayout(h3)
+        h4 = QtWidgets.QHBoxLayout(); self.cq_workers = QtWidgets.QSpinBox(); self.cq_workers.setRange(1, 64); self.cq_workers.setValue(os.cpu_count() or 1)
+        self.cq_priority = QtWidgets.QComboBox(); self.cq_priority.addItem("先進先出", "fifo"); self.cq_priority.addItem("小檔優先", "size")
+        self.check_cq_pause = ModernCheckBox("暫停壓縮"); self.check_cq_pause.setMinimumWidth(110)
+        h4.addWidget(QtWidgets.QLabel("同時壓縮:")); h4.addWidget(self.cq_workers); h4.addWidget(QtWidgets.QLabel("順序:")); h4.addWidget(self.cq_priority); h4.addWidget(self.check_cq_pause); h4.addStretch(); layout.addLayout(h4)
+        h5 = QtWidgets.QHBoxLayout(); self.cp_profile = QtWidgets.QComboBox(); self.cp_verify = QtWidgets.QComboBox(); self.cp_preset = QtWidgets.QComboBox(); self.cp_preset.addItems(X264_PRESETS); self.cp_preset.setCurrentText("medium")
+        for k, v in COMPRESS_PROFILES.items(): self.cp_profile.addItem(v, k)
+        for k, v in VERIFY_MODES.items(): self.cp_verify.addItem(v, k)
+        self.cp_crf = QtWidgets.QSpinBox(); self.cp_crf.setRange(0, 51); self.cp_crf.setValue(23)
+        self.cp_threads = QtWidgets.QSpinBox(); self.cp_threads.setRange(0, 64); self.cp_threads.setSpecialValueText("自動")
+        h5.addWidget(QtWidgets.QLabel("方式:")); h5.addWidget(self.cp_profile); h5.addWidget(self.cp_preset); h5.addWidget(QtWidgets.QLabel("CRF:")); h5.addWidget(self.cp_crf)
+        h5.addWidget(QtWidgets.QLabel("執行緒:")); h5.addWidget(self.cp_threads); h5.addWidget(QtWidgets.QLabel("驗證:")); h5.addWidget(self.cp_verify); h5.addStretch(); layout.addLayout(h5)
+        # 壓縮程序的優先權 (nice / ionice)、保留給錄影的核心數；其餘資源設定 (錄影的 nice、threads_cap ...) 只能在設定檔修改，存檔時原樣保留
+        h6 = QtWidgets.QHBoxLayout(); self.res = {}; self.res_prio = QtWidgets.QComboBox()
+        for t, n, io in ENC_PRIORITIES: self.res_prio.addItem(t, f"{n}|{io}")
+        self.res_prio.setCurrentIndex(max(0, self.res_prio.findData(f"{RESOURCE_DEFAULTS['enc_nice']}|{RESOURCE_DEFAULTS['enc_ionice']}")))
+        self.res_cpus = QtWidgets.QSpinBox(); self.res_cpus.setRange(0, max(0, (os.cpu_count() or 1) - 1)); self.res_cpus.setSpecialValueText("不保留")
+        self.check_throttle = ModernCheckBox("錄影落後時暫停壓縮"); self.check_throttle.setChecked(RESOURCE_DEFAULTS["throttle"]); self.check_throttle.setMinimumWidth(180)
+        h6.addWidget(QtWidgets.QLabel("壓縮優先權:")); h6.addWidget(self.res_prio); h6.addWidget(QtWidgets.QLabel("保留給錄影的核心:")); h6.addWidget(self.res_cpus); h6.addWidget(self.check_throttle); h6.addStretch(); layout.addLayout(h6)
         self.check_autostart = ModernCheckBox("開機自啟動並自動錄影"); self.check_autostart.toggled.connect(self.tog_auto); layout.addWidget(self.check_autostart)
         self.start_btn = QtWidgets.QPushButton(); self.start_btn.setCursor(Qt.CursorShape.PointingHandCursor); self.start_btn.setCheckable(True); self.start_btn.clicked.connect(self.toggle); self.set_btn(False); layout.addWidget(self.start_btn)
-        layout.addWidget(QtWidgets.QLabel("錄影日誌")); self.log = QtWidgets.QTextEdit(); self.log.setFixedHeight(80); self.log.setReadOnly(True); layout.addWidget(self.log)
+        layout.addWidget(QtWidgets.QLabel("錄影日誌")); self.log = QtWidgets.QPlainTextEdit(); self.log.setFixedHeight(80); self.log.setReadOnly(True); layout.addWidget(self.log)
+        self.bus = UiBus(self.log, self.model, "recorder", self)
         self.load()
+        self.cq_workers.valueChanged.connect(self._cq_opts); self.cq_priority.currentIndexChanged.connect(self._cq_opts); self.check_cq_pause.toggled.connect(self._cq_opts)
+        self.res_prio.currentIndexChanged.connect(self._cq_opts); self.res_cpus.valueChanged.connect(self._cq_opts); self.check_throttle.toggled.connect(self._cq_opts)
+        self._cp_enable(); self.cp_profile.currentIndexChanged.connect(self._cp_enable); self.rec_mode.currentIndexChanged.connect(self._cp_enable)
+        for w in (self.cp_profile, self.cp_preset, self.cp_verify): w.currentIndexChanged.connect(self.save)
+        for w in (self.cp_crf, self.cp_threads): w.valueChanged.connect(self.save)
     def set_btn(self, on):
         if on: self.start_btn.setText("🔴 錄影監控中 (點擊停止)"); self.start_btn.setStyleSheet("QPushButton { background-color:#ef5350;color:white;padding:12px;font-size:16px;border:2px solid #ff80ab; }")
         else: self.start_btn.setText("🟢 準備就緒 (點擊開始監控)"); self.start_btn.setStyleSheet("QPushButton { background-color:#00e676;color:black;padding:12px;font-size:16px; }")
     def add(self):
         s = self.inp.text().strip(); 
         if not s: return
-        for i in range(self.lst.count()): 
-            if self.lst.item(i).data(Qt.ItemDataRole.UserRole) == s: return
-        it = QtWidgets.QListWidgetItem(); it.setData(Qt.ItemDataRole.UserRole, s)
-        w = RecorderItemWidget(f"{s} - 準備中", lambda x=s, y=it: self.rem(x, y)); it.setSizeHint(w.sizeHint()); self.lst.addItem(it); self.lst.setItemWidget(it, w)
+        if s in self.model: return
+        self.model.add(s, status="準備中", status_color="#adadb8")
         self.inp.clear(); self.save(); 
         if self.is_started: self.start_one(s)
-    def rem(self, s, it): self.stop_one(s); self.lst.takeItem(self.lst.row(it)); self.save()
+    def rem(self, s): self.stop_one(s); self.model.remove(s); self.save()
     def toggle(self, on):
         if on:
             if not os.path.exists(self.fld.text()):
                 try: os.makedirs(self.fld.text())
                 except: self.start_btn.setChecked(False); return
-            self.is_started = True; self.set_btn(True); self.fld.setEnabled(False); self.qual.setEnabled(False)
-            for i in range(self.lst.count()): self.start_one(self.lst.item(i).data(Qt.ItemDataRole.UserRole))
+            self.is_started = True; self.set_btn(True); self.fld.setEnabled(False); self.qual.setEnabled(False); self.rec_mode.setEnabled(False); self.seg_min.setEnabled(False)
+            for s in self.model.logins(): self.start_one(s)
         else:
-            self.is_started = False; self.set_btn(False); self.fld.setEnabled(True); self.qual.setEnabled(True)
-            for s in list(self.workers.keys()): self.stop_one(s)
+            self.is_started = False; self.set_btn(False); self.fld.setEnabled(True); self.qual.setEnabled(True); self.rec_mode.setEnabled(True); self._cp_enable()
+            self.sup.stop(list(self.workers)); self.workers.clear()
     def start_one(self, s):
         if s in self.workers: return
-        t = RecorderThread(s, self.qual.currentText(), self.fld.text())
-        t.log_signal.connect(self.upd)
-        t.compress_signal.connect(self.handle_compress)
-        self.workers[s] = t
-        t.start()
-    def handle_compress(self, sid, fpath):
-        if not self.check_compress.isChecked():
-            return
-        if not os.path.exists(FFMPEG_PATH):
-            self.log.append(f"{datetime.now().strftime('[%H:%M:%S]')} [{sid}] ⚠️ FFmpeg 不存在，跳過壓縮")
-            return
-        compress_key = f"{sid}_{os.path.basename(fpath)}"
-        if compress_key in self.compress_workers:
-            return
-        ct = CompressThread(sid, fpath, self.check_keep_original.isChecked())
-        ct.log_signal.connect(self.upd)
-        ct.finished_signal.connect(self.compress_finished)
-        self.compress_workers[compress_key] = ct
-        ct.start()
-    def compress_finished(self, sid, fpath, success):
-        compress_key = f"{sid}_{os.path.basename(fpath)}"
-        if compress_key in self.compress_workers:
-            self.compress_workers[compress_key].wait()
-            del self.compress_workers[compress_key]
+        self.workers.add(s); self.engine.start_recording(s, self._cfg())
     def stop_one(self, s):
-        if s in self.workers: self.workers[s].stop(); self.workers[s].wait(); del self.workers[s]; 
+        if s in self.workers: self.sup.stop([s]); self.workers.discard(s)
         if not self.is_started: self.upd_ui(s, "已停止", "#adadb8")
+    def on_event(self, s, kind, data):
+        if kind == "bytes": self.upd_ui(s, f"🔴 錄影中 ({data / (1024*1024):.1f} MB)", "#00e676")
     def upd(self, s, m, c):
         hex = "#adadb8"
         if c==1: hex="#00e676"
         elif c==2: hex="#ef5350"
         self.upd_ui(s, m, hex)
-        if "等待" not in m: self.log.append(f"{datetime.now().strftime('[%H:%M:%S]')} [{s}] {m}")
-    def upd_ui(self, s, t, c):
-        for i in range(self.lst.count()):
-            it = self.lst.item(i)
-            if it.data(Qt.ItemDataRole.UserRole) == s:
-                w = self.lst.itemWidget(it)
-                if w: w.update_text(f"{s} - {t}", c)
-                break
+        if "等待" not in m: self._log(f"[{s}] {m}")
+    def upd_ui(self, s, t, c): self.bus.set_status(s, status=t, status_color=c)
     def browse(self):
         f = QtWidgets.QFileDialog.getExistingDirectory(self, "選擇"); 
         if f: self.fld.setText(f); self.save()
     def tog_auto(self): self.save(); self.sigRequestAutostartUpdate.emit()
     def load(self):
+        d = self.store.get("recorder")
         try:
-            if RECORDER_CONFIG_PATH.exists():
-                d = json.loads(RECORDER_CONFIG_PATH.read_text("utf-8"))
+            if d:
                 self.fld.setText(d.get("f", os.getcwd())); self.check_autostart.setChecked(d.get("a", False)); self.qual.setCurrentText(d.get("q", "best"))
                 self.check_compress.setChecked(d.get("compress", True)); self.check_keep_original.setChecked(d.get("keep_original", False))
-                for s in d.get("c", []):
-                    it = QtWidgets.QListWidgetItem(); it.setData(Qt.ItemDataRole.UserRole, s)
-                    w = RecorderItemWidget(f"{s} - 準備中", lambda x=s, y=it: self.rem(x, y)); it.setSizeHint(w.sizeHint()); self.lst.addItem(it); self.lst.setItemWidget(it, w)
-        except: pass
-    def save(self):
-        c = [self.lst.item(i).data(Qt.ItemDataRole.UserRole) for i in range(self.lst.count())]
-        d = {"f": self.fld.text(), "a": self.check_autostart.isChecked(), "q": self.qual.currentText(), "c": c, "compress": self.check_compress.isChecked(), "keep_original": self.check_keep_original.isChecked()}
-        try: RECORDER_CONFIG_PATH.write_text(json.dumps(d), "utf-8")
-        except: pass
-    def cleanup(self):
-        for s in list(self.workers.keys()): self.stop_one(s)
-        for ct in list(self.compress_workers.values()):
-            ct.wait()
-
-class WatcherChecker(QtCore.QObject):
-    res = QtCore.pyqtSignal(dict); err = QtCore.pyqtSignal(str); auth_err = QtCore.pyqtSignal(str)
-    def __init__(self, gh, p=None): super().__init__(p); self.gh = gh
-    @QtCore.pyqtSlot(list)
-    def check_channels(self, ls):
-        ls = [l.strip().lower() for l in ls if l]; out = {l: {"live": False, "title": "", "id": ""} for l in ls}
-        if not ls: self.res.emit(out); return
-        ok, h, e = self.gh()
-        if not ok: self.err.emit(e or "Auth Error"); self.res.emit(out); return
-        try:
-            cks = [ls[i:i+100] for i in range(0, len(ls), 100)]
-            for c in cks:
-                r = requests.get(TWITCH_HELIX_STREAMS, headers=h, params=[("user_login", l) for l in c], timeout=10)
-                if r.status_code == 401:
-                    self.auth_err.emit("Token 失效"); ok2, h2, e2 = self.gh(True)
-                    if not ok2: break
-                    r = requests.get(TWITCH_HELIX_STREAMS, headers=h2, params=[("user_login", l) for l in c], timeout=10)
-                if not r.ok: continue
-                for d in r.json().get("data", []): out[d.get("user_login", "").lower()] = {"live": True, "title": d.get("title", ""), "id": d.get("id", "")}
-            self.res.emit(out)
-        except Exception as ex: self.err.emit(str(ex)); self.res.emit(out)
-
-class WatcherItemWidget(QtWidgets.QWidget):
-    removeRequested = pyqtSignal(str)
-    def __init__(self, login, parent=None):
-        super().__init__(parent); self.login = login
-        h = QtWidgets.QHBoxLayout(self); h.setContentsMargins(10, 4, 10, 4)
-        h.addWidget(QtWidgets.QLabel("🎮")); h.addWidget(QtWidgets.QLabel(login), 1)
-        btn = QtWidgets.QPushButton("✕"); btn.setObjectName("btn_row_del"); btn.setFixedSize(28, 28); btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn.clicked.connect(lambda: self.removeRequested.emit(self.login)); h.addWidget(btn)
+                self.cq_workers.setValue(d.get("workers", os.cpu_count() or 1)); self.cq_priority.setCurrentIndex(max(0, self.cq_priority.findData(d.get("priority", "fifo")))); self.check_cq_pause.setChecked(d.get("compress_paused", False))
+                self.rec_mode.setCurrentIndex(max(0, self.rec_mode.findData(d.get("rec_mode", "ts")))); self.seg_min.setValue(d.get("segment_min", 10))
+                cp = d.get("profile", {}); self.cp_profile.setCurrentIndex(max(0, self.cp_profile.findData(cp.get("profile", "encode")))); self.cp_preset.setCurrentText(cp.get("preset", "medium"))
+                self.cp_crf.setValue(cp.get("crf", 23)); self.cp_threads.setValue(cp.get("threads", 0)); self.cp_verify.setCurrentIndex(max(0, self.cp_verify.findData(cp.get("verify", "probe"))))
+                self._load_res(d.get("resources") or {})
+                for s in d.get("c", []): self.model.add(s, status="準備中", status_color="#adadb8")
+        except (AttributeError, TypeError, ValueError) as e: self._log(f"⚠️ 錄影設定有誤，部分使用預設值: {e}")
+        # 載入途中各元件的訊號會以不完整的設定觸發 save()，最後再存一次完整的設定 (只會合併成一次寫入)
+        if d: self.save()
+        # 套用壓縮佇列設定，並接手上次未完成 / 當機遺留的錄影檔
+        self.engine.resume_compress(self._cfg())
+    def _cp_enable(self):
+        enc = self.cp_profile.currentData() == "encode" or self.rec_mode.currentData() == "fmp4_enc"
+        for w in (self.cp_preset, self.cp_crf, self.cp_threads): w.setEnabled(enc)
+        self.seg_min.setEnabled(self.rec_mode.currentData() == "segment" and not self.is_started)
+    def _cq_opts(self): self.save(); self.engine.compress_config(self._cfg())
+    def _load_res(self, res):
+        self.res = dict(res); r = dict(RESOURCE_DEFAULTS, **res); prio = f"{r['enc_nice']}|{r['enc_ionice']}"
+        # 設定檔中自訂的 nice / ionice 組合另外列為一個選項，存檔時不會被換成預設的組合
+        if self.res_prio.findData(prio) < 0: self.res_prio.addItem(f"自訂 (nice {r['enc_nice']}, ionice {r['enc_ionice'] or '不變'})", prio)
+        self.res_prio.setCurrentIndex(self.res_prio.findData(prio))
+        cpus = r["reserve_cpus"]; self.res_cpus.setValue(cpus if isinstance(cpus, int) else len(cpus)); self.check_throttle.setChecked(r["throttle"])
+    def _res_cfg(self):
+        n, io = self.res_prio.currentData().split("|", 1); cpus = self.res.get("reserve_cpus")
+        # 設定檔以核心編號清單指定且數量沒變時保留原本的清單
+        keep = cpus if isinstance(cpus, list) and len(cpus) == self.res_cpus.value() else self.res_cpus.value()
+        return dict(self.res, enc_nice=int(n), enc_ionice=io, reserve_cpus=keep, throttle=self.check_throttle.isChecked())
+    def _cfg(self):
+        # 畫面上的設定，也就是存入 recorder 區段、交給 engine 計算錄影 / 壓縮參數的內容
+        return {"f": self.fld.text(), "a": self.check_autostart.isChecked(), "q": self.qual.currentText(), "c": self.model.logins(), "compress": self.check_compress.isChecked(), "keep_original": self.check_keep_original.isChecked(),
+                "workers": self.cq_workers.value(), "priority": self.cq_priority.currentData(), "compress_paused": self.check_cq_pause.isChecked(), "rec_mode": self.rec_mode.currentData(), "segment_min": self.seg_min.value(),
+                "profile": {"profile": self.cp_profile.currentData(), "preset": self.cp_preset.currentText(), "crf": self.cp_crf.value(), "threads": self.cp_threads.value(), "verify": self.cp_verify.currentData()},
+                "resources": self._res_cfg()}
+    def save(self): self.store.put("recorder", self._cfg())
+    def _log(self, m): self.bus.log(m)
+    def cleanup(self): self.workers.clear(); self.bus.flush()
 
 class WatcherWidget(QtWidgets.QWidget):
-    sigRequestAutostartUpdate = pyqtSignal(); sigCheck = QtCore.pyqtSignal(list)
-    def __init__(self):
-        super().__init__(); self.cfg = self.load(); self.sess = {}; self.init_ui()
-        self.tmr = QtCore.QTimer(self); self.tmr.timeout.connect(self._tick)
-        self.th = QtCore.QThread(self); self.wkr = WatcherChecker(self._gh)
-        self.wkr.moveToThread(self.th); self.wkr.res.connect(self._res); self.wkr.err.connect(self._log); self.wkr.auth_err.connect(self._log)
-        self.sigCheck.connect(self.wkr.check_channels); self.th.start(); self._ensure(False)
+    sigRequestAutostartUpdate = pyqtSignal(); sigRes = pyqtSignal(dict); sigLog = pyqtSignal(str)
+    def __init__(self, engine):
+        # 輪詢 (依開台歷史排程)、EventSub 推播與 Token 刷新都在 engine 的背景執行緒，結果經由 signal 轉回 GUI 執行緒
+        super().__init__(); self.engine = engine; self.store = engine.store; self.cfg = self.store.get("watcher"); self.init_ui()
+        self.sigRes.connect(self._res); self.sigLog.connect(self._log)
+        engine.watcher.on_result = self.sigRes.emit; engine.set_log_handler(self.sigLog.emit)
+        # 輸入完成 (Enter 或離開欄位) 才換憑證，打字途中不會用不完整的憑證取得 Token
+        self.cid.editingFinished.connect(self._creds); self.sec.editingFinished.connect(self._creds)
+        self._push_cfg(); self.utk.editingFinished.connect(self._push_cfg); self.cb_push.toggled.connect(self._push_cfg)
     def init_ui(self):
         lay = QtWidgets.QHBoxLayout(self); l = QtWidgets.QWidget(); lv = QtWidgets.QVBoxLayout(l); lv.setContentsMargins(0,0,0,0)
         grp = QtWidgets.QGroupBox("Twitch 認證"); f = QtWidgets.QFormLayout(grp)
         self.cid = QtWidgets.QLineEdit(self.cfg.get("cid", "")); self.sec = QtWidgets.QLineEdit(self.cfg.get("sec", "")); self.sec.setEchoMode(QtWidgets.QLineEdit.EchoMode.Password)
-        btn = QtWidgets.QPushButton("更新 Token"); btn.clicked.connect(lambda: self._ensure(True)); f.addRow("Client ID", self.cid); f.addRow("Secret", self.sec); f.addRow("", btn); lv.addWidget(grp)
+        btn = QtWidgets.QPushButton("更新 Token"); btn.clicked.connect(lambda: (self._creds(), self.engine.tokens.refresh())); f.addRow("Client ID", self.cid); f.addRow("Secret", self.sec); f.addRow("", btn)
+        self.utk = QtWidgets.QLineEdit(self.cfg.get("utk", "")); self.utk.setEchoMode(QtWidgets.QLineEdit.EchoMode.Password); self.utk.setPlaceholderText("EventSub 推播用 (選填)")
+        self.cb_push = ModernCheckBox("EventSub 即時推播 (斷線時改用輪詢)"); self.cb_push.setChecked(self.cfg.get("push", False))
+        f.addRow("User Token", self.utk); f.addRow("", self.cb_push); lv.addWidget(grp)
         hl = QtWidgets.QHBoxLayout(); self.inp = QtWidgets.QLineEdit(); self.inp.setPlaceholderText("輸入實況主ID"); self.inp.returnPressed.connect(self._add)
         b_add = QtWidgets.QPushButton("加入"); b_add.setObjectName("btn_add"); b_add.clicked.connect(self._add); hl.addWidget(self.inp); hl.addWidget(b_add); lv.addLayout(hl)
-        self.lst = QtWidgets.QListWidget(); lv.addWidget(self.lst)
-        for c in self.cfg.get("chs", []): self._add_item(c)
+        # 左側清單與右側狀態表共用同一個 model，狀態表經過 proxy 排序與篩選
+        self.model = ChannelModel([("login", "頻道"), ("status", "狀態"), ("title", "標題"), ("del", "")], self)
+        for c in self.cfg.get("chs", []): self.model.add(c)
+        self.lst = _channel_view(self.model, hide=("status", "title"), on_remove=self._rem); self.lst.horizontalHeader().setVisible(False); lv.addWidget(self.lst)
         hl2 = QtWidgets.QHBoxLayout(); hl2.addWidget(QtWidgets.QLabel("檢查間隔:"))
         self.m = QtWidgets.QLineEdit(); self.s = QtWidgets.QLineEdit(); self.m.setValidator(QIntValidator(0,9999)); self.s.setValidator(QIntValidator(0,59))
         self.m.setFixedWidth(50); self.s.setFixedWidth(50); self.m.setPlaceholderText("分"); self.s.setPlaceholderText("秒")
@@ -400,76 +341,53 @@ class WatcherWidget(QtWidgets.QWidget):
         self.m.textChanged.connect(self.save); self.s.textChanged.connect(self.save); hl2.addWidget(self.m); hl2.addWidget(QtWidgets.QLabel("分")); hl2.addWidget(self.s); hl2.addWidget(QtWidgets.QLabel("秒")); hl2.addStretch(); lv.addLayout(hl2)
         self.cb_autostart = ModernCheckBox("開機自啟動並自動監看"); self.cb_autostart.setChecked(self.cfg.get("auto", False)); self.cb_autostart.toggled.connect(self._tog_auto); lv.addWidget(self.cb_autostart)
         r = QtWidgets.QWidget(); rv = QtWidgets.QVBoxLayout(r); rv.setContentsMargins(0,0,0,0)
-        self.tbl = QtWidgets.QTableWidget(0, 3); self.tbl.setHorizontalHeaderLabels(["頻道", "狀態", "標題"]); self.tbl.horizontalHeader().setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeMode.Stretch); rv.addWidget(self.tbl)
+        self.flt = QtWidgets.QLineEdit(); self.flt.setPlaceholderText("篩選頻道 / 狀態 / 標題"); rv.addWidget(self.flt)
+        self.tbl = _channel_view(self.model, hide=("del",), sortable=True); self.flt.textChanged.connect(self.tbl.model().setFilterFixedString); rv.addWidget(self.tbl)
         self.run_btn = QtWidgets.QPushButton("▶ 開始監看"); self.run_btn.setCheckable(True); self.run_btn.clicked.connect(self.toggle_watching); self.set_btn(False); rv.addWidget(self.run_btn)
         self.log = QtWidgets.QPlainTextEdit(); self.log.setReadOnly(True); self.log.setFixedHeight(100); rv.addWidget(self.log)
+        self.bus = UiBus(self.log, self.model, "watcher", self)
         lay.addWidget(l, 1); lay.addWidget(r, 2); self.cid.textChanged.connect(self.save); self.sec.textChanged.connect(self.save)
+        self.utk.textChanged.connect(self.save); self.cb_push.toggled.connect(self.save)
     def set_btn(self, on):
         if on: self.run_btn.setText("⏸ 監看中 (點擊停止)"); self.run_btn.setStyleSheet("QPushButton { background-color:#ef5350;color:white;padding:10px;font-weight:bold;border:2px solid #ff80ab; }")
         else: self.run_btn.setText("▶ 開始監看"); self.run_btn.setStyleSheet("QPushButton { background-color:#00e676;color:black;padding:10px;font-weight:bold; }")
     def toggle_watching(self, on):
-        if on: self.save(); self.sess.clear(); self._ensure(False); self._tick(); self.tmr.start(self._get_t()*1000); self.set_btn(True)
-        else: self.tmr.stop(); self.set_btn(False)
+        if on: self.save(); self.engine.watcher.set_interval(self._get_t()); self.engine.watcher.start(); self.set_btn(True)
+        else: self.engine.watcher.stop(); self.set_btn(False)
     def _get_t(self):
         try: return max(5, int(self.m.text() or 0)*60 + int(self.s.text() or 0))
         except: return 60
-    def _tick(self): self.sigCheck.emit([self.lst.itemWidget(self.lst.item(i)).login for i in range(self.lst.count())])
-    def _ensure(self, f):
-        if not f and self.cfg.get("tk") and (self.cfg.get("exp", 0) - time.time() > 300): return True
-        if not self.cid.text() or not self.sec.text(): return False
-        try:
-            r = requests.post(TWITCH_TOKEN_URL, data={"client_id": self.cid.text(), "client_secret": self.sec.text(), "grant_type": "client_credentials"})
-            if r.ok: d = r.json(); self.cfg["tk"] = d["access_token"]; self.cfg["exp"] = int(time.time()) + d["expires_in"]; self.save(); self._log("Token OK"); return True
-        except: pass
-        return False
-    def _gh(self, r=False):
-        if not self._ensure(r): return False, {}, "Token Invalid"
-        return True, {"Client-Id": self.cid.text(), "Authorization": f"Bearer {self.cfg['tk']}"}, ""
+    def _chs(self): return self.model.logins()
+    def _push_cfg(self): self.engine.push_config(self.utk.text(), self.cb_push.isChecked())
+    def _creds(self): self.engine.tokens.set_credentials(self.cid.text().strip(), self.sec.text().strip())
     def _res(self, d):
-        self.tbl.setRowCount(0)
+        # 輪詢與推播各自只回報部分頻道，狀態交給 bus 合併，下一個畫面週期只更新有變化的列
+        # 推播的開台事件沒有標題 (稍後補查)，保留原本的標題
         for l, i in d.items():
-            r = self.tbl.rowCount(); self.tbl.insertRow(r); self.tbl.setItem(r, 0, QtWidgets.QTableWidgetItem(l))
-            st = QtWidgets.QTableWidgetItem("LIVE" if i['live'] else "Offline"); st.setForeground(QColor("#aef1b9" if i['live'] else "#95a2b3")); self.tbl.setItem(r, 1, st)
-            self.tbl.setItem(r, 2, QtWidgets.QTableWidgetItem(i['title']))
-            if i['live'] and i['id'] != self.sess.get(l): self.sess[l] = i['id']; self._log(f"{l} 開台"); webbrowser.open(f"https://www.twitch.tv/{l}")
-    def _add_item(self, l):
-        it = QtWidgets.QListWidgetItem(); w = WatcherItemWidget(l); w.removeRequested.connect(self._rem); it.setSizeHint(w.sizeHint()); self.lst.addItem(it); self.lst.setItemWidget(it, w)
+            self.bus.set_status(l, status="Error" if i.get('error') else "LIVE" if i['live'] else "Offline", status_color="#ef5350" if i.get('error') else "#aef1b9" if i['live'] else "#95a2b3", **({"title": i["title"]} if "title" in i else {}))
+        for l in self.engine.went_live({l: i for l, i in d.items() if l in self.model}):
+            import webbrowser
+            self._log(f"{l} 開台"); webbrowser.open(f"https://www.twitch.tv/{l}")
     def _add(self):
-        c = self.inp.text().strip().lower(); ex = False
-        for i in range(self.lst.count()): 
-            if self.lst.itemWidget(self.lst.item(i)).login == c: ex = True
-        if not ex: self._add_item(c); self.save()
+        c = self.inp.text().strip().lower()
+        if c and self.model.add(c): self.save(); self.engine.watcher.set_channels(self._chs())
         self.inp.clear()
-    def _rem(self, l):
-        for i in range(self.lst.count()):
-            if self.lst.itemWidget(self.lst.item(i)).login == l: self.lst.takeItem(i); break
-        self.save()
+    def _rem(self, l): self.model.remove(l); self.save(); self.engine.watcher.set_channels(self._chs()); self.engine.forget(l)
     def _tog_auto(self): self.save(); self.sigRequestAutostartUpdate.emit()
-    def load(self):
-        try: return json.loads(CONFIG_WATCHER_PATH.read_text("utf-8")) if CONFIG_WATCHER_PATH.exists() else {}
-        except: return {}
     def save(self):
-        chs = [self.lst.itemWidget(self.lst.item(i)).login for i in range(self.lst.count())]
-        self.cfg.update({"cid": self.cid.text(), "sec": self.sec.text(), "chs": chs, "int": self._get_t(), "auto": self.cb_autostart.isChecked()})
-        try: CONFIG_WATCHER_PATH.write_text(json.dumps(self.cfg), "utf-8")
-        except: pass
-    def _log(self, m): self.log.appendPlainText(f"[{time.strftime('%H:%M:%S')}] {m}")
-    def cleanup(self): self.tmr.stop(); self.th.quit(); self.th.wait()
-
-class WatcherItemWidget(QtWidgets.QWidget):
-    removeRequested = pyqtSignal(str)
-    def __init__(self, login, parent=None):
-        super().__init__(parent); self.login = login
-        h = QtWidgets.QHBoxLayout(self); h.setContentsMargins(10, 4, 10, 4)
-        h.addWidget(QtWidgets.QLabel("🎮")); h.addWidget(QtWidgets.QLabel(login), 1)
-        btn = QtWidgets.QPushButton("✕"); btn.setObjectName("btn_row_del"); btn.setFixedSize(28, 28); btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn.clicked.connect(lambda: self.removeRequested.emit(self.login)); h.addWidget(btn)
+        # Token 由 engine 在背景執行緒寫入同一個區段，這裡只合併畫面上的欄位
+        v = {"cid": self.cid.text(), "sec": self.sec.text(), "utk": self.utk.text(), "push": self.cb_push.isChecked(), "chs": self._chs(), "int": self._get_t(), "auto": self.cb_autostart.isChecked()}
+        self.store.update("watcher", lambda d: d.update(v))
+    def _log(self, m): self.bus.log(m)
+    def cleanup(self): self.bus.flush()
 
 class UnifiedMainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__(); self.setWindowTitle("Twitch 工具箱 (錄影 & 觀看)"); self.resize(900, 700); self.setWindowIcon(_load_icon())
         self.tabs = QtWidgets.QTabWidget(); self.setCentralWidget(self.tabs)
-        self.recorder_tab = RecorderWidget(); self.watcher_tab = WatcherWidget()
+        # 兩個分頁都只是 engine 的前端：Twitch 憑證、Helix 連線池、EventSub 推播、開台歷史與 StateStore 都由 engine 持有
+        self.engine = Engine(); self.store = self.engine.store
+        self.watcher_tab = WatcherWidget(self.engine); self.recorder_tab = RecorderWidget(self.engine)
         self.tabs.addTab(self.recorder_tab, "📹 直播錄影保存"); self.tabs.addTab(self.watcher_tab, "🔔 開播通知觀看")
         self.recorder_tab.sigRequestAutostartUpdate.connect(self.update_reg); self.watcher_tab.sigRequestAutostartUpdate.connect(self.update_reg)
         self.init_tray(); self.check_auto()
@@ -479,10 +397,13 @@ class UnifiedMainWindow(QtWidgets.QMainWindow):
         self.tray.setContextMenu(m); self.tray.show(); self.tray.activated.connect(lambda r: self.show_norm() if r == QtWidgets.QSystemTrayIcon.ActivationReason.Trigger else None)
     def show_norm(self): self.show(); self.setWindowState(Qt.WindowState.WindowNoState); self.activateWindow()
     def closeEvent(self, e): e.ignore(); self.hide(); self.tray.showMessage("Twitch 工具箱", "程式已縮小至系統列", QtWidgets.QSystemTrayIcon.MessageIcon.Information, 2000)
-    def quit(self): self.recorder_tab.cleanup(); self.watcher_tab.cleanup(); QtWidgets.QApplication.quit()
+    def quit(self):
+        # 停止所有錄影並寫回設定，再把停止過程中的訊息寫入日誌
+        self.engine.close(); QtWidgets.QApplication.processEvents(); self.recorder_tab.cleanup(); self.watcher_tab.cleanup(); QtWidgets.QApplication.quit()
     def update_reg(self):
         run = self.recorder_tab.check_autostart.isChecked() or self.watcher_tab.cb_autostart.isChecked()
         try:
+            import winreg  # 只有 Windows 有，其他平台在這裡略過
             k = winreg.OpenKey(winreg.HKEY_CURRENT_USER, REG_PATH, 0, winreg.KEY_WRITE)
             if run:
                 p = os.path.abspath(sys.argv[0])
@@ -0,0 +1,26 @@
+"""開台通知與錄影的核心，不依賴 Qt，可在沒有桌面環境的伺服器上以 --headless 執行。
+
+子模組在第一次取用名稱時才載入 (例如 requests 只在用到 twitch 時載入)，
+`import twitch_core` 本身幾乎沒有成本。
+"""
+import importlib
+
+_EXPORTS = {
+    "StateStore": "store", "LogArchive": "store",
+    "RateLimiter": "twitch", "TokenManager": "twitch", "HelixClient": "twitch", "EventSubClient": "twitch",
+    "LiveHistory": "schedule", "PollScheduler": "schedule",
+    "Worker": "detect", "LiveDetector": "detect", "ChannelWatcher": "detect", "check_channels": "detect",
+    "StreamlinkLogParser": "recorder", "CompressQueue": "recorder", "RecordSupervisor": "recorder", "ResourcePolicy": "resources",
+    "Metrics": "metrics", "MetricsServer": "metrics", "METRICS": "metrics",
+    "Engine": "engine", "job_opts": "engine", "rec_opts": "engine",
+}
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS: raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    v = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name); globals()[name] = v
+    return v
+
+
+def __dir__(): return sorted(set(globals()) | set(__all__))
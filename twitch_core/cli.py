@@ -0,0 +1,62 @@
+import os
+import sys
+import signal
+import argparse
+import threading
+from datetime import datetime
+
+
+def main(argv=None):
+    """--headless：不開視窗，依 GUI 的 JSON 設定檔執行開台通知與錄影，日誌輸出到 stdout 與 logs/headless.log"""
+    ap = argparse.ArgumentParser(prog="new_twitch_watcher --headless", description="不開視窗執行開台通知與錄影，設定沿用 GUI 存下的 JSON 設定檔")
+    ap.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--no-watch", action="store_true", help="不執行開台通知")
+    ap.add_argument("--no-record", action="store_true", help="不錄影")
+    ap.add_argument("--open-browser", action="store_true", help="開台時開啟瀏覽器 (預設只寫日誌)")
+    ap.add_argument("--metrics-port", type=int, default=None, help="在 127.0.0.1 的這個 port 提供 /metrics 與 /metrics.json (預設使用設定檔的 metrics_port，0 為關閉)")
+    a = ap.parse_args(argv)
+
+    # 核心模組 (requests、asyncio 子程序等) 在解析參數後才載入，--help 不必付出這些成本
+    from .config import LOG_DIR
+    from .store import LogArchive
+    from .engine import Engine
+    archive = LogArchive(LOG_DIR / "headless.log"); lock = threading.Lock()
+    def out(m):
+        now = datetime.now()
+        with lock: print(f"[{now:%H:%M:%S}] {m}", flush=True); archive.write([f"{now:%Y-%m-%d %H:%M:%S} {m}"])
+
+    engine = Engine(metrics_port=a.metrics_port); engine.set_log_handler(out)
+    engine.sup.on_log = lambda sid, m, lvl: out(f"[{sid}] {m}")
+    def on_result(d):
+        for l in engine.went_live(d):
+            out(f"{l} 開台")
+            if a.open_browser: import webbrowser; webbrowser.open(f"https://www.twitch.tv/{l}")
+    engine.watcher.on_result = on_result
+
+    wcfg = engine.store.get("watcher"); rcfg = engine.store.get("recorder")
+    watch = not a.no_watch and bool(wcfg.get("chs")); record = not a.no_record and bool(rcfg.get("c"))
+    # 推播同時供開台通知與錄影的偵測使用，只錄影 (--no-watch 或沒有監看頻道) 時也要設定
+    if wcfg.get("push") and (watch or record): engine.push_config(wcfg.get("utk", ""), True)
+    if watch:
+        engine.watcher.start(); out(f"開始監看 {len(wcfg['chs'])} 個頻道")
+    engine.resume_compress(rcfg)
+    if record:
+        folder = rcfg.get("f", os.getcwd())
+        try: os.makedirs(folder, exist_ok=True)
+        except OSError as e: out(f"❌ 無法建立存檔資料夾 {folder}: {e}"); record = False
+    if record:
+        for s in rcfg["c"]: engine.start_recording(s, rcfg)
+        out(f"開始錄影監控 {len(rcfg['c'])} 個頻道，存檔至 {folder}")
+    if not watch and not record: out("沒有要監看或錄影的頻道，請先在 GUI 設定或檢查設定檔")
+
+    # 收到 Ctrl+C / SIGTERM 後停止所有錄影並寫回設定；以逾時等待，Windows 上 Ctrl+C 也能中斷
+    stop = threading.Event()
+    for sig in (signal.SIGINT, getattr(signal, "SIGTERM", None), getattr(signal, "SIGBREAK", None)):
+        if sig: signal.signal(sig, lambda *_: stop.set())
+    while (watch or record) and not stop.wait(1): pass
+    out("結束中..."); engine.close(); out("已結束")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
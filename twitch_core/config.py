@@ -0,0 +1,87 @@
+import sys
+import shutil
+from pathlib import Path
+
+# ================= 路徑與環境設定 =================
+if getattr(sys, 'frozen', False):
+    BASE_DIR = Path(sys.executable).parent
+    if hasattr(sys, '_MEIPASS'):
+        RESOURCE_DIR = Path(sys._MEIPASS)
+    else:
+        RESOURCE_DIR = BASE_DIR
+else:
+    # 設定檔放在專案根目錄 (twitch_core 的上一層)，與 GUI 相同
+    BASE_DIR = Path(__file__).parent.parent.resolve()
+    RESOURCE_DIR = BASE_DIR
+
+CONFIG_WATCHER_PATH = BASE_DIR / "twitch_watcher_config.json"
+RECORDER_CONFIG_PATH = BASE_DIR / "recorder_config.json"
+COMPRESS_QUEUE_PATH = BASE_DIR / "compress_queue.json"
+LIVE_HISTORY_PATH = BASE_DIR / "live_history.json"
+STATE_PATH = BASE_DIR / "app_state.json"  # 開台通知已開啟的場次、錄影與壓縮紀錄
+LOG_DIR = BASE_DIR / "logs"
+
+def _tool(name):
+    # 優先使用隨附的 .exe，沒有時 (例如 Linux 伺服器) 改用 PATH 上的版本；確保路徑是絕對路徑，避免相對路徑錯誤
+    p = (RESOURCE_DIR / f"{name}.exe").resolve()
+    return str(p) if p.exists() else shutil.which(name) or str(p)
+
+FFMPEG_PATH = _tool("ffmpeg")
+FFPROBE_PATH = _tool("ffprobe")
+
+TWITCH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+TWITCH_VALIDATE_URL = "https://id.twitch.tv/oauth2/validate"
+EVENTSUB_WS_URL = "wss://eventsub.wss.twitch.tv/ws"
+EVENTSUB_KEEPALIVE_GRACE_SEC = 5
+PUSH_LOOKUP_DELAY_SEC = 10  # 推播開台後等這麼久再向 Helix 查詢標題 (新直播要一點時間才會出現在 streams)
+TWITCH_HELIX_BASE = "https://api.twitch.tv/helix"
+TWITCH_HELIX_STREAMS = TWITCH_HELIX_BASE + "/streams"
+HELIX_CONCURRENCY = 4
+HELIX_TIMEOUT_SEC = 10
+HELIX_RATE_PER_MIN = 800
+HELIX_MAX_RETRIES = 4
+HELIX_BACKOFF_BASE_SEC = 0.5
+HELIX_BACKOFF_MAX_SEC = 30
+TOKEN_REFRESH_BUFFER_SEC = 300
+LIVE_POLL_INTERVAL_SEC = 60
+SCHED_MIN_FACTOR = 0.25  # 常開台時段：基本間隔 × 0.25
+SCHED_MAX_FACTOR = 8  # 幾乎不會開台的時段：基本間隔 × 8
+SCHED_MIN_SEC = 10
+SCHED_MAX_SEC = 900
+SCHED_JITTER = 0.2
+SCHED_MIN_EVENTS = 3  # 開台紀錄少於此數時維持基本間隔
+SCHED_DECAY = 0.95  # 每次開台時舊紀錄的衰減，時段改變後能重新學習
+SCHED_LEAD_SEC = 1800  # 在常開台時段前多久開始加快檢查
+SCHED_PIGGYBACK = 0.5  # 剩餘時間不到基本間隔一半的頻道可以併入同一批
+SCHED_BUDGET_SEC = 600  # 請求額度與固定間隔輪詢相同，省下的額度最多累積這麼多秒的量，留給常開台時段加快檢查
+RESTART_BACKOFF_MIN_SEC = 5
+RESTART_BACKOFF_MAX_SEC = 300
+LOG_TAIL_LINES = 50
+STORE_DEBOUNCE_SEC = 1
+STORE_MAX_DELAY_SEC = 10
+STORE_RETRY_SEC = 30
+STATE_HISTORY_MAX = 200  # 錄影 / 壓縮紀錄各保留的筆數
+COMPRESS_DONE_MAX = 1000  # 壓縮佇列記住的已完成檔案數 (原始檔已不存在的紀錄載入時即移除)
+COMPRESS_MAX_ATTEMPTS = 3  # 同一個檔案壓縮失敗這麼多次後，啟動時不再自動加入佇列
+METRICS_HOST = "127.0.0.1"  # 指標只在本機提供
+METRICS_PORT = 0  # 0 代表不啟動指標 HTTP 端點
+LOG_ROTATE_BYTES = 1024 * 1024
+LOG_KEEP_FILES = 20
+FILE_CHECK_SEC = 5
+STALL_TIMEOUT_SEC = 30
+# 子程序的資源政策 (recorder 區段的 resources)：nice 為 -20~19；ionice 為 "類別[:等級]" (realtime / best-effort / idle，空字串為不變更，僅 Linux)；
+# reserve_cpus 為保留給錄影、壓縮不使用的核心 (數量或編號清單)；threads_cap 為每個壓縮的 -threads 上限 (0 為壓縮可用的核心數)
+RESOURCE_DEFAULTS = {"rec_nice": 0, "rec_ionice": "", "enc_nice": 10, "enc_ionice": "best-effort:7", "reserve_cpus": 0, "threads_cap": 0, "throttle": True}
+# 錄影比基準 (最近 RECORD_LAG_WINDOW 次檢查寫入速度的中位數) 少寫的量累積到相當於連續 RECORD_LAG_CHECKS 次只有基準的
+# RECORD_LAG_RATIO 時視為落後 (單次的位元率起伏不算)，補寫到剩一半以下才恢復
+RECORD_LAG_RATIO = 0.75
+RECORD_LAG_CHECKS = 3
+RECORD_LAG_WINDOW = 12
+THROTTLE_HOLD_SEC = 30  # 錄影落後時暫停壓縮，所有錄影恢復後再等這麼久才繼續
+COMPRESS_PROFILES = {"encode": "重新編碼 (H.264)", "remux": "無損封裝 (MP4)", "audio": "僅音訊 (M4A)"}
+VERIFY_MODES = {"probe": "快速檢查", "sample": "快速檢查 + 抽樣解碼", "full": "完整解碼"}
+X264_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow"]
+VERIFY_TOLERANCE_SEC = 2
+RECORD_MODES = {"ts": "TS (錄完再壓縮)", "fmp4": "MP4 直寫", "fmp4_enc": "MP4 直寫 + 即時轉碼", "segment": "分段錄影 (邊錄邊壓縮)"}
+MUX_FINISH_TIMEOUT_SEC = 15
+VERIFY_SAMPLE_SEC = 2
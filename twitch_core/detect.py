@@ -0,0 +1,167 @@
+import time
+import threading
+
+from .config import LIVE_POLL_INTERVAL_SEC, PUSH_LOOKUP_DELAY_SEC
+from .schedule import LiveHistory, PollScheduler, _parse_ts
+from .metrics import METRICS
+
+def _noop(*a): pass
+
+class Worker:
+    """可重複啟動的背景執行緒 (與 QThread 相同的 start / isRunning / wait)，子類別實作 run()"""
+    name = "worker"
+    def __init__(self): self.th = None
+    def isRunning(self): return self.th is not None and self.th.is_alive()
+    def start(self):
+        if self.isRunning(): return
+        self.th = threading.Thread(target=self.run, name=self.name, daemon=True); self.th.start()
+    def wait(self, timeout=None):
+        if self.th: self.th.join(timeout)
+
+def _polled(kind, n, t0):
+    METRICS.observe("twitch_poll_seconds", time.perf_counter() - t0, kind=kind); METRICS.inc("twitch_poll_channels_total", n, kind=kind); METRICS.set("twitch_poll_last_channels", n, kind=kind)
+
+def check_channels(helix, ls):
+    """開台通知用的查詢：回傳 ({login: {live, title, id, started[, error]}}, 錯誤訊息)"""
+    ls = [l.strip().lower() for l in ls if l]; out = {l: {"live": False, "title": "", "id": ""} for l in ls}
+    if not ls: return out, ""
+    live, failed, e = helix.streams(ls)
+    for l, d in live.items(): out[l] = {"live": True, "title": d.get("title", ""), "id": d.get("id", ""), "started": d.get("started_at", "")}
+    for l in failed: out[l]["error"] = True
+    return out, (f"{len(failed)} 個頻道查詢失敗: {e}" if len(failed) < len(ls) else e) if e else ""
+
+class LiveDetector(Worker):
+    """共用開台偵測：錄影頻道由 PollScheduler 排定各自的檢查時間，以 helix/streams 每 100 個一批查詢，只喚醒真正開台的頻道。
+    有 EventSub 推播的頻道不再輪詢，改由推播事件喚醒"""
+    name = "live-detector"
+    def __init__(self, helix=None, interval=LIVE_POLL_INTERVAL_SEC, push=None, history=None, on_error=None):
+        super().__init__(); self.on_error = on_error or _noop; self.helix = helix; self.interval = interval; self.run_flag = True
+        self.lock = threading.Lock(); self.subs = {}; self.wake = threading.Event(); self.last_err = None
+        self.sched = PollScheduler(history or LiveHistory(None), interval)
+        self.push = push; self.pushed = frozenset(); self.live = set(); self.started = {}  # login -> 直播開始時間 (Unix)
+        if push: push.add_listener(self._on_push, self._on_pushed)
+    def watch(self, sid, cb):
+        # cb 會在偵測執行緒中被呼叫，呼叫端需自行轉交回所屬執行緒
+        with self.lock: self.subs[sid.lower()] = cb; sids = list(self.subs)
+        self.sched.add(sid.lower())
+        if self.push: self.push.set_channels("recorder", sids)
+        self.wake.set()
+    def unwatch(self, sid):
+        with self.lock: self.subs.pop(sid.lower(), None); sids = list(self.subs)
+        self.sched.remove(sid.lower())
+        if self.push: self.push.set_channels("recorder", sids)
+    def started_at(self, sid):
+        """最後一次查詢 / 推播得知的直播開始時間，未知時為 None"""
+        with self.lock: return self.started.get(sid.lower())
+    def _on_push(self, login, info):
+        with self.lock:
+            if info["live"]: self.live.add(login); self.started[login] = _parse_ts(info.get("started"))
+            else: self.live.discard(login)
+            mine = login in self.subs; cb = self.subs.get(login) if info["live"] else None
+        if mine: self.sched.update(login, info)
+        if cb:
+            try: cb()
+            except RuntimeError: pass
+    def _on_pushed(self, pushed):
+        with self.lock: lost = self.pushed - pushed; self.pushed = pushed; self.live &= pushed
+        # 推播斷線的頻道立刻改回輪詢
+        if lost: self.sched.expedite(lost); self.wake.set()
+    def poll(self, sids):
+        """回傳 {login: 狀態}；無法查詢時 (未設定憑證 / API 錯誤) 視為開台，退回由 streamlink 自行判斷"""
+        if not self.helix: return {s: {"live": True, "error": True} for s in sids}
+        live, failed, e = self.helix.streams(sids)
+        if e != self.last_err:
+            # 同樣的錯誤只提示一次，避免每分鐘洗版
+            self.last_err = e
+            if e: self.on_error(f"開台偵測: {e}")
+        out = {s: {"live": False} for s in sids}
+        for s, d in live.items(): out[s] = {"live": True, "id": d.get("id", ""), "started": d.get("started_at", "")}
+        for s in failed: out[s] = {"live": True, "error": True}
+        return out
+    def run(self):
+        while self.run_flag:
+            self.wake.clear()
+            with self.lock: pushed = self.pushed; live = self.live & set(self.subs)
+            # 推播頻道沿用最後一次推播的狀態，錄影中斷後仍能重新啟動
+            sids = self.sched.due(skip=pushed)
+            if sids:
+                t0 = time.perf_counter(); res = self.poll(sids); _polled("recorder", len(sids), t0)
+                for s, i in res.items():
+                    self.sched.update(s, i)
+                    if i["live"]: live.add(s)
+                    if i.get("started"):
+                        with self.lock: self.started[s] = _parse_ts(i["started"])
+            for s in live:
+                with self.lock: cb = self.subs.get(s)
+                if cb:
+                    try: cb()
+                    except RuntimeError: pass  # 事件迴圈已關閉
+            nxt = self.sched.next_wake(skip=pushed)
+            self.wake.wait(self.interval if nxt is None else min(nxt, self.interval))
+    def stop(self): self.run_flag = False; self.wake.set()
+
+
+class ChannelWatcher:
+    """開台通知的輪詢：與 LiveDetector 相同的排程與推播分工，但回報所有頻道的狀態與標題。
+    推播的開台事件沒有標題，PUSH_LOOKUP_DELAY_SEC 秒後另外查詢一次補上。
+    on_result({login: 狀態}) 與 on_log 在背景執行緒呼叫；stop() 後仍在路上的查詢結果會被丟棄"""
+    def __init__(self, helix, push=None, history=None, interval=LIVE_POLL_INTERVAL_SEC, on_result=None, on_log=None):
+        self.helix = helix; self.push = push; self.on_result = on_result or _noop; self.on_log = on_log or _noop
+        self.lock = threading.Lock(); self.wake = threading.Event(); self.gen = 0; self.full = False
+        self.chans = []; self.pushed = frozenset(); self.sched = PollScheduler(history or LiveHistory(None), interval); self.lookup = {}  # login -> 補查標題的時間 (monotonic)
+        if push: push.add_listener(self._on_push, self._on_pushed)
+    def running(self): return self.gen % 2 == 1
+    def set_channels(self, logins):
+        logins = [l.lower() for l in logins]
+        with self.lock: old = set(self.chans); self.chans = logins
+        for l in set(logins) - old: self.sched.add(l)
+        for l in old - set(logins): self.sched.remove(l)
+        if self.push: self.push.set_channels("watcher", logins)
+        self.wake.set()
+    def set_interval(self, sec): self.sched.base = sec
+    def start(self):
+        # 開始監看時全部查詢一次；gen 為奇數代表監看中，舊的執行緒看到 gen 改變就結束
+        with self.lock:
+            if self.running(): return
+            self.gen += 1; self.full = True; gen = self.gen
+        threading.Thread(target=self._run, args=(gen,), name="watcher", daemon=True).start()
+    def stop(self):
+        with self.lock:
+            if self.running(): self.gen += 1
+        self.wake.set()
+    def _on_push(self, login, info):
+        with self.lock: mine = self.running() and login in self.chans
+        if not mine: return
+        self.sched.update(login, info); self.on_result({login: info})
+        if info["live"] and "title" not in info:
+            with self.lock: self.lookup[login] = time.monotonic() + PUSH_LOOKUP_DELAY_SEC
+            self.wake.set()
+    def _on_pushed(self, pushed):
+        with self.lock: old = self.pushed; self.pushed = pushed; lost = old - pushed
+        self._report(old, pushed)
+        # 推播斷線的頻道立刻改回輪詢
+        if lost and self.running(): self.sched.expedite(lost); self.wake.set()
+    def _report(self, old, new):
+        with self.lock: chs = set(self.chans)
+        n = len(new & chs)
+        if n != len(old & chs): self.on_log(f"EventSub 推播 {n} 個頻道，其餘 {len(chs) - n} 個輪詢")
+    def _run(self, gen):
+        while self.gen == gen:
+            self.wake.clear()
+            with self.lock:
+                full = self.full; self.full = False; pushed = self.pushed; now = time.monotonic()
+                look = [l for l, t in self.lookup.items() if t <= now and l in self.chans]; self.lookup = {l: t for l, t in self.lookup.items() if t > now}
+            # 有推播的頻道不必輪詢；剛推播開台的頻道併入同一批補查標題
+            ls = self.sched.due(skip=() if full else pushed, everything=full); look = [l for l in look if l not in ls]
+            if ls or look:
+                t0 = time.perf_counter(); out, e = check_channels(self.helix, ls + look); _polled("watcher", len(ls) + len(look), t0)
+                if self.gen != gen: return
+                # 補查時 Helix 還沒列出這場直播 (或查詢失敗) 就沿用推播的狀態
+                for l in look:
+                    if not out[l]["live"]: del out[l]
+                for l, i in out.items(): self.sched.update(l, i)
+                if e: self.on_log(e)
+                self.on_result(out)
+            with self.lock: waits = [max(0.0, t - time.monotonic()) for t in self.lookup.values()]
+            waits += [w for w in (self.sched.next_wake(skip=pushed),) if w is not None]
+            self.wake.wait(min(waits) if waits else None)
@@ -0,0 +1,98 @@
+import os
+import collections
+
+from .config import FFMPEG_PATH, HELIX_CONCURRENCY, LIVE_POLL_INTERVAL_SEC, LOG_TAIL_LINES, METRICS_PORT
+from .store import StateStore
+from .twitch import TokenManager, HelixClient, EventSubClient
+from .schedule import LiveHistory
+from .detect import LiveDetector, ChannelWatcher
+from .recorder import RecordSupervisor
+from .metrics import MetricsServer
+
+PROFILE_DEFAULTS = {"profile": "encode", "preset": "medium", "crf": 23, "threads": 0, "verify": "probe"}
+
+def job_opts(cfg):
+    # 加入佇列時的壓縮設定會跟著工作一起存檔
+    return dict(PROFILE_DEFAULTS, **cfg.get("profile", {}), keep=cfg.get("keep_original", False))
+
+def rec_opts(cfg):
+    # 即時轉碼沿用壓縮設定的 preset / CRF / 執行緒；分段錄影的每一段依目前的壓縮設定處理
+    job = job_opts(cfg)
+    return {"mode": cfg.get("rec_mode", "ts"), "preset": job["preset"], "crf": job["crf"], "threads": job["threads"],
+            "segment_min": cfg.get("segment_min", 10), "job": job, "encode": cfg.get("compress", True) and os.path.exists(FFMPEG_PATH)}
+
+def interval(cfg):
+    try: return max(5, int(cfg.get("int", LIVE_POLL_INTERVAL_SEC)))
+    except (TypeError, ValueError): return LIVE_POLL_INTERVAL_SEC
+
+class Engine:
+    """開台通知與錄影的核心，不依賴 Qt：GUI 與 --headless 共用。設定一律從 StateStore 的 watcher / recorder 區段讀取，
+    所有回呼都可能在背景執行緒呼叫，GUI 需自行轉回 GUI 執行緒"""
+    def __init__(self, store=None, metrics_port=None):
+        self.store = store or StateStore(); self.logs = collections.deque(maxlen=LOG_TAIL_LINES); self.on_log = None; self.tk_err = None; self.metrics = None
+        self.store.set_error_handler(self.log)
+        cfg = self.store.get("watcher"); self.sess = dict(self.store.get("state").get("sess", {}))
+        self.history = LiveHistory(self.store)
+        # Token 在背景執行緒取得與刷新，結果直接合併進 watcher 區段
+        self.tokens = TokenManager(on_token=self._token, on_error=self._token_err)
+        self.tokens.set_credentials(cfg.get("cid", "").strip(), cfg.get("sec", "").strip(), cfg.get("tk"), cfg.get("exp", 0))
+        self.helix = HelixClient(self.tokens.headers, int(cfg.get("helix_concurrency", HELIX_CONCURRENCY)))
+        # 開台通知與錄影共用同一組 Twitch 憑證、Helix 連線池、EventSub 推播與開台歷史
+        self.push = EventSubClient(self.helix, on_error=self.log)
+        self.watcher = ChannelWatcher(self.helix, self.push, self.history, interval(cfg), on_log=self.log)
+        self.watcher.set_channels(cfg.get("chs", []))
+        self.detector = LiveDetector(self.helix, push=self.push, history=self.history, on_error=self.log)
+        self.sup = RecordSupervisor(self.detector, self.store, on_compress=self._recorded, resources=self.store.get("recorder").get("resources"))
+        # 指標端點：metrics_port 未指定時使用 watcher 區段的 metrics_port
+        port = metrics_port if metrics_port is not None else cfg.get("metrics_port", METRICS_PORT)
+        if port: self.serve_metrics(int(port))
+    def set_log_handler(self, cb):
+        # 補送設定前的訊息 (例如啟動時讀檔失敗)
+        self.on_log = cb
+        for m in list(self.logs): cb(m)
+    def log(self, m):
+        self.logs.append(m)
+        if self.on_log: self.on_log(m)
+    def serve_metrics(self, port):
+        try: self.metrics = MetricsServer(port); self.log(f"📊 指標: http://{self.metrics.host}:{self.metrics.port}/metrics (JSON: /metrics.json)")
+        except OSError as e: self.log(f"⚠️ 無法啟動指標端點 (port {port}): {e}")
+    # ---- 開台通知 ----
+    def _token(self, tk, exp):
+        self.store.update("watcher", lambda d: d.update(tk=tk, exp=exp)); self.tk_err = None; self.log("Token OK")
+    def _token_err(self, e):
+        # 背景重試失敗時同樣的錯誤只提示一次
+        if e != self.tk_err: self.tk_err = e; self.log(e)
+    def push_config(self, utk, on): self.push.configure(utk.strip() if on else "")
+    def went_live(self, d):
+        """回傳 d 中新開台 (尚未通知過這個場次) 的頻道；sess 存入 store，重新啟動也不會再通知一次"""
+        new = [l for l, i in d.items() if i.get("live") and i.get("id") and i["id"] != self.sess.get(l)]
+        if new: self.sess.update((l, d[l]["id"]) for l in new); self._save_sess()
+        return new
+    def forget(self, login):
+        if self.sess.pop(login, None): self._save_sess()
+    def _save_sess(self): self.store.update("state", lambda d: d.__setitem__("sess", dict(self.sess)))
+    # ---- 錄影 ----
+    def start_recording(self, sid, cfg=None):
+        cfg = cfg if cfg is not None else self.store.get("recorder")
+        if not self.detector.isRunning(): self.detector.run_flag = True; self.detector.start()
+        self.sup.add(sid, cfg.get("q", "best"), cfg.get("f", os.getcwd()), rec_opts(cfg))
+    def _recorded(self, sid, fpath):
+        # 錄影結束後依當時的設定決定是否壓縮
+        cfg = self.store.get("recorder")
+        if not cfg.get("compress", True): return
+        if not os.path.exists(FFMPEG_PATH): self.sup.on_log(sid, "⚠️ FFmpeg 不存在，跳過壓縮", 2); return
+        self.sup.compress(sid, fpath, job_opts(cfg))
+    def compress_config(self, cfg=None):
+        cfg = cfg if cfg is not None else self.store.get("recorder")
+        self.sup.compress_opts(cfg.get("workers", os.cpu_count() or 1), cfg.get("priority", "fifo"), cfg.get("compress_paused", False))
+        self.sup.resource_opts(cfg.get("resources"))
+    def resume_compress(self, cfg=None):
+        # 套用壓縮佇列設定，並接手上次未完成 / 當機遺留的錄影檔
+        cfg = cfg if cfg is not None else self.store.get("recorder"); self.compress_config(cfg)
+        folder = cfg.get("f", os.getcwd())
+        if cfg.get("compress", True) and os.path.exists(FFMPEG_PATH) and os.path.isdir(folder): self.sup.compress_scan(folder, job_opts(cfg))
+    def close(self):
+        # 所有錄影同時停止；進行中的壓縮中止後留在佇列，下次啟動接手
+        self.watcher.stop(); self.sup.shutdown(); self.detector.stop(); self.detector.wait()
+        self.push.close(); self.helix.close(); self.tokens.close(); self.store.close()
+        if self.metrics: self.metrics.close()
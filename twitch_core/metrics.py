@@ -0,0 +1,108 @@
+import json
+import bisect
+import threading
+
+from .config import METRICS_HOST
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+GOLIVE_BUCKETS = (5, 10, 20, 30, 60, 120, 300, 600, 1800)
+SPEED_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200)
+
+class Metrics:
+    """程序內的指標登錄 (counter / gauge / histogram，可帶標籤)：熱路徑只做一次加鎖的字典更新，
+    匯出時才轉成 Prometheus 文字格式或 JSON"""
+    def __init__(self):
+        self.lock = threading.Lock(); self.defs = {}  # 名稱 -> (種類, 說明, 直方圖的桶)
+        self.series = {}  # 名稱 -> {標籤: 值}；直方圖的值為 [各桶 (非累積) 次數, 總和, 次數]
+    def define(self, name, kind, help, buckets=()):
+        with self.lock: self.defs[name] = (kind, help, tuple(buckets)); self.series.setdefault(name, {})
+    @staticmethod
+    def _key(labels): return tuple(sorted((k, str(v)) for k, v in labels.items()))
+    def inc(self, name, v=1, **labels):
+        k = self._key(labels)
+        with self.lock: s = self.series[name]; s[k] = s.get(k, 0) + v
+    def set(self, name, v, **labels):
+        k = self._key(labels)
+        with self.lock: self.series[name][k] = v
+    def observe(self, name, v, **labels):
+        k = self._key(labels); b = self.defs[name][2]
+        with self.lock:
+            h = self.series[name].get(k)
+            if h is None: h = self.series[name][k] = [[0] * (len(b) + 1), 0.0, 0]
+            h[0][bisect.bisect_left(b, v)] += 1; h[1] += v; h[2] += 1
+    def remove(self, name, **labels):
+        # 例如錄影結束後移除該頻道的序列，避免匯出越來越多已結束的頻道
+        with self.lock: self.series[name].pop(self._key(labels), None)
+    def get(self, name, **labels):
+        with self.lock: return self.series[name].get(self._key(labels))
+    def _rows(self):
+        with self.lock: return [(n, *self.defs[n], [(dict(k), v if not isinstance(v, list) else [list(v[0]), v[1], v[2]]) for k, v in s.items()]) for n, s in self.series.items()]
+    def snapshot(self):
+        """JSON 可序列化的快照；直方圖的 buckets 為累積次數 (與 Prometheus 相同)"""
+        out = {}
+        for name, kind, help, b, rows in self._rows():
+            vals = []
+            for labels, v in rows:
+                if kind != "histogram": vals.append({"labels": labels, "value": v}); continue
+                cum = 0; bk = {}
+                for le, c in zip(list(b) + ["+Inf"], v[0]): cum += c; bk[str(le)] = cum
+                vals.append({"labels": labels, "count": v[2], "sum": v[1], "buckets": bk})
+            out[name] = {"type": kind, "help": help, "values": vals}
+        return out
+    def prometheus(self):
+        """Prometheus 文字格式 (version 0.0.4)"""
+        lines = []
+        for name, kind, help, b, rows in self._rows():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, v in rows:
+                if kind != "histogram": lines.append(f"{name}{_labels(labels)} {_num(v)}"); continue
+                cum = 0
+                for le, c in zip(list(b) + ["+Inf"], v[0]): cum += c; lines.append(f"{name}_bucket{_labels(dict(labels, le=le))} {cum}")
+                lines += [f"{name}_sum{_labels(labels)} {_num(v[1])}", f"{name}_count{_labels(labels)} {v[2]}"]
+        return "\n".join(lines) + "\n"
+
+def _labels(d):
+    if not d: return ""
+    esc = lambda s: str(s).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in d.items()) + "}"
+
+def _num(v): return repr(float(v)) if isinstance(v, float) else str(v)
+
+METRICS = Metrics()
+for _n, _k, _h, *_b in [
+    ("twitch_helix_request_seconds", "histogram", "Helix / OAuth 請求延遲 (每次嘗試)", LATENCY_BUCKETS),
+    ("twitch_helix_responses_total", "counter", "Helix / OAuth 回應數，依 HTTP 狀態碼 (連線失敗為 error)"),
+    ("twitch_helix_ratelimit_remaining", "gauge", "最後一次回應的 Ratelimit-Remaining"),
+    ("twitch_poll_seconds", "histogram", "一輪開台查詢的時間 (kind=watcher 為開台通知，recorder 為錄影)", LATENCY_BUCKETS),
+    ("twitch_poll_channels_total", "counter", "開台查詢檢查過的頻道數"),
+    ("twitch_poll_last_channels", "gauge", "最後一輪開台查詢的頻道數"),
+    ("twitch_streamlink_processes", "gauge", "執行中的 streamlink 程序數"),
+    ("twitch_recording_bytes", "gauge", "進行中錄影已寫入的位元組數"),
+    ("twitch_recording_write_bytes_per_second", "gauge", "進行中錄影最近一次檢查的寫入速度"),
+    ("twitch_recording_stalls_total", "counter", "錄影停滯 (STALL_TIMEOUT_SEC 內檔案沒有成長) 次數"),
+    ("twitch_golive_to_record_seconds", "histogram", "從直播開始 (started_at) 到開始寫入錄影檔的時間", GOLIVE_BUCKETS),
+    ("twitch_compress_queue_depth", "gauge", "壓縮佇列中等待的工作數"),
+    ("twitch_compress_active", "gauge", "進行中的壓縮 / 合併工作數"),
+    ("twitch_compress_jobs_total", "counter", "完成的壓縮工作數，依結果 (ok / failed)"),
+    ("twitch_encode_speed_ratio", "histogram", "壓縮速度 (×即時，取自 ffmpeg 的 speed=)", SPEED_BUCKETS),
+    ("twitch_compress_saved_bytes_total", "counter", "壓縮後節省的位元組數 (可能為負)"),
+    ("twitch_compress_throttled", "gauge", "是否因錄影落後而暫停壓縮 (1 / 0)"),
+    ("twitch_compress_throttles_total", "counter", "因錄影落後而暫停壓縮的次數"),
+]: METRICS.define(_n, _k, _h, *_b)
+
+class MetricsServer:
+    """在本機以 HTTP 提供 /metrics (Prometheus 文字格式) 與 /metrics.json (JSON 快照)"""
+    def __init__(self, port, host=METRICS_HOST, registry=METRICS):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(h):
+                path = h.path.split("?", 1)[0]
+                if path == "/metrics": body = registry.prometheus().encode(); ctype = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/metrics.json": body = json.dumps(registry.snapshot(), ensure_ascii=False).encode(); ctype = "application/json; charset=utf-8"
+                else: h.send_error(404); return
+                h.send_response(200); h.send_header("Content-Type", ctype); h.send_header("Content-Length", str(len(body))); h.end_headers(); h.wfile.write(body)
+            def log_message(h, *a): pass
+        self.httpd = ThreadingHTTPServer((host, port), Handler); self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True).start()
+    def close(self): self.httpd.shutdown(); self.httpd.server_close()
@@ -0,0 +1,542 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import shutil
+import statistics
+import threading
+import subprocess
+import collections
+from pathlib import Path
+from datetime import datetime
+
+from .detect import Worker, _noop
+from .metrics import METRICS
+from .resources import ResourcePolicy, popen_kw
+from .config import (FFMPEG_PATH, FFPROBE_PATH, LOG_TAIL_LINES, FILE_CHECK_SEC, STALL_TIMEOUT_SEC, RESTART_BACKOFF_MIN_SEC,
+                     RESTART_BACKOFF_MAX_SEC, MUX_FINISH_TIMEOUT_SEC, VERIFY_TOLERANCE_SEC, VERIFY_SAMPLE_SEC, COMPRESS_PROFILES,
+                     STATE_HISTORY_MAX, COMPRESS_DONE_MAX, COMPRESS_MAX_ATTEMPTS, RECORD_LAG_RATIO, RECORD_LAG_WINDOW,
+                     RECORD_LAG_CHECKS, THROTTLE_HOLD_SEC)
+
+def _streamlink_cmd(args):
+    if getattr(sys, 'frozen', False): return [sys.executable, "--internal-streamlink"] + args
+    return [sys.executable, "-m", "streamlink"] + args
+
+def _child_watcher(loop):
+    """Python 3.11 以前 Linux 預設的 ThreadedChildWatcher 每個子程序開一個 waitpid 執行緒；支援 pidfd 時改用綁定 loop 的
+    PidfdChildWatcher，執行緒數不隨錄影數增加 (3.12 起預設即是如此)。回傳是否已替換，loop 關閉後要 set_child_watcher(None) 換回預設"""
+    if sys.version_info >= (3, 12) or not hasattr(asyncio, "PidfdChildWatcher"): return False
+    try: os.close(os.pidfd_open(os.getpid()))
+    except (AttributeError, OSError): return False
+    w = asyncio.PidfdChildWatcher(); w.attach_loop(loop); asyncio.set_child_watcher(w); return True
+
+async def _run_proc(cmd, stdout=subprocess.DEVNULL, policy=None):
+    # 壓縮 / 合併 / 驗證用的 ffmpeg，依 policy 以 encode 類別執行；被取消時一併結束子程序，避免留下孤兒 ffmpeg
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=stdout, stderr=subprocess.PIPE, **(policy.popen_kw("encode") if policy else popen_kw()))
+    if policy: policy.spawned("encode", proc.pid)
+    try: out, err = await proc.communicate()
+    finally:
+        # exited 會先恢復暫停中的程序，被取消時才收得到結束訊號
+        if policy: policy.exited(proc.pid)
+        await _terminate(proc)
+    return proc.returncode, out, err
+
+def _ffmpeg_speed(err):
+    # ffmpeg 進度行的最後一個 speed=12.3x (×即時)，沒有時回傳 None
+    m = re.findall(rb"speed=\s*([\d.]+)x", err or b"")
+    try: return float(m[-1]) if m else None
+    except ValueError: return None
+
+def _compress_cmd(src, opts):
+    """依壓縮設定組出 ffmpeg 指令，回傳 (指令, 輸出路徑)"""
+    base = src.rsplit('.', 1)[0]; profile = opts.get("profile", "encode")
+    if profile == "remux":
+        # 不重新編碼，只換成 faststart MP4 封裝
+        out = base + '.mp4'; args = ['-map', '0:v?', '-map', '0:a?', '-c', 'copy', '-movflags', '+faststart']
+    elif profile == "audio":
+        out = base + '.m4a'; args = ['-vn', '-map', '0:a?', '-c:a', 'copy', '-movflags', '+faststart']
+    else:
+        out = base + '.mp4'; args = ['-c:v', 'libx264', '-preset', opts.get("preset", "medium"), '-crf', str(opts.get("crf", 23))]
+        if opts.get("threads"): args += ['-threads', str(opts["threads"])]
+        args += ['-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart']
+    return [FFMPEG_PATH, '-i', src] + args + ['-y', out], out
+
+def _mux_cmd(fpath, rec):
+    """從 stdin 讀 streamlink 輸出並寫成 fragmented MP4 的 ffmpeg 指令；程序中途被結束檔案仍可播放"""
+    if rec.get("mode") == "segment":
+        # fpath 為分段資料夾，依時間切成 part_0000.ts、part_0001.ts ...
+        return [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-map', '0:v?', '-map', '0:a?', '-c', 'copy',
+                '-f', 'segment', '-segment_time', str(rec.get("segment_min", 10) * 60), '-segment_format', 'mpegts', '-reset_timestamps', '1',
+                os.path.join(fpath, 'part_%04d.ts')]
+    if rec.get("mode") == "fmp4_enc":
+        codec = ['-c:v', 'libx264', '-preset', rec.get("preset", "veryfast"), '-crf', str(rec.get("crf", 23))]
+        if rec.get("threads"): codec += ['-threads', str(rec["threads"])]
+        codec += ['-c:a', 'aac', '-b:a', '128k']
+    else: codec = ['-c', 'copy']
+    return [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-map', '0:v?', '-map', '0:a?'] + codec + [
+        '-movflags', '+frag_keyframe+empty_moov+default_base_moof', '-f', 'mp4', '-y', fpath]
+
+async def _probe_duration(path, policy=None):
+    """以 ffprobe 讀取容器時長 (秒)，失敗回傳 None"""
+    rc, out, _ = await _run_proc([FFPROBE_PATH, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=nw=1:nk=1', path], subprocess.PIPE, policy)
+    try: return float(out.decode().strip()) if rc == 0 else None
+    except ValueError: return None
+
+async def _verify_output(src, out, mode, policy=None):
+    """驗證輸出檔：probe 比對容器時長，sample 另外抽三段解碼，full 為完整解碼"""
+    if mode == "full" or not os.path.exists(FFPROBE_PATH):
+        return (await _run_proc([FFMPEG_PATH, '-v', 'error', '-i', out, '-f', 'null', '-'], policy=policy))[0] == 0
+    d_out = await _probe_duration(out, policy)
+    if not d_out: return False
+    d_src = await _probe_duration(src, policy)
+    if d_src and abs(d_src - d_out) > max(VERIFY_TOLERANCE_SEC, d_src * 0.01): return False
+    if mode == "sample":
+        for f in (0.1, 0.5, 0.9):
+            cmd = [FFMPEG_PATH, '-v', 'error', '-ss', f"{d_out * f:.2f}", '-t', str(VERIFY_SAMPLE_SEC), '-i', out, '-f', 'null', '-']
+            if (await _run_proc(cmd, policy=policy))[0] != 0: return False
+    return True
+
+def _size(path):
+    # 檔案大小；分段錄影時為資料夾內錄到的分段 (part_*.ts) 總和，不含同一個資料夾裡各段壓縮後的 .mp4
+    try:
+        if os.path.isdir(path): return sum(e.stat().st_size for e in os.scandir(path) if e.name.startswith("part_") and e.name.endswith(".ts") and e.is_file())
+        return os.path.getsize(path)
+    except OSError: return 0
+
+async def _finish(proc, timeout):
+    # 等待子程序自行結束，逾時才強制終止
+    try: await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError: await _terminate(proc)
+
+async def _terminate(proc, timeout=10):
+    if proc.returncode is not None: return
+    try: proc.terminate()
+    except ProcessLookupError: return
+    try: await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        try: proc.kill()
+        except ProcessLookupError: pass
+        await proc.wait()
+
+class StreamlinkLogParser:
+    """逐行解析 streamlink 輸出：只保留最後 LOG_TAIL_LINES 行，並把關鍵訊息轉成事件"""
+    # 依序比對，第一個符合的規則決定事件種類
+    RULES = [
+        ("offline", "Stream is offline"), ("offline", "No playable streams"),
+        ("plugin", "Found matching plugin"), ("opened", "Opening stream"),
+        ("ffmpeg_error", "error: FFmpeg"), ("ffmpeg_error", "[stream.ffmpegmux][error]"),
+        ("ended", "Stream ended"), ("skipped", "Skipped segments"), ("error", "error:"),
+    ]
+    def __init__(self, maxlen=LOG_TAIL_LINES): self.tail = collections.deque(maxlen=maxlen); self.seen = set()
+    def feed(self, line):
+        line = line.rstrip()
+        if not line: return None
+        self.tail.append(line)
+        for kind, pat in self.RULES:
+            if pat in line: self.seen.add(kind); return kind
+        return None
+    def last(self): return self.tail[-1] if self.tail else ""
+
+class CompressQueue:
+    """壓縮工作佇列：待處理與已完成的檔案都存入 store 的 compress 區段，重新啟動後可接續，也不會重複壓縮。
+    已完成只保留原始檔仍存在的最新 COMPRESS_DONE_MAX 筆；失敗次數記在 failed，達到 COMPRESS_MAX_ATTEMPTS 的檔案 scan 不再重試"""
+    def __init__(self, store=None):
+        self.store = store; d = store.get("compress") if store else {}
+        self.pending = d.get("pending", []); self.groups = d.get("groups", {})
+        # 原始檔已刪除 (壓縮後未保留或被使用者移走) 的紀錄不再需要
+        self.done = dict.fromkeys(k for k in d.get("done", []) if os.path.exists(k))
+        self.failed = {k: n for k, n in d.get("failed", {}).items() if os.path.exists(k)}
+        self.seq = max([j["seq"] for j in self.pending] + [0]) + 1
+        self.workers = os.cpu_count() or 1; self.priority = "fifo"; self.paused = False
+    @staticmethod
+    def key(fpath): return os.path.normcase(os.path.abspath(fpath))
+    def save(self):
+        METRICS.set("twitch_compress_queue_depth", len(self.pending))
+        for k in list(self.done)[:-COMPRESS_DONE_MAX]: del self.done[k]
+        if self.store: self.store.put("compress", {"pending": self.pending, "done": list(self.done), "failed": self.failed, "groups": self.groups})
+    def queued(self, k): return k in self.done or any(j["path"] == k for j in self.pending)
+    def push(self, sid, fpath, opts):
+        k = self.key(fpath)
+        if self.queued(k): return False
+        self.pending.append({"sid": sid, "path": k, "opts": opts, "seq": self.seq}); self.seq += 1; self.save()
+        return True
+    def scan(self, folder, opts):
+        """找出上次當機遺留、尚未壓縮的 .ts (同名 .mp4 / .m4a 已存在者視為已處理，已失敗 COMPRESS_MAX_ATTEMPTS 次者不再重試)"""
+        found = 0
+        for p in list(Path(folder).glob("*.ts")) + list(Path(folder).glob("*/*.ts")):
+            k = self.key(p)
+            if self.queued(k) or self.failed.get(k, 0) >= COMPRESS_MAX_ATTEMPTS or p.with_suffix(".mp4").exists() or p.with_suffix(".m4a").exists(): continue
+            sid = p.parent.name if p.parent != Path(folder) else p.stem.rsplit("_", 2)[0]
+            found += self.push(sid, str(p), opts)
+        return found
+    def pop(self, busy):
+        cand = [j for j in self.pending if j["path"] not in busy]
+        if not cand: return None
+        # 錄影中的分段一律優先，讓最終檔案在下播後盡快完成
+        if self.priority == "size":
+            # 小檔優先：短片先完成，較早釋放磁碟空間
+            def size(j):
+                try: return os.path.getsize(j["path"])
+                except OSError: return 0
+            return min(cand, key=lambda j: ("group" not in j["opts"], size(j)))
+        return min(cand, key=lambda j: ("group" not in j["opts"], j["seq"]))
+    def finish(self, job, ok, out_path=None):
+        if job in self.pending: self.pending.remove(job)
+        g = self.groups.get(job["opts"].get("group"))
+        if g is not None: g["parts"][str(job["opts"]["idx"])] = out_path if ok else None
+        elif ok: self.done[job["path"]] = None; self.failed.pop(job["path"], None)
+        else: self.failed[job["path"]] = self.failed.get(job["path"], 0) + 1
+        self.save()
+    # ---- 分段錄影：每段各自壓縮，全部完成後再無損合併 ----
+    def open_group(self, gid, sid, final, opts):
+        self.groups[gid] = {"sid": sid, "final": final, "opts": opts, "parts": {}, "count": None}; self.save()
+    def push_part(self, gid, idx, fpath):
+        g = self.groups[gid]
+        if g["opts"].get("encode"): self.push(g["sid"], fpath, dict(g["opts"], keep=True, group=gid, idx=idx))
+    def close_group(self, gid, count): self.groups[gid]["count"] = count; self.save()
+    def drop_group(self, gid): self.groups.pop(gid, None); self.save()
+    def ready_groups(self):
+        return [gid for gid, g in self.groups.items() if g["count"] is not None and (not g["opts"].get("encode") or len(g["parts"]) >= g["count"])]
+    def recover(self):
+        """載入時仍未結束的分段組代表上次錄影被中斷：補排剩下的分段並直接結束該組"""
+        for gid, g in self.groups.items():
+            if g["count"] is not None: continue
+            parts = sorted(p for p in Path(gid).glob("part_*.ts") if p.stat().st_size > 0)
+            queued = {j["opts"].get("idx") for j in self.pending if j["opts"].get("group") == gid}
+            for i, p in enumerate(parts):
+                if str(i) not in g["parts"] and i not in queued: self.push_part(gid, i, str(p))
+            g["count"] = len(parts)
+        self.save()
+
+class RecordSupervisor(Worker):
+    """單一 asyncio 事件迴圈負責所有 streamlink / ffmpeg 子程序，執行緒數量不隨頻道數增加。
+    子程序依 ResourcePolicy (resources 為其設定) 分成錄影與壓縮兩類套用優先權，任何錄影落後時暫停壓縮。
+    回呼都在事件迴圈的執行緒呼叫：on_log(sid, 訊息, 等級)、on_compress(sid, 檔案)、on_done(sid, 檔案, 成功)、on_event(sid, 種類, 資料)"""
+    name = "record-supervisor"
+    def __init__(self, detector, store=None, on_log=None, on_compress=None, on_done=None, on_event=None, resources=None):
+        super().__init__(); self.on_log = on_log or _noop; self.on_compress = on_compress or _noop; self.on_done = on_done or _noop; self.on_event = on_event or _noop
+        self.detector = detector; self.store = store; self.loop = None; self.ready = threading.Event()
+        self.policy = ResourcePolicy(resources, on_error=lambda m: self.on_log("資源", m, 2))
+        self.chans = {}; self.compressing = {}; self.cq = CompressQueue(store); self.cq_wake = self.dispatcher = None  # 只在事件迴圈內存取
+        self.lagging = set(); self.lag_at = -THROTTLE_HOLD_SEC; self.resume = None
+    def run(self):
+        self.loop = asyncio.new_event_loop(); asyncio.set_event_loop(self.loop); pidfd = _child_watcher(self.loop)
+        self.cq.recover(); self.cq_wake = asyncio.Event(); self.cq_wake.set(); self.dispatcher = self.loop.create_task(self._dispatch()); self.ready.set()
+        try: self.loop.run_forever()
+        finally:
+            self.ready.clear(); self.loop.close()
+            if pidfd: asyncio.set_child_watcher(None)
+    # ---- 以下供其他執行緒呼叫 ----
+    def _submit(self, coro):
+        if not self.isRunning(): self.start()
+        self.ready.wait(); return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    def add(self, sid, qual, folder, rec): self._submit(self._add(sid, qual, folder, rec))
+    def stop(self, sids):
+        # 多個頻道同時終止，只等待一次
+        if self.isRunning(): self._submit(self._stop(sids)).result()
+    def compress(self, sid, fpath, opts): self._submit(self._compress_push(sid, fpath, opts))
+    def compress_scan(self, folder, opts): self._submit(self._compress_scan(folder, opts))
+    def compress_opts(self, workers, priority, paused): self._submit(self._compress_opts(workers, priority, paused))
+    def resource_opts(self, cfg): self._submit(self._resource_opts(cfg))
+    def shutdown(self):
+        if not self.isRunning(): return
+        self._submit(self._shutdown()).result(); self.loop.call_soon_threadsafe(self.loop.stop); self.wait()
+    def _remember(self, kind, **rec):
+        # 錄影 / 壓縮紀錄存入 store 的 state 區段，只保留最新 STATE_HISTORY_MAX 筆
+        def add(d):
+            h = d.setdefault(kind, []); h.append(dict(rec, ts=int(time.time()))); del h[:-STATE_HISTORY_MAX]
+        if self.store: self.store.update("state", add)
+    # ---- 以下在事件迴圈內執行 ----
+    async def _add(self, sid, qual, folder, rec):
+        if sid in self.chans: return
+        wake = asyncio.Event(); loop = self.loop
+        self.detector.watch(sid, lambda: loop.call_soon_threadsafe(wake.set))
+        self.chans[sid] = loop.create_task(self._channel(sid, qual, folder, rec, wake))
+    async def _stop(self, sids):
+        ts = [self.chans.pop(s) for s in sids if s in self.chans]
+        for t in ts: t.cancel()
+        await asyncio.gather(*ts, return_exceptions=True)
+    async def _shutdown(self):
+        # 進行中的壓縮直接中止，工作仍留在佇列檔，下次啟動時重新壓縮
+        await self._stop(list(self.chans)); self.dispatcher.cancel(); self.policy.throttle(False); METRICS.set("twitch_compress_throttled", 0)
+        if self.resume: self.resume.cancel()
+        for t in self.compressing.values(): t.cancel()
+        await asyncio.gather(*self.compressing.values(), return_exceptions=True)
+    async def _channel(self, sid, qual, folder, rec, wake):
+        self.on_log(sid, "啟動監控...", 0); backoff = 0
+        try:
+            while True:
+                if backoff:
+                    self.on_log(sid, f"🔁 {backoff} 秒後重新啟動", 2); await asyncio.sleep(backoff)
+                else:
+                    # 等待 LiveDetector 回報開台才啟動 streamlink
+                    self.on_log(sid, "💤 等待開播...", 0); await wake.wait()
+                wake.clear()
+                # 異常結束時以指數退避重新啟動
+                crashed = await self._record(sid, qual, folder, rec)
+                backoff = min(max(backoff * 2, RESTART_BACKOFF_MIN_SEC), RESTART_BACKOFF_MAX_SEC) if crashed else 0
+        finally:
+            self.detector.unwatch(sid); self.on_log(sid, "🛑 已停止", 2)
+    async def _record(self, sid, qual, folder, rec):
+        """錄一次直播，回傳 True 代表 streamlink 異常結束"""
+        s_folder = os.path.join(folder, sid)
+        if not os.path.exists(s_folder):
+            try: os.makedirs(s_folder)
+            except: s_folder = folder
+        piped = rec.get("mode", "ts") != "ts" and os.path.exists(FFMPEG_PATH); segmented = piped and rec.get("mode") == "segment"
+        base = os.path.join(s_folder, f"{sid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        fpath = base + ("_parts" if segmented else ".mp4" if piped else ".ts")
+        gid = None
+        if segmented:
+            # 分段錄影：fpath 為分段資料夾，每段完成就送去壓縮，下播後再合併成 base 檔
+            os.makedirs(fpath, exist_ok=True); gid = self.cq.key(fpath)
+            self.cq.open_group(gid, sid, base, dict(rec.get("job", {}), encode=rec.get("encode", False)))
+        url = f"https://www.twitch.tv/{sid}"; started = int(time.time())
+
+        # === 修正重點：強制指定 FFmpeg 路徑 ===
+        ffmpeg_args = []
+        if os.path.exists(FFMPEG_PATH):
+            ffmpeg_args = ["--ffmpeg-ffmpeg", FFMPEG_PATH]
+        cmd = _streamlink_cmd(["--twitch-disable-ads"] + ffmpeg_args + [url, qual] + (["-O"] if piped else ["-o", fpath]))
+
+        mux = None; rfd = wfd = None
+        try:
+            if piped:
+                # streamlink 的輸出直接導入 ffmpeg，一次寫成 MP4，不產生中間 .ts
+                rfd, wfd = os.pipe()
+                mux = await asyncio.create_subprocess_exec(*_mux_cmd(fpath, rec), stdin=rfd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **self.policy.popen_kw("record"))
+                self.policy.spawned("record", mux.pid)
+            # 將 stderr 也導向 PIPE 以便分析
+            proc = await asyncio.create_subprocess_exec(*cmd, stdout=wfd if piped else subprocess.PIPE, stderr=subprocess.PIPE, **self.policy.popen_kw("record"))
+            self.policy.spawned("record", proc.pid)
+        except Exception as e:
+            if mux: await _terminate(mux)
+            if gid: self.cq.close_group(gid, 0); self.cq_wake.set()
+            self.on_log(sid, f"❌ 執行錯誤: {str(e)}", 2); return True
+        finally:
+            for fd in (rfd, wfd):
+                if fd is not None: os.close(fd)
+        parser = StreamlinkLogParser(); state = {"rec": False}
+        METRICS.inc("twitch_streamlink_processes")
+        def on_line(raw, from_mux=False):
+            line = raw.decode('utf-8', 'replace')
+            if from_mux:
+                # 開始錄影前 / 手動停止時 ffmpeg 的錯誤只是輸入中斷 (未開台或 streamlink 已被終止)
+                if not state["rec"] or state.get("stopping"): parser.tail.append(line.rstrip()); return
+                line = "error: FFmpeg: " + line
+            kind = parser.feed(line)
+            if not kind: return
+            self.on_event(sid, kind, parser.last())
+            if kind == "opened" and not state["rec"]: self._rec_started(sid, state)
+            elif kind == "ffmpeg_error": self.on_log(sid, "❌ FFmpeg 錯誤", 2)
+            elif kind == "skipped": state["skipped"] = time.monotonic(); self._lag(sid, True)  # 跟不上播放清單，錄影已缺段
+        async def pump(stream, from_mux=False):
+            while True:
+                try: raw = await stream.readline()
+                except ValueError: continue  # 單行超過緩衝上限，略過
+                if not raw: break
+                on_line(raw, from_mux)
+        readers = asyncio.gather(pump(proc.stderr), *([pump(mux.stderr, True)] if mux else [pump(proc.stdout)]))
+        waiter = asyncio.ensure_future(proc.wait()); waiter.add_done_callback(lambda _: METRICS.inc("twitch_streamlink_processes", -1))
+        monitor = self.loop.create_task(self._watch_file(sid, fpath, state))
+        if gid: state["parts"] = 0; seg_watch = self.loop.create_task(self._watch_segments(gid, state))
+        try:
+            await waiter
+            # streamlink 結束後 ffmpeg 會讀到 EOF 並自行收尾
+            if mux: await _finish(mux, MUX_FINISH_TIMEOUT_SEC)
+            await readers
+        except asyncio.CancelledError:
+            state["stopping"] = True; await _terminate(proc)
+            if mux: await _finish(mux, MUX_FINISH_TIMEOUT_SEC)
+            readers.cancel(); monitor.cancel()
+            if gid: seg_watch.cancel(); self._close_segments(gid, state)
+            if _size(fpath) > 0:
+                self._remember("recordings", sid=sid, path=fpath, start=started, bytes=_size(fpath), result="stopped")
+                self.on_log(sid, "✅ 錄影已停止", 0)
+                if not piped: self.on_compress(sid, fpath)
+            raise
+        monitor.cancel()
+        if gid: seg_watch.cancel(); self._close_segments(gid, state)
+
+        # 檢查是否有錄到內容
+        has_content = _size(fpath) > 0
+        crashed = bool(mux and mux.returncode and state["rec"])
+        if proc.returncode == 0 and not crashed:
+            self.on_log(sid, "✅ 錄影完成", 0)
+        else:
+            # === 修正重點：過濾無用的 INFO 訊息 ===
+            if "offline" in parser.seen:
+                pass # 正常未開台，不顯示錯誤
+            elif "ffmpeg_error" in parser.seen:
+                crashed = True # 錯誤已在發生當下回報
+            elif "plugin" not in parser.seen:
+                # 顯示真正的錯誤
+                self.on_log(sid, f"⚠️ 異常: {parser.last()[:50]}...", 2); crashed = True
+            if has_content: self.on_log(sid, "✅ 錄影已停止", 0)
+        if has_content: self._remember("recordings", sid=sid, path=fpath, start=started, bytes=_size(fpath), result="crashed" if crashed else "done")
+        # 即使是異常結束，只要有錄到內容就壓縮 (直寫 MP4 已是最終檔案)
+        if has_content and not piped: self.on_compress(sid, fpath)
+        return crashed
+    def _rec_started(self, sid, state):
+        state["rec"] = True; self.on_log(sid, "🔴 錄影中", 1)
+        # 開台到開始錄影的時間：streamlink 啟動、廣告與 HLS 緩衝都算在內
+        t = self.detector.started_at(sid)
+        if t: METRICS.observe("twitch_golive_to_record_seconds", max(0.0, time.time() - t))
+    def _segments(self, gid, state, final):
+        # 最新的一段可能還在寫入，除非錄影已結束
+        parts = sorted(p for p in Path(gid).glob("part_*.ts") if p.stat().st_size > 0)
+        for i in range(state["parts"], len(parts) if final else len(parts) - 1):
+            self.cq.push_part(gid, i, str(parts[i])); state["parts"] = i + 1
+        self.cq_wake.set()
+    async def _watch_segments(self, gid, state):
+        while True:
+            await asyncio.sleep(FILE_CHECK_SEC); self._segments(gid, state, False)
+    def _close_segments(self, gid, state):
+        self._segments(gid, state, True); self.cq.close_group(gid, state["parts"]); self.cq_wake.set()
+    async def _watch_file(self, sid, fpath, state):
+        """定期檢查錄影檔大小，回報寫入量並偵測停滯。以基準 (最近 RECORD_LAG_WINDOW 次檢查寫入速度的中位數) 累計比基準少寫的秒數，
+        累積到相當於連續 RECORD_LAG_CHECKS 次只有基準的 RECORD_LAG_RATIO 時視為落後，補寫到剩一半以下才恢復；streamlink 回報跳過片段時也算。
+        完全沒有寫入的檢查多半是上游沒有資料 (廣告、實況主暫停)，交給停滯判定"""
+        last = 0; since = prev = time.monotonic(); stalled = False; rates = collections.deque(maxlen=RECORD_LAG_WINDOW)
+        behind = 0.0; lag = False; slow = 0; limit = RECORD_LAG_CHECKS * FILE_CHECK_SEC * (1 - RECORD_LAG_RATIO)
+        try:
+            while True:
+                await asyncio.sleep(FILE_CHECK_SEC)
+                size = _size(fpath)
+                now = time.monotonic(); dt = max(now - prev, 1e-6); rate = max(0, size - last) / dt; prev = now
+                METRICS.set("twitch_recording_write_bytes_per_second", rate, channel=sid)
+                if rate > 0:
+                    # 基準取中位數，落後後補寫的幾次高速不會拉高基準
+                    if len(rates) >= RECORD_LAG_WINDOW // 2: ref = statistics.median(rates); behind = max(0.0, behind + (ref - rate) * dt / ref)
+                    lag = behind >= limit or (lag and behind >= limit / 2)
+                    # 開始落後後基準維持不變 (否則持續變慢會拉低基準而永遠不算落後)；落後超過 RECORD_LAG_WINDOW 次就當作位元率真的降低，重建基準
+                    slow = slow + 1 if lag else 0
+                    if slow > RECORD_LAG_WINDOW: rates.clear(); behind = 0.0; lag = False; slow = 0
+                    if behind < limit / 2: rates.append(rate)
+                    self._lag(sid, lag or now - state.get("skipped", -THROTTLE_HOLD_SEC) < RECORD_LAG_CHECKS * FILE_CHECK_SEC)
+                if size > last:
+                    if not state["rec"]: self._rec_started(sid, state)
+                    if stalled: stalled = False; self.on_log(sid, "▶ 錄影恢復", 1)
+                    last = size; since = now; self.on_event(sid, "bytes", size); METRICS.set("twitch_recording_bytes", size, channel=sid)
+                elif last and not stalled and now - since >= STALL_TIMEOUT_SEC:
+                    stalled = True; self.on_event(sid, "stall", now - since); METRICS.inc("twitch_recording_stalls_total", channel=sid)
+                    self.on_log(sid, f"⚠️ 錄影停滯 {int(now - since)} 秒", 2)
+        finally:
+            METRICS.remove("twitch_recording_bytes", channel=sid); METRICS.remove("twitch_recording_write_bytes_per_second", channel=sid); self._lag(sid, False)
+    def _lag(self, sid, lag):
+        if lag: self.lagging.add(sid); self.lag_at = time.monotonic()
+        else: self.lagging.discard(sid)
+        self._throttle()
+    def _throttle(self):
+        """任何錄影落後就暫停所有壓縮程序，全部恢復 THROTTLE_HOLD_SEC 秒後才繼續"""
+        hold = self.lag_at + THROTTLE_HOLD_SEC - time.monotonic()
+        on = self.policy.cfg.get("throttle", True) and bool(self.lagging or hold > 0)
+        # 等待恢復期間只保留一個計時器，到期時再檢查一次 (期間又落後就重新計時)
+        if on and not self.lagging and not self.resume: self.resume = self.loop.call_later(hold, self._resumed)
+        if on == self.policy.throttled: return
+        n = self.policy.throttle(on); METRICS.set("twitch_compress_throttled", int(on))
+        if on: METRICS.inc("twitch_compress_throttles_total")
+        if n: self.on_log("壓縮", f"⏸ 錄影落後 ({', '.join(sorted(self.lagging))})，暫停 {n} 個壓縮程序" if on else f"▶ 錄影已恢復，繼續 {n} 個壓縮程序", 2 if on else 0)
+        if not on: self.cq_wake.set()
+    def _resumed(self): self.resume = None; self._throttle()
+    async def _compress_push(self, sid, fpath, opts):
+        if self.cq.push(sid, fpath, opts):
+            self.on_log(sid, f"📥 已加入壓縮佇列 (待處理 {len(self.cq.pending)})", 0); self.cq_wake.set()
+    async def _compress_scan(self, folder, opts):
+        n = self.cq.scan(folder, opts)
+        if n: self.on_log("壓縮", f"📥 找到 {n} 個未壓縮的錄影檔，已加入佇列", 0); self.cq_wake.set()
+    async def _compress_opts(self, workers, priority, paused):
+        self.cq.workers = max(1, workers); self.cq.priority = priority; self.cq.paused = paused; self.cq_wake.set()
+    async def _resource_opts(self, cfg):
+        # 已在執行的程序沿用原本的優先權，新設定從下一個程序開始；關閉自動暫停時立即恢復
+        self.policy.configure(cfg); self._throttle()
+    async def _dispatch(self):
+        """依工作數上限從佇列取出壓縮工作；暫停 (手動或錄影落後) 時不再啟動新的工作"""
+        while True:
+            await self.cq_wake.wait(); self.cq_wake.clear()
+            for gid in self.cq.ready_groups():
+                if gid in self.compressing: continue
+                t = self.compressing[gid] = self.loop.create_task(self._concat(gid))
+                t.add_done_callback(lambda _, k=gid: (self.compressing.pop(k, None), self.cq_wake.set()))
+            while not self.cq.paused and not self.policy.throttled and len(self.compressing) < self.cq.workers:
+                job = self.cq.pop(self.compressing)
+                if not job: break
+                t = self.compressing[job["path"]] = self.loop.create_task(self._compress(job))
+                t.add_done_callback(lambda _, k=job["path"]: (self.compressing.pop(k, None), self.cq_wake.set()))
+            METRICS.set("twitch_compress_active", len(self.compressing))
+    async def _compress(self, job):
+        ok, out_path = await self._compress_file(job["sid"], job["path"], job["opts"])
+        METRICS.inc("twitch_compress_jobs_total", result="ok" if ok else "failed")
+        self.cq.finish(job, ok, out_path)
+        if self.cq.failed.get(job["path"]) == COMPRESS_MAX_ATTEMPTS: self.on_log(job["sid"], f"⚠️ 已失敗 {COMPRESS_MAX_ATTEMPTS} 次，之後啟動時不再自動重試", 2)
+        if "group" not in job["opts"]:
+            self._remember("compressions", sid=job["sid"], src=job["path"], out=out_path, ok=ok); self.on_done(job["sid"], out_path, ok)
+    async def _concat(self, gid):
+        """分段全部處理完後以 concat demuxer 無損合併，不重新編碼"""
+        g = self.cq.groups[gid]; sid = g["sid"]; keep = g["opts"].get("keep")
+        if g["opts"].get("encode"): files = [g["parts"].get(str(i)) for i in range(g["count"])]
+        else: files = [str(p) for p in sorted(Path(gid).glob("part_*.ts")) if p.stat().st_size > 0]
+        if not files:
+            self.cq.drop_group(gid); shutil.rmtree(gid, ignore_errors=True); return
+        if None in files:
+            self.on_log(sid, "❌ 分段壓縮失敗，保留分段檔", 2); self.cq.drop_group(gid); return
+        final = g["final"] + os.path.splitext(files[0])[1]; lst = os.path.join(gid, "concat.txt")
+        with open(lst, "w", encoding="utf-8") as f:
+            for p in files: f.write("file '" + p.replace("'", "'\\''") + "'\n")
+        cmd = [FFMPEG_PATH, '-v', 'error', '-f', 'concat', '-safe', '0', '-i', lst, '-map', '0', '-c', 'copy']
+        if not final.endswith('.ts'): cmd += ['-movflags', '+faststart']
+        self.on_log(sid, f"🔗 合併 {len(files)} 個分段...", 0)
+        try: rc = (await _run_proc(cmd + ['-y', final], policy=self.policy))[0]
+        except asyncio.CancelledError:
+            try: os.remove(final)
+            except: pass
+            raise
+        if rc != 0 or not os.path.exists(final):
+            self.on_log(sid, "❌ 分段合併失敗，保留分段檔", 2); self.cq.drop_group(gid); self._remember("compressions", sid=sid, src=gid, out=final, ok=False); self.on_done(sid, gid, False); return
+        # 合併成功：移除各段壓縮檔，未勾選保留原始檔時連同分段 .ts 一起刪除
+        if keep:
+            for p in files:
+                if g["opts"].get("encode"):
+                    try: os.remove(p)
+                    except: pass
+            try: os.remove(lst)
+            except: pass
+        else: shutil.rmtree(gid, ignore_errors=True)
+        self.cq.drop_group(gid); self.on_log(sid, "✅ 分段合併完成", 0); self._remember("compressions", sid=sid, src=gid, out=final, ok=True); self.on_done(sid, final, True)
+    async def _compress_file(self, sid, ts_path, opts):
+        if not os.path.exists(ts_path):
+            self.on_log(sid, "❌ 檔案不存在", 2); return False, ts_path
+        cmd, out_path = _compress_cmd(ts_path, dict(opts, threads=self.policy.threads(opts.get("threads", 0))))
+        part = f" 分段 {opts['idx'] + 1}" if "group" in opts else ""
+        self.on_log(sid, f"🔄 壓縮中{part} ({COMPRESS_PROFILES.get(opts.get('profile'), '')})...", 0)
+        try:
+            try: rc, _, err = await _run_proc(cmd, policy=self.policy)
+            except asyncio.CancelledError:
+                try: os.remove(out_path)
+                except: pass
+                raise
+            if rc != 0 or not os.path.exists(out_path):
+                self.on_log(sid, "❌ 壓縮失敗", 2); return False, ts_path
+            # 驗證輸出檔可播放
+            if not await _verify_output(ts_path, out_path, opts.get("verify", "probe"), self.policy):
+                self.on_log(sid, "❌ 輸出檔驗證失敗，保留原始檔", 2)
+                try: os.remove(out_path)
+                except: pass
+                return False, ts_path
+            ts_size = os.path.getsize(ts_path) / (1024*1024)
+            out_size = os.path.getsize(out_path) / (1024*1024)
+            speed = _ffmpeg_speed(err)
+            if speed: METRICS.observe("twitch_encode_speed_ratio", speed, profile=opts.get("profile", "encode"))
+            METRICS.inc("twitch_compress_saved_bytes_total", int((ts_size - out_size) * 1024 * 1024))
+            saved = ((ts_size - out_size) / ts_size * 100) if ts_size > 0 else 0
+            self.on_log(sid, f"✅ 壓縮完成 (節省 {saved:.1f}%)", 0)
+            if not opts.get("keep"):
+                try:
+                    os.remove(ts_path)
+                    self.on_log(sid, "🗑️ 已刪除原始檔", 0)
+                except Exception as e:
+                    self.on_log(sid, f"⚠️ 刪除原始檔失敗: {str(e)}", 2)
+            return True, out_path
+        except Exception as e:
+            self.on_log(sid, f"❌ 壓縮錯誤: {str(e)}", 2); return False, ts_path
@@ -0,0 +1,121 @@
+import os
+import sys
+import signal
+import platform
+import subprocess
+
+from .detect import _noop
+from .config import RESOURCE_DEFAULTS
+
+IOPRIO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+# ioprio_set 的系統呼叫編號 (glibc 沒有包裝函式)
+_IOPRIO_SET = {"x86_64": 251, "amd64": 251, "i386": 289, "i686": 289, "aarch64": 30, "arm64": 30, "riscv64": 30, "armv7l": 314, "ppc64le": 273, "s390x": 282}
+# Windows 沒有 nice，依 nice 值換成優先權類別 (IDLE / BELOW_NORMAL / ABOVE_NORMAL / HIGH)
+_WIN_CLASSES = ((15, 0x40), (1, 0x4000), (0, 0), (-14, 0x8000), (-20, 0x80))
+# 壓縮程序自成程序群組 (不另開 session：新 session 在 Linux 會成為獨立的 autogroup，分到與整個程式相同的 CPU，nice 等於無效)
+_GROUP = os.name != "nt" and sys.version_info >= (3, 11)
+
+def popen_kw():
+    # Windows 下隱藏子程序的主控台視窗
+    if os.name != "nt": return {}
+    si = subprocess.STARTUPINFO(); si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {"startupinfo": si}
+
+def _all_cpus():
+    try: return set(os.sched_getaffinity(0))
+    except AttributeError: return set(range(os.cpu_count() or 1))
+
+def _tids(pid):
+    # Linux 的 nice / 親和性 / I/O 優先權都是針對執行緒，已建立的執行緒要逐一設定
+    try: return [int(t) for t in os.listdir(f"/proc/{pid}/task")]
+    except OSError: return [pid]
+
+def _ionice(spec):
+    # "類別[:等級]" 轉成 ioprio 值 (等級預設 4，idle 沒有等級)；空字串或無法辨識時為 None
+    cls, _, level = (spec or "").partition(":")
+    if cls not in IOPRIO_CLASSES: return None
+    return IOPRIO_CLASSES[cls] << 13 | (0 if cls == "idle" else int(level or 4))
+
+_libc = None
+def _ioprio_set(tid, prio):
+    import ctypes
+    global _libc
+    nr = _IOPRIO_SET.get(platform.machine().lower())
+    if nr is None: raise OSError("不支援此平台的 ionice")
+    if _libc is None: _libc = ctypes.CDLL(None, use_errno=True)
+    if _libc.syscall(nr, 1, tid, prio) != 0:  # 1 = IOPRIO_WHO_PROCESS
+        e = ctypes.get_errno(); raise OSError(e, os.strerror(e))
+
+def _win(pid, fn):
+    # 以 PROCESS_SET_INFORMATION | PROCESS_SUSPEND_RESUME 開啟程序後呼叫 fn(kernel32, ntdll, handle)
+    import ctypes
+    k32 = ctypes.WinDLL("kernel32", use_last_error=True); nt = ctypes.WinDLL("ntdll")
+    k32.OpenProcess.restype = ctypes.c_void_p; k32.OpenProcess.argtypes = (ctypes.c_uint32, ctypes.c_int, ctypes.c_uint32)
+    k32.SetProcessAffinityMask.argtypes = (ctypes.c_void_p, ctypes.c_size_t); k32.CloseHandle.argtypes = (ctypes.c_void_p,)
+    nt.NtSuspendProcess.argtypes = nt.NtResumeProcess.argtypes = (ctypes.c_void_p,)
+    h = k32.OpenProcess(0x0200 | 0x0800, False, pid)
+    if not h: raise ctypes.WinError(ctypes.get_last_error())
+    try: return fn(k32, nt, h)
+    finally: k32.CloseHandle(h)
+
+class ResourcePolicy:
+    """子程序的資源政策。record (streamlink 與錄影用的 ffmpeg) 與 encode (壓縮 / 合併 / 驗證用的 ffmpeg) 各自套用 nice、ionice，
+    encode 另外避開保留給錄影的核心並限制 -threads；錄影落後時可整批暫停 encode 程序 (POSIX 為 SIGSTOP，Windows 為 NtSuspendProcess)。
+    只在 RecordSupervisor 的事件迴圈內呼叫；設定失敗 (例如權限不足) 以 on_error 回報，同樣的錯誤只回報一次"""
+    def __init__(self, cfg=None, on_error=None):
+        self.on_error = on_error or _noop; self.errors = set(); self.encoders = set(); self.throttled = False
+        self.configure(cfg)
+    def configure(self, cfg=None):
+        self.cfg = c = dict(RESOURCE_DEFAULTS, **(cfg or {}))
+        cpus = _all_cpus(); keep = c.get("reserve_cpus") or []
+        keep = set(sorted(cpus)[:keep]) if isinstance(keep, int) else set(keep) & cpus
+        # 至少留一個核心給壓縮；未保留時不限制
+        self.enc_cpus = cpus - keep if keep and cpus - keep else None
+    def threads(self, n):
+        """壓縮的 -threads：設定值 (0 為自動) 不超過上限；上限預設為壓縮可用的核心數 (沒有保留核心時不限制)"""
+        cap = int(self.cfg.get("threads_cap") or 0) or (len(self.enc_cpus) if self.enc_cpus else 0)
+        return min(n, cap) if n and cap else n or cap
+    def nice(self, role): return int(self.cfg.get("enc_nice" if role == "encode" else "rec_nice") or 0)
+    def popen_kw(self, role):
+        kw = popen_kw()
+        if os.name == "nt":
+            # 優先權類別在建立程序時就指定，不會有短暫以一般優先權執行的空窗
+            kw["creationflags"] = next(f for n, f in _WIN_CLASSES if self.nice(role) >= n)
+        elif role == "encode" and _GROUP: kw["process_group"] = 0  # 暫停時連同子程序一起暫停
+        return kw
+    def _error(self, m):
+        if m not in self.errors: self.errors.add(m); self.on_error(m)
+    def spawned(self, role, pid):
+        """子程序啟動後立刻套用 nice / ionice / 親和性 (之後建立的執行緒會繼承)"""
+        enc = role == "encode"; nice = self.nice(role); io = _ionice(self.cfg.get("enc_ionice" if enc else "rec_ionice"))
+        cpus = self.enc_cpus if enc else None
+        try:
+            if os.name == "nt":
+                if cpus: _win(pid, lambda k32, nt, h: k32.SetProcessAffinityMask(h, sum(1 << c for c in cpus)))
+            else:
+                for tid in (_tids(pid) if nice or io is not None or cpus else []):
+                    if nice: os.setpriority(os.PRIO_PROCESS, tid, nice)
+                    if cpus and hasattr(os, "sched_setaffinity"): os.sched_setaffinity(tid, cpus)
+                    if io is not None and platform.system() == "Linux": _ioprio_set(tid, io)
+        except ProcessLookupError: pass  # 程序已經結束
+        except OSError as e: self._error(f"⚠️ 無法套用{'壓縮' if enc else '錄影'}程序的資源設定: {e}")
+        if enc:
+            self.encoders.add(pid)
+            if self.throttled: self._signal(pid, False)
+    def exited(self, pid):
+        # 暫停中的程序要先恢復，才收得到結束訊號
+        if pid in self.encoders:
+            self.encoders.discard(pid)
+            if self.throttled: self._signal(pid, True)
+    def throttle(self, on):
+        """暫停 / 恢復所有 encode 程序，回傳受影響的程序數"""
+        if on == self.throttled: return 0
+        self.throttled = on
+        for pid in self.encoders: self._signal(pid, not on)
+        return len(self.encoders)
+    def _signal(self, pid, resume):
+        try:
+            if os.name == "nt": _win(pid, lambda k32, nt, h: (nt.NtResumeProcess if resume else nt.NtSuspendProcess)(h))
+            else: (os.killpg if _GROUP else os.kill)(pid, signal.SIGCONT if resume else signal.SIGSTOP)
+        except ProcessLookupError: pass
+        except OSError as e: self._error(f"⚠️ 無法{'恢復' if resume else '暫停'}壓縮程序: {e}")
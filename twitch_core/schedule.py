@@ -0,0 +1,129 @@
+import time
+import heapq
+import random
+import threading
+from datetime import datetime, timezone
+
+from .config import (LIVE_POLL_INTERVAL_SEC, SCHED_MIN_FACTOR, SCHED_MAX_FACTOR, SCHED_MIN_SEC, SCHED_MAX_SEC, SCHED_JITTER,
+                     SCHED_MIN_EVENTS, SCHED_DECAY, SCHED_LEAD_SEC, SCHED_PIGGYBACK, SCHED_BUDGET_SEC)
+
+def _parse_ts(s):
+    # Helix / EventSub 的 RFC3339 時間 (例如 2024-01-01T12:00:00Z)，無法解析時回傳 None
+    try: return datetime.strptime(s[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError): return None
+
+class LiveHistory:
+    """各頻道的開台時段統計：一週切成 168 個小時，記錄每個時段開台的次數 (只存非零的時段)"""
+    def __init__(self, store=None):
+        # store 為 None 時只保存在記憶體
+        self.store = store; self.lock = threading.Lock(); self.data = store.get("history") if store else {}; self.peak = {}
+    def save(self):
+        if self.store: self.store.put("history", self.data)
+    @staticmethod
+    def _bin(ts): return int(ts // 3600) % 168
+    def record(self, login, ts, stream_id):
+        """記錄一次開台 (同一場直播只算一次)，回傳是否為新的開台"""
+        with self.lock:
+            h = self.data.setdefault(login, {"bins": {}, "n": 0, "last": ""})
+            if h["last"] == stream_id: return False
+            bins = {k: round(v * SCHED_DECAY, 3) for k, v in h["bins"].items()}
+            b = str(self._bin(ts)); bins[b] = bins.get(b, 0) + 1
+            h["bins"] = {k: v for k, v in bins.items() if v >= 0.01}; h["n"] += 1; h["last"] = stream_id
+            self.peak.pop(login, None); self.save()
+        return True
+    def _smooth(self, bins, i): return bins.get(str(i), 0) + 0.5 * (bins.get(str((i - 1) % 168), 0) + bins.get(str((i + 1) % 168), 0))
+    def score(self, login, ts):
+        """ts 到 ts + SCHED_LEAD_SEC 之間的開台可能性，相對於該頻道最常開台的時段 (0~1)；紀錄不足時回傳 None"""
+        with self.lock:
+            h = self.data.get(login)
+            if not h or h["n"] < SCHED_MIN_EVENTS: return None
+            bins = h["bins"]; peak = self.peak.get(login)
+            if peak is None: peak = self.peak[login] = max(self._smooth(bins, int(k)) for k in bins)
+            s = max(self._smooth(bins, self._bin(t)) for t in (ts, ts + SCHED_LEAD_SEC))
+        return min(1.0, s / peak) if peak else 0.0
+
+class PollScheduler:
+    """每個頻道各自排定下一次檢查：常開台的時段密集檢查、不太可能開台時拉長間隔，並加上隨機抖動。
+    到期的頻道湊成每 100 個一批，快到期的頻道順便併入，避免每個頻道各送一次請求。
+    請求數不超過固定間隔輪詢 (每個基本間隔 ceil(頻道數 / 100) 次)：額度以這個速度累積，不足時到期的頻道延後到有額度再查詢。
+    新加入與 expedite 的頻道不受額度限制，到期就查詢"""
+    def __init__(self, history, base=LIVE_POLL_INTERVAL_SEC):
+        self.history = history; self.base = base; self.lock = threading.Lock()
+        self.chans = {}  # login -> [下次檢查, 開台中, 間隔]
+        self.heap = []  # (下次檢查, login)；時間與 chans 不符的項目已過期，取出時略過
+        self.tokens = None; self.stamp = 0.0  # 可用的請求數，第一次查詢時給一輪的量
+        self.urgent = set()  # 還沒查詢過或被 expedite 的頻道
+    def _plan(self, login, at, live, iv):
+        self.chans[login] = [at, live, iv]; heapq.heappush(self.heap, (at, login))
+    def _stale(self, e):
+        c = self.chans.get(e[1]); return not c or c[0] != e[0]
+    def add(self, login, now=None):
+        with self.lock:
+            if login not in self.chans: self._plan(login, now or time.time(), False, self.base); self.urgent.add(login)
+    def remove(self, login):
+        with self.lock: self.chans.pop(login, None); self.urgent.discard(login)
+    def _refill(self, now):
+        # 在 lock 內呼叫，回傳每秒累積的請求數
+        rate = -(-max(1, len(self.chans)) // 100) / self.base
+        if self.tokens is None: self.tokens = rate * self.base
+        else: self.tokens = min(rate * SCHED_BUDGET_SEC, self.tokens + max(0.0, now - self.stamp) * rate)
+        self.stamp = now; return rate
+    def interval(self, login, live, now):
+        # 開台中維持基本間隔 (需要偵測下播與更新標題)
+        s = None if live else self.history.score(login, now)
+        if s is None: return self.base
+        lo = max(SCHED_MIN_SEC, self.base * SCHED_MIN_FACTOR); hi = max(self.base, min(SCHED_MAX_SEC, self.base * SCHED_MAX_FACTOR))
+        return hi * (min(lo, hi) / hi) ** s
+    def due(self, now=None, skip=(), everything=False):
+        """取出這次要查詢的頻道，並先暫定下一次時間，避免結果回來前重複查詢"""
+        now = now or time.time()
+        with self.lock:
+            self._refill(now)
+            if everything: out = [l for l in self.chans if l not in skip]; self.heap = [(c[0], l) for l, c in self.chans.items()]; heapq.heapify(self.heap)
+            else:
+                # 額度只夠送出的批次數決定這次最多查幾個頻道，其餘到期的頻道留到下次。只併入快到期的頻道，提早查詢會讓它們的下一次也提早；
+                # 額度只剩這一批時查詢頻率已由額度決定，最後一批的空位就全部補滿
+                # 到期的 urgent 頻道一定送出 (額度不足時不扣到負數)，最後一批的空位再給其他頻道
+                out = [l for l in self.urgent if self.chans[l][0] <= now and l not in skip]; keep = []; seen = set(out)
+                room = max(int(self.tokens), -(-len(out) // 100)) * 100
+                horizon = now + SCHED_PIGGYBACK * self.base if self.tokens >= 2 else float("inf")
+                while self.heap and len(out) < room:
+                    n, l = self.heap[0]
+                    if self._stale(self.heap[0]): heapq.heappop(self.heap); continue
+                    # 依時間順序取出：先是到期的頻道，再用快到期的頻道補滿最後一批
+                    if n > now and (not out or len(out) % 100 == 0 or n > horizon): break
+                    heapq.heappop(self.heap)
+                    # 多次 expedite 會留下時間相同的重複項目
+                    if l in seen: continue
+                    seen.add(l)
+                    if l in skip: keep.append((n, l))
+                    else: out.append(l)
+                for e in keep: heapq.heappush(self.heap, e)
+            for l in out: c = self.chans[l]; self._plan(l, now + c[2], c[1], c[2]); self.urgent.discard(l)
+            self.tokens = max(0.0, self.tokens - -(-len(out) // 100))
+        return out
+    def update(self, login, info, now=None):
+        """依查詢或推播結果記錄開台時間並排定下一次檢查"""
+        now = now or time.time()
+        if info.get("live") and info.get("id"): self.history.record(login, _parse_ts(info.get("started")) or now, info["id"])
+        live = bool(info.get("live")); iv = self.base if info.get("error") else self.interval(login, live, now)
+        with self.lock:
+            if login in self.chans: self._plan(login, now + iv * random.uniform(1 - SCHED_JITTER, 1 + SCHED_JITTER), live, iv)
+    def expedite(self, logins):
+        # 例如推播中斷的頻道，立即排入下一次檢查
+        with self.lock:
+            for l in logins:
+                c = self.chans.get(l)
+                if c: self._plan(l, 0, c[1], c[2]); self.urgent.add(l)
+    def next_wake(self, now=None, skip=()):
+        """距離下一次可以查詢的秒數 (下一個頻道到期且有請求額度)，沒有頻道時回傳 None"""
+        now = now or time.time()
+        with self.lock:
+            while self.heap and self._stale(self.heap[0]): heapq.heappop(self.heap)
+            if skip: n = min((c[0] for l, c in self.chans.items() if l not in skip), default=None)
+            else: n = self.heap[0][0] if self.heap else None
+            if n is None: return None
+            rate = self._refill(now); short = (1 - self.tokens) / rate if self.tokens < 1 else 0.0
+            u = min((self.chans[l][0] for l in self.urgent if l not in skip), default=None)
+        wait = max(0.0, n - now, short)
+        return wait if u is None else min(wait, max(0.0, u - now))
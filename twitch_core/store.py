@@ -0,0 +1,108 @@
+import os
+import json
+import gzip
+import time
+import shutil
+import threading
+import collections
+from pathlib import Path
+from datetime import datetime
+
+from .config import (CONFIG_WATCHER_PATH, RECORDER_CONFIG_PATH, COMPRESS_QUEUE_PATH, LIVE_HISTORY_PATH, STATE_PATH,
+                     STORE_DEBOUNCE_SEC, STORE_MAX_DELAY_SEC, STORE_RETRY_SEC, LOG_ROTATE_BYTES, LOG_KEEP_FILES)
+
+class LogArchive:
+    """日誌寫入 <name>.log，超過 max_bytes 時改名並在背景壓成 <name>-時間.log.gz，只保留最新 keep 個壓縮檔"""
+    def __init__(self, path, max_bytes=LOG_ROTATE_BYTES, keep=LOG_KEEP_FILES):
+        self.path = Path(path); self.max_bytes = max_bytes; self.keep = keep; self.lock = threading.Lock()
+        # 上次結束時還沒壓完的輪替檔
+        for p in self.path.parent.glob(f"{self.path.stem}-*.log"): threading.Thread(target=self._gzip, args=(p,), daemon=True).start()
+    def write(self, lines):
+        if not lines: return
+        with self.lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f: f.write("\n".join(lines) + "\n"); size = f.tell()
+                if size >= self.max_bytes:
+                    old = self.path.with_name(f"{self.path.stem}-{datetime.now():%Y%m%d-%H%M%S-%f}.log"); os.replace(self.path, old)
+                    threading.Thread(target=self._gzip, args=(old,), daemon=True).start()
+            except OSError: pass
+    def _gzip(self, src):
+        try:
+            with open(src, "rb") as f, gzip.open(f"{src}.gz", "wb") as g: shutil.copyfileobj(f, g)
+            os.remove(src)
+            for p in sorted(self.path.parent.glob(f"{self.path.stem}-*.log.gz"))[:-self.keep]: p.unlink()
+        except OSError: pass
+
+class StateStore:
+    """所有設定與執行狀態的單一存檔入口：每個區段對應一個 JSON 檔，修改後延遲 debounce 秒合併成一次寫入
+    (持續修改時最多延遲 max_delay 秒)，由背景執行緒寫入暫存檔再 os.replace，寫到一半當機也不會留下損壞的檔案"""
+    def __init__(self, paths=None, debounce=STORE_DEBOUNCE_SEC, max_delay=STORE_MAX_DELAY_SEC):
+        self.paths = paths if paths is not None else {"watcher": CONFIG_WATCHER_PATH, "recorder": RECORDER_CONFIG_PATH, "compress": COMPRESS_QUEUE_PATH, "history": LIVE_HISTORY_PATH, "state": STATE_PATH}
+        self.debounce = debounce; self.max_delay = max_delay; self.writes = 0
+        self.cond = threading.Condition(); self.wlock = threading.Lock(); self.data = {}; self.pending = {}  # 區段 -> [內容, 寫入時間, 第一次修改時間]
+        self.errors = collections.deque(maxlen=20); self.on_error = None; self.closed = False
+        self.th = threading.Thread(target=self._run, name="state-store", daemon=True); self.th.start()
+    def set_error_handler(self, cb):
+        # 補送設定前已發生的錯誤
+        self.on_error = cb
+        for e in list(self.errors): cb(e)
+    def _error(self, m):
+        self.errors.append(m)
+        if self.on_error: self.on_error(m)
+    def get(self, section):
+        """區段內容，第一次取用時從檔案載入；多個執行緒共用的區段請改用 update()"""
+        with self.cond:
+            if section not in self.data: self.data[section] = self._read(section)
+            return self.data[section]
+    def _read(self, section):
+        p = self.paths.get(section)
+        if not p or not p.exists(): return {}
+        try: d = json.loads(p.read_text("utf-8"))
+        except OSError as e: self._error(f"讀取 {p.name} 失敗: {e}"); return {}
+        except ValueError as e:
+            # 保留損壞的檔案供檢查，之後的寫入不會覆蓋它
+            self._error(f"{p.name} 格式錯誤，已改名為 {p.name}.corrupt: {e}")
+            try: os.replace(p, p.with_name(p.name + ".corrupt"))
+            except OSError: pass
+            return {}
+        return d if isinstance(d, dict) else {}
+    def put(self, section, value):
+        """以 value 取代整個區段；立即序列化，呼叫端之後可以繼續修改 value"""
+        text = json.dumps(value)
+        with self.cond: self.data[section] = value; self._mark(section, text)
+    def update(self, section, fn):
+        """在 store 的鎖內以 fn(區段) 修改內容並排入寫入，回傳 fn 的結果"""
+        with self.cond:
+            d = self.get(section); r = fn(d); self._mark(section, json.dumps(d))
+        return r
+    def _mark(self, section, text):
+        now = time.monotonic(); first = self.pending[section][2] if section in self.pending else now
+        self.pending[section] = [text, min(first + self.max_delay, now + self.debounce), first]; self.cond.notify()
+    def _run(self):
+        while True:
+            with self.cond:
+                if self.closed: return
+                now = time.monotonic(); nxt = min((v[1] for v in self.pending.values()), default=None)
+                if nxt is None or nxt > now: self.cond.wait(None if nxt is None else nxt - now); continue
+            self._write_due(now)
+    def _write_due(self, now):
+        # 取出與寫入都在 wlock 內，flush() 與背景寫入不會以舊內容覆蓋新內容
+        with self.wlock:
+            with self.cond: batch = {k: self.pending.pop(k)[0] for k, v in list(self.pending.items()) if v[1] <= now}
+            for k, text in batch.items():
+                if self._write(k, text): continue
+                with self.cond:
+                    if k not in self.pending: t = time.monotonic() + STORE_RETRY_SEC; self.pending[k] = [text, t, t]
+    def _write(self, section, text):
+        p = self.paths.get(section)
+        if not p: return True
+        tmp = p.with_name(p.name + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f: f.write(text); f.flush(); os.fsync(f.fileno())
+            os.replace(tmp, p); self.writes += 1; return True
+        except OSError as e: self._error(f"寫入 {p.name} 失敗: {e}"); return False
+    def flush(self): self._write_due(float("inf"))
+    def close(self):
+        with self.cond: self.closed = True; self.cond.notify()
+        self.th.join(); self.flush()
@@ -0,0 +1,337 @@
+import json
+import time
+import random
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from .metrics import METRICS
+from .config import (TWITCH_TOKEN_URL, TWITCH_VALIDATE_URL, EVENTSUB_WS_URL, EVENTSUB_KEEPALIVE_GRACE_SEC, TWITCH_HELIX_BASE,
+                     HELIX_CONCURRENCY, HELIX_TIMEOUT_SEC, HELIX_RATE_PER_MIN, HELIX_MAX_RETRIES, HELIX_BACKOFF_BASE_SEC,
+                     HELIX_BACKOFF_MAX_SEC, TOKEN_REFRESH_BUFFER_SEC)
+
+class RateLimiter:
+    """Token bucket 配速器：依 Ratelimit-Limit / Remaining 標頭校正，收到 429 時暫停到 Ratelimit-Reset"""
+    def __init__(self, per_min=HELIX_RATE_PER_MIN):
+        self.cond = threading.Condition(); self.capacity = per_min; self.tokens = float(per_min); self.rate = per_min / 60
+        self.stamp = time.monotonic(); self.blocked_until = 0.0; self.remaining = None
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate); self.stamp = now
+    def acquire(self):
+        # 額度不足時排隊等待，而不是丟掉請求
+        with self.cond:
+            while True:
+                now = time.monotonic(); self._refill(now)
+                if now < self.blocked_until: self.cond.wait(self.blocked_until - now)
+                elif self.tokens >= 1: self.tokens -= 1; return
+                else: self.cond.wait((1 - self.tokens) / self.rate)
+    def update(self, headers, throttled=False):
+        try: limit = int(headers["Ratelimit-Limit"]); remaining = int(headers["Ratelimit-Remaining"]); reset = float(headers["Ratelimit-Reset"])
+        except (KeyError, ValueError): return
+        with self.cond:
+            now = time.monotonic(); self._refill(now)
+            self.capacity = limit; self.rate = limit / 60; self.remaining = remaining; METRICS.set("twitch_helix_ratelimit_remaining", remaining)
+            # 以伺服器回報的剩餘額度為準；被拒絕 (429) 時停到 Reset (Unix 時間)
+            self.tokens = min(self.tokens, remaining)
+            if throttled: self.blocked_until = max(self.blocked_until, now + max(0.0, reset - time.time()))
+            self.cond.notify_all()
+
+def _backoff(attempt):
+    # 指數退避加上隨機抖動，避免所有重試同時送出
+    return min(HELIX_BACKOFF_MAX_SEC, HELIX_BACKOFF_BASE_SEC * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+class TokenManager:
+    """App access token 管理：快取 Token 並在到期前背景刷新；多個執行緒同時要求時只送出一次請求。
+    憑證由 GUI 執行緒以 set_credentials 推入，這裡不讀取任何元件；on_token / on_error 在背景執行緒呼叫"""
+    def __init__(self, url=TWITCH_TOKEN_URL, timeout=HELIX_TIMEOUT_SEC, on_token=None, on_error=None):
+        self.url = url; self.timeout = timeout; self.on_token = on_token; self.on_error = on_error
+        self.cond = threading.Condition(); self.cid = self.sec = ""; self.tk = None; self.exp = 0; self.ttl = 2 * TOKEN_REFRESH_BUFFER_SEC; self.err = ""
+        self.busy = False; self.gen = 0; self.fails = 0; self.retry_at = 0.0
+        self.session = requests.Session(); self.wake = threading.Event(); self.run_flag = True
+        self.th = threading.Thread(target=self._run, name="token", daemon=True); self.th.start()
+    def set_credentials(self, cid, sec, tk=None, exp=0):
+        # 憑證沒變時保留目前的 Token 與重試排程，不喚醒背景執行緒
+        with self.cond:
+            if (cid, sec) == (self.cid, self.sec) and not tk: return
+            if (cid, sec) != (self.cid, self.sec): self.tk = None; self.exp = 0; self.fails = 0; self.retry_at = 0.0
+            self.cid, self.sec = cid, sec
+            if tk: self.tk = tk; self.exp = exp
+        self.wake.set()
+    def refresh(self):
+        """要求背景立即刷新 (不阻塞呼叫端)，供 GUI 的「更新 Token」按鈕使用"""
+        with self.cond: self.exp = min(self.exp, int(time.time()) + TOKEN_REFRESH_BUFFER_SEC); self.fails = 0; self.retry_at = 0.0
+        self.wake.set()
+    def _valid(self): return bool(self.tk) and self.exp > time.time()
+    def token(self, stale=None):
+        """取得可用的 Token；stale 為收到 401 的舊 Token，若已被其他呼叫端換新就直接沿用"""
+        with self.cond:
+            if self._valid() and self.tk != stale: return self.tk, ""
+            if not self.cid or not self.sec: return None, "未設定 Client ID / Secret"
+        return self._refresh()
+    def headers(self, stale=None):
+        """HelixClient 使用的認證標頭，回傳 (ok, headers, 錯誤訊息)"""
+        tk, e = self.token(stale["Authorization"][7:] if stale else None)
+        if not tk: return False, {}, e
+        return True, {"Client-Id": self.cid, "Authorization": f"Bearer {tk}"}, ""
+    def _refresh(self):
+        # 同時只會有一個請求在路上，其他呼叫端等待同一次的結果
+        with self.cond:
+            if self.busy:
+                gen = self.gen
+                while self.gen == gen: self.cond.wait()
+                return (self.tk, "") if self._valid() else (None, self.err)
+            self.busy = True; cid, sec = self.cid, self.sec
+        tk = None; exp = 0; err = ""; retry = True; t0 = time.perf_counter()
+        try:
+            # 與 Helix 請求記在同一組指標 (endpoint=token)
+            try: r = self.session.post(self.url, data={"client_id": cid, "client_secret": sec, "grant_type": "client_credentials"}, timeout=self.timeout)
+            except requests.RequestException: METRICS.inc("twitch_helix_responses_total", endpoint="token", code="error"); raise
+            METRICS.observe("twitch_helix_request_seconds", time.perf_counter() - t0, endpoint="token"); METRICS.inc("twitch_helix_responses_total", endpoint="token", code=r.status_code)
+            if r.ok: d = r.json(); tk = d["access_token"]; ttl = int(d["expires_in"]); exp = int(time.time()) + ttl
+            # 4xx 代表憑證錯誤，重試也沒用，等使用者修改憑證或手動更新
+            else: err = f"Token 取得失敗 (HTTP {r.status_code})"; retry = r.status_code >= 500 or r.status_code == 429
+        except (requests.RequestException, ValueError, KeyError) as e: err = f"Token 取得失敗: {e}"
+        with self.cond:
+            # 請求期間憑證被修改時，丟棄舊憑證換到的結果
+            if (cid, sec) != (self.cid, self.sec): tk = None; err = err or "憑證已變更"; retry = True
+            if tk: self.tk = tk; self.exp = exp; self.ttl = ttl; self.err = ""; self.fails = 0; self.retry_at = 0.0
+            else: self.err = err; self.fails += 1; self.retry_at = time.time() + _backoff(self.fails) if retry else float("inf")
+            self.busy = False; self.gen += 1; self.cond.notify_all()
+        if tk and self.on_token: self.on_token(tk, exp)
+        if not tk and self.on_error: self.on_error(err)
+        self.wake.set()
+        return (tk, "") if tk else (None, err)
+    def _run(self):
+        # 背景刷新：在到期前 TOKEN_REFRESH_BUFFER_SEC 換新 (有效期較短的 Token 在過了一半時換新，避免不停刷新)，失敗時以退避重試
+        while self.run_flag:
+            self.wake.clear()
+            with self.cond:
+                due = None
+                if self.cid and self.sec and not self.busy:
+                    due = max(self.exp - min(TOKEN_REFRESH_BUFFER_SEC, self.ttl / 2), self.retry_at) - time.time()
+            if due is not None and due <= 0: self._refresh(); continue
+            self.wake.wait(None if due is None or due == float("inf") else due)
+    def close(self): self.run_flag = False; self.wake.set(); self.session.close()
+
+class HelixClient:
+    """共用的 Helix 連線：keep-alive 連線池，每 100 個 login 一批並行查詢，單批失敗不影響其他批"""
+    def __init__(self, gh, concurrency=HELIX_CONCURRENCY, timeout=HELIX_TIMEOUT_SEC, base=TWITCH_HELIX_BASE):
+        self.gh = gh; self.timeout = timeout; self.base = base
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter); self.session.mount("http://", adapter)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="helix"); self.limiter = RateLimiter()
+    def _auth(self, stale=None):
+        # 每輪查詢取一次 Token；stale 為收到 401 的標頭，多批同時 401 時由 TokenManager 合併成一次刷新
+        ok, h, e = self.gh(stale)
+        return (h, "") if ok else (None, e or "Auth Error")
+    def request(self, method, url, limiter=True, retries=HELIX_MAX_RETRIES, **kw):
+        """經過配速器送出請求；429 / 5xx / 連線錯誤以抖動指數退避重試，最後仍失敗才拋出例外"""
+        ep = url.rstrip("/").rsplit("/", 1)[-1]
+        for attempt in range(retries + 1):
+            if limiter: self.limiter.acquire()
+            t0 = time.perf_counter()
+            try: r = self.session.request(method, url, timeout=self.timeout, **kw)
+            except requests.RequestException:
+                METRICS.inc("twitch_helix_responses_total", endpoint=ep, code="error")
+                if attempt == retries: raise
+                time.sleep(_backoff(attempt)); continue
+            METRICS.observe("twitch_helix_request_seconds", time.perf_counter() - t0, endpoint=ep); METRICS.inc("twitch_helix_responses_total", endpoint=ep, code=r.status_code)
+            if limiter: self.limiter.update(r.headers, r.status_code == 429)
+            if r.status_code != 429 and r.status_code < 500 or attempt == retries: return r
+            # 429 時配速器已依 Ratelimit-Reset 暫停，這裡只再加上退避
+            time.sleep(_backoff(attempt))
+        return r
+    def get(self, path, params, h=None):
+        if h is None: h, e = self._auth()
+        if h is None: raise RuntimeError(e)
+        r = self.request("GET", f"{self.base}/{path}", headers=h, params=params)
+        if r.status_code == 401:
+            h, e = self._auth(h)
+            if h is None: raise RuntimeError(f"Token 失效: {e}")
+            r = self.request("GET", f"{self.base}/{path}", headers=h, params=params)
+        r.raise_for_status(); return r.json()
+    def streams(self, logins):
+        """查詢開台狀態，回傳 (開台 login -> stream 資料, 查詢失敗的 login, 錯誤訊息)"""
+        live = {}; failed = set(); err = ""
+        h, e = self._auth()
+        if h is None: return live, set(logins), e
+        cks = [logins[i:i+100] for i in range(0, len(logins), 100)]
+        futs = {self.pool.submit(self.get, "streams", [("user_login", l) for l in c], h): c for c in cks}
+        for f in as_completed(futs):
+            try:
+                for d in f.result().get("data", []): live[d.get("user_login", "").lower()] = d
+            except Exception as ex: failed.update(futs[f]); err = err or str(ex)
+        return live, failed, err
+    def close(self): self.pool.shutdown(wait=False, cancel_futures=True); self.session.close()
+
+class EventSubClient:
+    """EventSub WebSocket 推播：訂閱 stream.online / stream.offline，取代對這些頻道的輪詢。
+    WebSocket 只接受使用者 Token，且未經實況主授權的訂閱有總成本上限 (max_total_cost)，額度用完的頻道繼續輪詢。
+    斷線時清空推播頻道讓輪詢接手；重新連線後重新訂閱，並查詢一次 streams 對帳。
+    監聽者的 on_event(login, info) / on_state(推播中的頻道) 以及 on_error 都在背景執行緒呼叫"""
+    def __init__(self, helix, url=EVENTSUB_WS_URL, validate_url=TWITCH_VALIDATE_URL, on_error=None):
+        self.helix = helix; self.url = url; self.validate_url = validate_url; self.on_error = on_error
+        self.lock = threading.Lock(); self.token = ""; self.h = None; self.ws = None; self.session = None
+        self.want = {}; self.subs = {}; self.ids = {}; self.last = {}; self.full = False; self.listeners = []; self.seen = collections.deque(maxlen=200)
+        self.run_flag = True; self.wake = threading.Event(); self.dirty = threading.Event(); self.started = False
+    def add_listener(self, on_event, on_state=None):
+        # 晚加入的監聽者先補上目前的推播狀態
+        self.listeners.append((on_event, on_state))
+        with self.lock: last = [(l, i) for l, i in self.last.items() if l in self.subs]
+        if on_state: on_state(self.pushed())
+        for l, i in last: on_event(l, i)
+    def set_channels(self, owner, logins):
+        """各使用端 (監看 / 錄影) 登記要推播的頻道，實際訂閱為聯集；不阻塞呼叫端"""
+        with self.lock: self.want[owner] = {l.lower() for l in logins}
+        self.dirty.set()
+    def configure(self, token):
+        """設定使用者 Token；空字串代表關閉推播。第一次啟用時才建立背景執行緒"""
+        with self.lock:
+            changed = token != self.token; self.token = token; ws = self.ws if changed else None
+            if changed: self.h = None
+        # abort 會讓另一個執行緒中的 recv 立即拋出例外
+        if ws: ws.abort()
+        if token and not self.started:
+            self.started = True
+            threading.Thread(target=self._run, name="eventsub", daemon=True).start()
+            threading.Thread(target=self._sync_run, name="eventsub-sync", daemon=True).start()
+        self.wake.set()
+    def pushed(self):
+        with self.lock: return frozenset(self.subs)
+    def _error(self, e):
+        if self.on_error: self.on_error(e)
+    def _emit(self, login, info):
+        with self.lock: self.last[login] = info
+        for cb, _ in self.listeners: cb(login, info)
+    def _state(self):
+        p = self.pushed()
+        for _, cb in self.listeners:
+            if cb: cb(p)
+    # ---- 連線 (eventsub 執行緒) ----
+    def _validate(self, token):
+        # 訂閱必須使用發出這個 Token 的 Client ID
+        r = self.helix.request("GET", self.validate_url, limiter=False, retries=1, headers={"Authorization": f"OAuth {token}"})
+        if r.status_code == 401: return None
+        r.raise_for_status()
+        return {"Client-Id": r.json()["client_id"], "Authorization": f"Bearer {token}"}
+    def _open(self, url):
+        import websocket  # websocket-client，只有啟用推播時才需要
+        ws = websocket.create_connection(url, timeout=HELIX_TIMEOUT_SEC)
+        try:
+            m = json.loads(ws.recv())
+            if m["metadata"]["message_type"] != "session_welcome": raise RuntimeError(f"非預期的訊息 {m['metadata']['message_type']}")
+            s = m["payload"]["session"]
+        except Exception: ws.close(); raise
+        # 超過 keepalive 時間沒有任何訊息就視為斷線
+        ws.settimeout((s.get("keepalive_timeout_seconds") or 10) + EVENTSUB_KEEPALIVE_GRACE_SEC)
+        return ws, s["id"]
+    def _run(self):
+        attempt = 0
+        while self.run_flag:
+            self.wake.clear()
+            with self.lock: token = self.token; h = self.h
+            wait = None
+            if token:
+                try:
+                    if h is None:
+                        h = self._validate(token)
+                        if h is None: raise PermissionError("使用者 Token 無效或已過期")
+                        with self.lock:
+                            if self.token == token: self.h = h
+                    ws, sid = self._open(self.url); attempt = 0
+                    self._loop(ws, sid)
+                except (ImportError, PermissionError) as e:
+                    # 缺少套件或 Token 錯誤時重試也沒用，等重新設定
+                    self._error(f"推播停用: {e}")
+                except Exception as e:
+                    with self.lock: same = self.token == token
+                    # Token 被修改而主動中斷的連線立即以新 Token 重連
+                    if same and self.run_flag: self._error(f"推播連線中斷，改用輪詢: {e}"); attempt += 1; wait = _backoff(attempt)
+                    else: wait = 0
+                self._drop()
+            if self.run_flag: self.wake.wait(wait)
+    def _loop(self, ws, sid):
+        with self.lock: self.ws = ws; self.session = sid
+        self.dirty.set()
+        try:
+            while self.run_flag:
+                m = json.loads(ws.recv()); meta = m["metadata"]; kind = meta["message_type"]
+                # 同一則訊息可能重送
+                if meta.get("message_id") in self.seen: continue
+                self.seen.append(meta.get("message_id"))
+                if kind == "notification":
+                    # stream.online 不含標題，不帶 title 欄位，使用端保留原本的標題並另外查詢
+                    sub = m["payload"]["subscription"]; ev = m["payload"]["event"]; live = sub["type"] == "stream.online"
+                    info = {"live": True, "id": ev.get("id", ""), "started": ev.get("started_at", "")} if live else {"live": False, "title": "", "id": ""}
+                    self._emit(ev["broadcaster_user_login"].lower(), info)
+                elif kind == "session_reconnect":
+                    # 先連上新位址再關閉舊連線，訂閱會跟著轉移
+                    new, _ = self._open(m["payload"]["session"]["reconnect_url"])
+                    with self.lock: self.ws = new
+                    ws.close(); ws = new
+                elif kind == "revocation":
+                    login = self.ids.get(m["payload"]["subscription"]["condition"].get("broadcaster_user_id"))
+                    with self.lock: self.subs.pop(login, None)
+                    self._state()
+        finally: ws.close()
+    def _drop(self):
+        # 連線中斷後訂閱即失效，全部交回輪詢
+        with self.lock: self.ws = self.session = None; had = bool(self.subs); self.subs = {}; self.last = {}; self.full = False
+        if had: self._state()
+    # ---- 訂閱 (eventsub-sync 執行緒) ----
+    def _sync_run(self):
+        while self.run_flag:
+            self.dirty.wait(); self.dirty.clear()
+            try: self._sync()
+            except Exception as e: self._error(f"推播訂閱失敗: {e}")
+    def _user_ids(self, logins):
+        for i in range(0, len(logins), 100):
+            for d in self.helix.get("users", [("login", l) for l in logins[i:i+100]]).get("data", []): self.ids[d["id"]] = d["login"].lower()
+        return {l: i for i, l in self.ids.items()}
+    def _sync(self):
+        with self.lock:
+            sid = self.session; h = self.h; want = set().union(*self.want.values()); have = dict(self.subs)
+        if not sid or not h: return
+        url = f"{self.helix.base}/eventsub/subscriptions"
+        for l in set(have) - want:
+            for i in have[l]: self.helix.request("DELETE", url, limiter=False, retries=1, headers=h, params={"id": i})
+            with self.lock:
+                if self.session == sid: self.subs.pop(l, None); self.full = False
+        todo = sorted(want - set(have))
+        if not todo or self.full: return self._state()
+        ids = self._user_ids(todo); new = []
+        for l in todo:
+            if l not in ids: continue
+            got = []
+            for t in ("stream.online", "stream.offline"):
+                body = {"type": t, "version": "1", "condition": {"broadcaster_user_id": ids[l]}, "transport": {"method": "websocket", "session_id": sid}}
+                # 使用者 Token 的額度與 App Token 分開計算，不經過共用配速器
+                r = self.helix.request("POST", url, limiter=False, retries=1, headers=h, json=body)
+                if r.status_code != 202:
+                    if r.status_code != 429: self._error(f"推播訂閱 {l} 失敗 (HTTP {r.status_code})")
+                    self.full = True; break
+                d = r.json(); got.append(d["data"][0]["id"])
+                if d.get("total_cost", 0) >= d.get("max_total_cost", float("inf")): self.full = True
+            if len(got) == 2:
+                with self.lock:
+                    if self.session != sid: return
+                    self.subs[l] = got
+                new.append(l)
+            else:
+                for i in got: self.helix.request("DELETE", url, limiter=False, retries=1, headers=h, params={"id": i})
+            if self.full: break
+        self._state()
+        # 對帳：斷線期間或訂閱前的狀態變化不會推播，查詢一次目前狀態
+        if new:
+            live, failed, e = self.helix.streams(new)
+            for l in new:
+                if l in failed: continue
+                d = live.get(l) or {}; self._emit(l, {"live": bool(d), "title": d.get("title", ""), "id": d.get("id", ""), "started": d.get("started_at", "")})
+    def close(self):
+        self.run_flag = False
+        with self.lock: ws = self.ws
+        if ws: ws.abort()
+        self.wake.set(); self.dirty.set()